@@ -0,0 +1,115 @@
+"""
+Benchmark da geração de legendas .ass com muitos eventos.
+
+Gera um arquivo com N eventos sintéticos de duas formas: o documento
+inteiro em memória ('generate_subtitle_file') e a gravação direta no
+arquivo ('AssSubtitleGenerator.write', usada na renderização). Mede o
+tempo e o pico de memória alocada (tracemalloc) de cada uma, em frações
+crescentes de N para conferir que o tempo cresce de forma linear, e
+confere que os dois arquivos são idênticos.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_ass --events 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from src.models.subtitle import SubtitleSegment
+from src.services.rendering import AssSubtitleGenerator, generate_subtitle_file
+
+
+def make_subtitles(count: int, speakers: int, rng: random.Random) -> List[SubtitleSegment]:
+    subtitles = []
+    cursor = 0.0
+    for index in range(count):
+        length = rng.uniform(0.8, 4.0)
+        subtitles.append(
+            SubtitleSegment(
+                start=round(cursor, 3),
+                end=round(cursor + length, 3),
+                text=f"Legenda de teste {index}, com um pouco de texto\nem duas linhas",
+                speaker=f"SPEAKER_{rng.randrange(speakers):02}",
+            )
+        )
+        cursor += length + rng.uniform(0.0, 0.5)
+    return subtitles
+
+
+def make_style_options(speakers: int) -> Dict[str, Any]:
+    return {
+        "default": {"font_name": "Arial", "font_size": 28, "font_color": "#FFFFFF"},
+        "speakers": {
+            f"SPEAKER_{index:02}": {"name": f"Pessoa {index}", "color": "#FFCC00"}
+            for index in range(speakers)
+        },
+    }
+
+
+def measure(function: Callable[[], Any]) -> Tuple[float, int]:
+    """
+    Tempo (s) e pico de memória alocada (bytes) de 'function'. O tempo vem de
+    uma execução sem tracemalloc, que deixa a alocação várias vezes mais lenta.
+    """
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--speakers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    all_subtitles = make_subtitles(args.events, args.speakers, rng)
+    style_options = make_style_options(args.speakers)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        memory_path = os.path.join(temp_dir, "memory.ass")
+        stream_path = os.path.join(temp_dir, "stream.ass")
+
+        def in_memory():
+            content = generate_subtitle_file(subtitles, style_options, "ass")
+            with open(memory_path, "w", encoding="utf-8") as f:
+                f.write(content)
+
+        def streaming():
+            with open(stream_path, "w", encoding="utf-8") as f:
+                AssSubtitleGenerator(style_options).write(f, subtitles)
+
+        print(
+            f"{'eventos':>8} {'memória (s)':>12} {'pico (MiB)':>11} "
+            f"{'streaming (s)':>14} {'pico (MiB)':>11} {'µs/evento':>10}"
+        )
+        for fraction in (0.25, 0.5, 1.0):
+            subtitles = all_subtitles[: int(args.events * fraction)]
+            memory_time, memory_peak = measure(in_memory)
+            stream_time, stream_peak = measure(streaming)
+            print(
+                f"{len(subtitles):>8} {memory_time:>12.3f} {memory_peak / 2**20:>11.1f} "
+                f"{stream_time:>14.3f} {stream_peak / 2**20:>11.1f} "
+                f"{1e6 * stream_time / max(len(subtitles), 1):>10.2f}"
+            )
+
+        with open(memory_path, "rb") as a, open(stream_path, "rb") as b:
+            if a.read() != b.read():
+                raise SystemExit("Os arquivos gerados em memória e em streaming diferem!")
+        print(f"\nArquivo final: {os.path.getsize(stream_path) / 2**20:.1f}MiB (idênticos)")
+
+
+if __name__ == "__main__":
+    main()
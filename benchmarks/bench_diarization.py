@@ -0,0 +1,124 @@
+"""
+Benchmark da diarização em janelas versus a passada única do Pyannote.
+
+Diariza o mesmo arquivo nos dois modos, cada um em um processo novo, e
+compara o tempo, o pico de memória (RSS máximo do processo) e a
+concordância entre os resultados: a taxa de erro de diarização (DER, sem
+colar) da saída em janelas usando a passada única como referência, após o
+melhor mapeamento entre os rótulos dos locutores.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_diarization --clip longo.mp4 --window 600 --overlap 30
+"""
+
+import argparse
+import multiprocessing
+import resource
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src import env
+
+FRAME_STEP = 0.01
+
+
+def run_mode(clip: str, window: float, overlap: float) -> Dict[str, Any]:
+    """Executado em um processo novo: carrega o modelo e diariza 'clip'."""
+    from src.services.diarization import DiarizationService
+
+    service = DiarizationService()
+    service.window_duration = window
+    service.window_overlap = overlap
+    loaded_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    start = time.perf_counter()
+    segments = service.diarize_video(clip)
+    return {
+        "time": time.perf_counter() - start,
+        "loaded_rss": loaded_rss,
+        "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "segments": segments,
+    }
+
+
+def speaker_activity(segments: List[Dict[str, Any]], frames: int) -> Dict[str, np.ndarray]:
+    activity: Dict[str, np.ndarray] = {}
+    for segment in segments:
+        track = activity.setdefault(segment["speaker"], np.zeros(frames, dtype=bool))
+        track[int(segment["start"] / FRAME_STEP) : int(segment["end"] / FRAME_STEP)] = True
+    return activity
+
+
+def diarization_error_rate(
+    reference: List[Dict[str, Any]], hypothesis: List[Dict[str, Any]]
+) -> float:
+    """DER quadro a quadro, com mapeamento guloso dos rótulos pela sobreposição."""
+    end = max((s["end"] for s in reference + hypothesis), default=0.0)
+    frames = int(end / FRAME_STEP) + 1
+    ref, hyp = speaker_activity(reference, frames), speaker_activity(hypothesis, frames)
+
+    pairs = sorted(
+        (
+            (int(np.count_nonzero(ref_track & hyp_track)), ref_label, hyp_label)
+            for ref_label, ref_track in ref.items()
+            for hyp_label, hyp_track in hyp.items()
+        ),
+        reverse=True,
+    )
+    mapping: Dict[str, str] = {}
+    for overlap, ref_label, hyp_label in pairs:
+        if overlap and hyp_label not in mapping and ref_label not in mapping.values():
+            mapping[hyp_label] = ref_label
+
+    ref_count = sum(track.astype(np.int32) for track in ref.values())
+    hyp_count = sum(track.astype(np.int32) for track in hyp.values())
+    correct = np.zeros(frames, dtype=np.int32)
+    for hyp_label, ref_label in mapping.items():
+        correct += hyp[hyp_label] & ref[ref_label]
+
+    total = int(np.sum(ref_count))
+    if total == 0:
+        return 0.0
+    errors = int(np.sum(np.maximum(ref_count, hyp_count) - correct))
+    return errors / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clip", required=True, help="vídeo ou áudio local")
+    parser.add_argument("--window", type=float, default=600.0)
+    parser.add_argument("--overlap", type=float, default=env.DIARIZATION_WINDOW_OVERLAP)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name, window in (("completo", 0.0), ("janelas", args.window)):
+        with context.Pool(1) as pool:
+            results[name] = pool.apply(run_mode, (args.clip, window, args.overlap))
+
+    print(
+        f"Clipe: {args.clip}; janelas de {args.window:.0f}s "
+        f"({args.overlap:.0f}s de sobreposição)"
+    )
+    print(
+        f"{'modo':<10} {'tempo (s)':>10} {'RSS modelo (MiB)':>17} "
+        f"{'pico RSS (MiB)':>15} {'turnos':>7} {'locutores':>10}"
+    )
+    for name, result in results.items():
+        speakers = {segment["speaker"] for segment in result["segments"]}
+        print(
+            f"{name:<10} {result['time']:>10.2f} {result['loaded_rss'] / 2**20:>17.1f} "
+            f"{result['peak_rss'] / 2**20:>15.1f} {len(result['segments']):>7} "
+            f"{len(speakers):>10}"
+        )
+
+    der = diarization_error_rate(
+        results["completo"]["segments"], results["janelas"]["segments"]
+    )
+    print(f"\nDER das janelas contra a passada única: {100 * der:.2f}%")
+
+
+if __name__ == "__main__":
+    main()
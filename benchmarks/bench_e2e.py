@@ -0,0 +1,448 @@
+"""
+Benchmark ponta a ponta: upload -> /generate -> /render contra a API real.
+
+Gera vídeos sintéticos com as fontes 'lavfi' do ffmpeg (testsrc2 + tom),
+em várias durações e resoluções, sobe a aplicação com uvicorn em um
+diretório temporário e executa o fluxo completo em vários níveis de
+concorrência. Com '--backend stub' (padrão), Whisper e Pyannote são
+substituídos por backends sintéticos (INFERENCE_BACKEND=stub) e o resultado
+mede só HTTP, E/S, fusão e renderização; a densidade de legendas é
+controlada pelo backend sintético. Com '--backend models', os modelos
+reais são usados (a densidade depende do conteúdo e é ignorada).
+
+O relatório JSON traz o commit, a máquina, as latências (p50/p95) e a vazão
+de cada cenário, e a duração média de cada etapa no servidor (a partir de
+'/metrics'). '--compare' confronta o resultado com um relatório anterior.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_e2e --durations 10,60 --concurrency 1,2,4
+    python -m benchmarks.bench_e2e --backend models --durations 30 --output atual.json
+    python -m benchmarks.bench_e2e --compare anterior.json --output atual.json
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tempo máximo (s) para o servidor carregar os modelos e ficar pronto.
+READY_TIMEOUT = 900
+
+STAGE_METRIC = re.compile(
+    r'^multimidia_stage_duration_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$'
+)
+
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args: str) -> str:
+        result = subprocess.run(
+            ["git", *args], cwd=REPO_ROOT, capture_output=True, text=True
+        )
+        return result.stdout.strip()
+
+    return {
+        "commit": git("rev-parse", "HEAD") or None,
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def machine_info() -> Dict[str, Any]:
+    ffmpeg = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": ffmpeg.stdout.splitlines()[0] if ffmpeg.stdout else None,
+    }
+
+
+def make_video(path: str, duration: float, resolution: str):
+    """Vídeo H.264/AAC sintético: padrão de teste animado e um tom com bipes."""
+    subprocess.run(
+        [
+            "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc2=size={resolution}:rate=30:duration={duration}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:beep_factor=4:duration={duration}",
+            "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-shortest", path,
+        ],
+        check=True,
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def request(
+    port: int,
+    method: str,
+    path: str,
+    body: bytes | None = None,
+    headers: Dict[str, str] | None = None,
+    timeout: float = 3600,
+) -> Tuple[int, bytes, Dict[str, str]]:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.read(), dict(response.getheaders())
+    finally:
+        connection.close()
+
+
+def multipart_body(file_path: str, content_type: str) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    with open(file_path, "rb") as f:
+        content = f.read()
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; '
+        f'filename="{os.path.basename(file_path)}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+@contextmanager
+def app_server(server_env: Dict[str, str], workdir: str) -> Iterator[int]:
+    """Sobe 'src.main:app' com uvicorn e espera os modelos ficarem prontos."""
+    port = free_port()
+    environment = dict(os.environ)
+    environment.update(server_env)
+    environment["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [REPO_ROOT, environment.get("PYTHONPATH")])
+    )
+    log = open(os.path.join(workdir, f"server-{port}.log"), "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port)],
+        cwd=workdir,
+        env=environment,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    try:
+        deadline = time.monotonic() + READY_TIMEOUT
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"O servidor encerrou (veja {log.name}).")
+            try:
+                status, _, _ = request(port, "GET", "/health/ready", timeout=5)
+                if status == 200:
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("O servidor não ficou pronto a tempo.")
+            time.sleep(0.2)
+        yield port
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+
+
+def stage_totals(port: int) -> Dict[str, Tuple[float, float]]:
+    """Soma e contagem do histograma de etapas em '/metrics'."""
+    _, body, _ = request(port, "GET", "/metrics")
+    totals: Dict[str, List[float]] = {}
+    for line in body.decode().splitlines():
+        match = STAGE_METRIC.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            totals.setdefault(stage, [0.0, 0.0])[kind == "count"] = float(value)
+    return {stage: (total, count) for stage, (total, count) in totals.items()}
+
+
+def run_flow(
+    port: int, video_path: str, render_mode: str, unique_render: bool
+) -> Dict[str, Any]:
+    """Um fluxo completo: /generate com o vídeo e /render do resultado."""
+    result: Dict[str, Any] = {"ok": False}
+    body, content_type = multipart_body(video_path, "video/mp4")
+
+    start = time.perf_counter()
+    status, response, _ = request(
+        port, "POST", "/api/subtitles/generate", body, {"Content-Type": content_type}
+    )
+    result["generate"] = time.perf_counter() - start
+    if status != 200:
+        result["error"] = f"generate {status}: {response[:200].decode(errors='replace')}"
+        return result
+    generated = json.loads(response)
+
+    subtitles = generated["segments"]
+    if unique_render and subtitles:
+        # Legendas diferentes a cada fluxo: evita o RenderCache.
+        subtitles[0]["text"] += f" {uuid.uuid4().hex[:8]}"
+    speakers = sorted({segment["speaker"] for segment in subtitles})
+    render_request = {
+        "video_path": generated["video_path"],
+        "subtitles": subtitles,
+        "styles": {
+            "default": {"font_name": "Arial", "font_size": "28", "font_color": "#FFFFFF"},
+            "speakers": {
+                speaker: {"name": speaker, "color": "#FFCC00"} for speaker in speakers
+            },
+        },
+        "mode": render_mode,
+    }
+
+    render_start = time.perf_counter()
+    status, response, _ = request(
+        port,
+        "POST",
+        "/api/subtitles/render",
+        json.dumps(render_request).encode(),
+        {"Content-Type": "application/json"},
+    )
+    result["render"] = time.perf_counter() - render_start
+    result["total"] = time.perf_counter() - start
+    if status != 200:
+        result["error"] = f"render {status}: {response[:200].decode(errors='replace')}"
+        return result
+
+    result.update(ok=True, subtitles=len(subtitles), output_bytes=len(response))
+    return result
+
+
+def percentile(values: List[float], fraction: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(values: List[float]) -> Dict[str, float | None]:
+    return {
+        "mean": statistics.fmean(values) if values else None,
+        "p50": percentile(values, 0.5),
+        "p95": percentile(values, 0.95),
+    }
+
+
+def run_level(
+    port: int, video_path: str, concurrency: int, flows: int, args
+) -> Dict[str, Any]:
+    before = stage_totals(port)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(
+            executor.map(
+                lambda _: run_flow(port, video_path, args.render_mode, not args.cache),
+                range(flows),
+            )
+        )
+    wall = time.perf_counter() - start
+    after = stage_totals(port)
+
+    stages = {}
+    for stage, (total, count) in after.items():
+        previous_total, previous_count = before.get(stage, (0.0, 0.0))
+        if count > previous_count:
+            stages[stage] = {
+                "count": int(count - previous_count),
+                "mean": (total - previous_total) / (count - previous_count),
+            }
+
+    succeeded = [result for result in results if result["ok"]]
+    return {
+        "concurrency": concurrency,
+        "flows": flows,
+        "errors": [result["error"] for result in results if not result["ok"]],
+        "wall_time": wall,
+        "throughput": len(succeeded) / wall if wall > 0 else 0.0,
+        "subtitles": succeeded[0]["subtitles"] if succeeded else None,
+        "latency": {
+            key: summarize([result[key] for result in succeeded])
+            for key in ("generate", "render", "total")
+        },
+        "server_stages": stages,
+    }
+
+
+def print_level(name: str, level: Dict[str, Any]):
+    total = level["latency"]["total"]
+    generate = level["latency"]["generate"]
+    render = level["latency"]["render"]
+
+    def ms(value):
+        return f"{1000 * value:.0f}" if value is not None else "-"
+
+    print(
+        f"{name:<26} {level['concurrency']:>4} {level['flows']:>6} "
+        f"{level['throughput']:>9.2f} {ms(generate['p50']):>8} {ms(render['p50']):>8} "
+        f"{ms(total['p50']):>8} {ms(total['p95']):>8} {len(level['errors']):>6}"
+    )
+    stages = ", ".join(
+        f"{stage}={1000 * data['mean']:.0f}ms"
+        for stage, data in sorted(level["server_stages"].items())
+    )
+    if stages:
+        print(f"{'':<26} etapas (média): {stages}")
+
+
+def compare_reports(previous: Dict[str, Any], current: Dict[str, Any]):
+    """Variação de vazão e latência p50 por cenário e concorrência."""
+    def index(report):
+        return {
+            (scenario["name"], level["concurrency"]): level
+            for scenario in report["scenarios"]
+            for level in scenario["levels"]
+        }
+
+    old, new = index(previous), index(current)
+    print(
+        f"\nComparação com {previous['git']['commit'] or '?'} "
+        f"-> {current['git']['commit'] or '?'}:"
+    )
+    for key in sorted(old.keys() & new.keys()):
+        old_p50 = old[key]["latency"]["total"]["p50"]
+        new_p50 = new[key]["latency"]["total"]["p50"]
+        old_rate, new_rate = old[key]["throughput"], new[key]["throughput"]
+        latency = f"{100 * (new_p50 / old_p50 - 1):+.1f}%" if old_p50 and new_p50 else "-"
+        rate = f"{100 * (new_rate / old_rate - 1):+.1f}%" if old_rate else "-"
+        print(f"  {key[0]:<26} c={key[1]:<3} vazão {rate:>8}  p50 total {latency:>8}")
+
+
+def parse_list(value: str, cast):
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--backend", choices=["stub", "models"], default="stub")
+    parser.add_argument("--durations", default="10,60", help="segundos, separados por vírgula")
+    parser.add_argument("--resolutions", default="640x360,1280x720")
+    parser.add_argument(
+        "--densities", default="10,40", help="legendas por minuto (backend stub)"
+    )
+    parser.add_argument("--concurrency", default="1,2,4")
+    parser.add_argument(
+        "--flows", type=int, default=0, help="fluxos por nível (0 = 2x a concorrência)"
+    )
+    parser.add_argument("--warmup", type=int, default=1, help="fluxos descartados por cenário")
+    parser.add_argument("--render-mode", choices=["burn", "soft", "smart"], default="burn")
+    parser.add_argument(
+        "--cache", action="store_true", help="mantém os caches de resultado e de renderização"
+    )
+    parser.add_argument(
+        "--server-env",
+        action="append",
+        default=[],
+        metavar="CHAVE=VALOR",
+        help="variável de ambiente extra do servidor (ex: JOB_WORKERS=4)",
+    )
+    parser.add_argument("--output", default=None, help="arquivo JSON do relatório")
+    parser.add_argument("--compare", default=None, help="relatório anterior para comparação")
+    args = parser.parse_args()
+
+    durations = parse_list(args.durations, float)
+    resolutions = parse_list(args.resolutions, str)
+    densities = parse_list(args.densities, float) if args.backend == "stub" else [None]
+    levels = parse_list(args.concurrency, int)
+
+    extra_env = dict(item.split("=", 1) for item in args.server_env)
+    base_env = {
+        "INFERENCE_BACKEND": args.backend,
+        "PRELOAD_MODELS": "true",
+        "MAX_PENDING_JOBS": str(2 * max(levels) + 2),
+    }
+    if not args.cache:
+        base_env["RESULT_CACHE_ENABLED"] = "false"
+    base_env.update(extra_env)
+
+    report: Dict[str, Any] = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git": git_revision(),
+        "machine": machine_info(),
+        "config": {
+            "backend": args.backend,
+            "render_mode": args.render_mode,
+            "cache": args.cache,
+            "server_env": base_env,
+        },
+        "scenarios": [],
+    }
+
+    print(
+        f"{'cenário':<26} {'conc':>4} {'fluxos':>6} {'fluxos/s':>9} "
+        f"{'ger p50':>8} {'ren p50':>8} {'tot p50':>8} {'tot p95':>8} {'erros':>6}"
+    )
+    with tempfile.TemporaryDirectory(prefix="bench-e2e-") as workdir:
+        videos = {}
+        for duration in durations:
+            for resolution in resolutions:
+                path = os.path.join(workdir, f"lavfi-{duration:g}s-{resolution}.mp4")
+                make_video(path, duration, resolution)
+                videos[(duration, resolution)] = path
+
+        for density in densities:
+            server_env = dict(base_env)
+            if density is not None:
+                server_env.setdefault("STUB_SEGMENT_DURATION", str(60.0 / density))
+
+            with app_server(server_env, workdir) as port:
+                for (duration, resolution), video_path in videos.items():
+                    name = f"{duration:g}s-{resolution}" + (
+                        f"-{density:g}/min" if density is not None else ""
+                    )
+                    for _ in range(args.warmup):
+                        run_flow(port, video_path, args.render_mode, not args.cache)
+
+                    scenario = {
+                        "name": name,
+                        "duration": duration,
+                        "resolution": resolution,
+                        "density_per_minute": density,
+                        "video_bytes": os.path.getsize(video_path),
+                        "levels": [],
+                    }
+                    for concurrency in levels:
+                        flows = args.flows or 2 * concurrency
+                        level = run_level(port, video_path, concurrency, flows, args)
+                        scenario["levels"].append(level)
+                        print_level(name, level)
+                    report["scenarios"].append(scenario)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nRelatório gravado em {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare_reports(json.load(f), report)
+
+    failures = sum(
+        len(level["errors"]) for scenario in report["scenarios"] for level in scenario["levels"]
+    )
+    if failures:
+        print(f"\n{failures} fluxo(s) falharam; veja 'errors' no relatório.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
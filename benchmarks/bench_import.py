@@ -0,0 +1,98 @@
+"""
+Benchmark do tempo de inicialização (cold start) do processo da API.
+
+Importa 'src.main' em um interpretador novo com 'python -X importtime',
+mede o tempo total e lista os módulos mais caros. Falha (código de saída 1)
+se o import passar do orçamento ou se algum módulo pesado de ML
+(torch, whisper, pyannote) for carregado durante o boot: eles devem ser
+importados apenas pelos 'load_*_service'.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_import --budget 2.0 --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+HEAVY_MODULES = ("torch", "whisper", "pyannote")
+
+CHECK_SCRIPT = (
+    "import sys, src.main; "
+    "print(','.join(sorted({name.split('.')[0] for name in sys.modules})))"
+)
+
+
+def run_import(module: str) -> Tuple[float, Dict[str, int], List[str]]:
+    """
+    Importa 'module' em um subprocesso. Retorna o tempo total (s),
+    o tempo cumulativo (us) por módulo e os pacotes de topo carregados.
+    """
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHECK_SCRIPT.replace("src.main", module)],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+
+    cumulative: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+
+    total = cumulative.get(module, 0) / 1e6
+    loaded = result.stdout.strip().splitlines()[-1].split(",") if result.stdout else []
+    return total, cumulative, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="src.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--budget", type=float, default=2.0, help="tempo máximo (s) da mediana"
+    )
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    timings = []
+    cumulative: Dict[str, int] = {}
+    loaded: List[str] = []
+    for _ in range(args.runs):
+        total, cumulative, loaded = run_import(args.module)
+        timings.append(total)
+
+    median = statistics.median(timings)
+    print(
+        f"import {args.module}: mediana {median:.3f}s "
+        f"(min {min(timings):.3f}s, max {max(timings):.3f}s, {args.runs} execuções)"
+    )
+
+    print("\nMódulos mais caros (cumulativo, última execução):")
+    ranking = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)
+    for name, micros in ranking[: args.top]:
+        print(f"  {micros / 1e3:9.1f} ms  {name}")
+
+    heavy = [name for name in HEAVY_MODULES if name in loaded]
+    failed = False
+    if heavy:
+        print(f"\nFALHA: módulos pesados carregados no boot: {', '.join(heavy)}")
+        failed = True
+    if median > args.budget:
+        print(f"\nFALHA: mediana {median:.3f}s acima do orçamento de {args.budget:.3f}s")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print(f"\nOK: dentro do orçamento de {args.budget:.3f}s, sem módulos pesados.")
+
+
+if __name__ == "__main__":
+    main()
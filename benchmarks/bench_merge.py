@@ -0,0 +1,81 @@
+"""
+Micro-benchmark da fusão transcrição x diarização.
+
+Compara a varredura original O(N·M) ('find_dominant_speaker' por segmento)
+com a varredura ordenada ('assign_dominant_speakers') em intervalos sintéticos
+e confere que as atribuições são idênticas.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_merge --segments 10000 --turns 10000
+"""
+
+import argparse
+import random
+import time
+
+from src.services.merge import assign_dominant_speakers, find_dominant_speaker
+
+
+def make_segments(count: int, duration: float, rng: random.Random):
+    """Segmentos do Whisper: contíguos, com duração variável."""
+    step = duration / count
+    segments = []
+    cursor = 0.0
+    for _ in range(count):
+        length = step * rng.uniform(0.5, 1.5)
+        segments.append({"start": round(cursor, 3), "end": round(cursor + length, 3)})
+        cursor += step
+    return segments
+
+
+def make_turns(count: int, duration: float, speakers: int, rng: random.Random):
+    """Turnos da diarização: ordenados por início, com sobreposições ocasionais."""
+    step = duration / count
+    turns = []
+    for i in range(count):
+        start = i * step + rng.uniform(-0.3, 0.3) * step
+        end = start + step * rng.uniform(0.6, 1.8)
+        turns.append(
+            {
+                "speaker": f"SPEAKER_{rng.randrange(speakers):02}",
+                "start": round(max(start, 0.0), 3),
+                "end": round(end, 3),
+            }
+        )
+    turns.sort(key=lambda turn: turn["start"])
+    return turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--segments", type=int, default=10_000)
+    parser.add_argument("--turns", type=int, default=10_000)
+    parser.add_argument("--speakers", type=int, default=6)
+    parser.add_argument("--duration", type=float, default=3 * 3600.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    segments = make_segments(args.segments, args.duration, rng)
+    turns = make_turns(args.turns, args.duration, args.speakers, rng)
+
+    start = time.perf_counter()
+    baseline = [find_dominant_speaker(s["start"], s["end"], turns) for s in segments]
+    baseline_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sweep = assign_dominant_speakers(segments, turns)
+    sweep_time = time.perf_counter() - start
+
+    if baseline != sweep:
+        mismatches = sum(1 for a, b in zip(baseline, sweep) if a != b)
+        raise SystemExit(f"Atribuições divergentes em {mismatches} segmentos!")
+
+    print(f"segmentos={args.segments} turnos={args.turns}")
+    print(f"original (O(N·M)): {baseline_time:.3f}s")
+    print(f"varredura:         {sweep_time:.3f}s")
+    print(f"speedup:           {baseline_time / sweep_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
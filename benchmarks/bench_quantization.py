@@ -0,0 +1,160 @@
+"""
+Benchmark de velocidade e precisão do Whisper int8 versus fp32 na CPU.
+
+Transcreve o mesmo clipe local com o modelo fp32 e com o modelo quantizado
+(mesmo carregamento usado pelo serviço com WHISPER_CPU_QUANTIZATION=int8)
+e compara o tempo de carga, o tempo de transcrição (RTF), o tamanho dos pesos
+e a taxa de erro de palavras (WER). A referência do WER é a transcrição
+fp32 ou, se informado, um arquivo de texto com a transcrição correta.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_quantization --clip clip.mp4 --model base
+    python -m benchmarks.bench_quantization --clip clip.mp4 --reference clip.txt
+"""
+
+import argparse
+import io
+import re
+import statistics
+import tempfile
+import time
+import unicodedata
+from typing import List
+
+from src import env
+from src.services.audio import decode_audio
+from src.services.quantization import load_quantized_whisper
+
+
+def normalize_words(text: str) -> List[str]:
+    """Minúsculas, sem acentos nem pontuação, para o cálculo do WER."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r"[\w']+", text)
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """WER = distância de edição entre as palavras / palavras da referência."""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def state_dict_size(model) -> int:
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def run_variant(name: str, load, audio, runs: int, language: str | None):
+    start = time.perf_counter()
+    model = load()
+    load_time = time.perf_counter() - start
+
+    timings = []
+    text = ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = model.transcribe(audio, fp16=False, language=language)
+        timings.append(time.perf_counter() - start)
+        text = result["text"]
+
+    return {
+        "name": name,
+        "load": load_time,
+        "time": statistics.median(timings),
+        "size": state_dict_size(model),
+        "text": text,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clip", required=True, help="vídeo ou áudio local")
+    parser.add_argument("--model", default=env.TRANSCRIPTION_MODEL)
+    parser.add_argument("--reference", help="arquivo de texto com a transcrição correta")
+    parser.add_argument("--language", default=None)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=0, help="0 = padrão do PyTorch")
+    args = parser.parse_args()
+
+    import torch
+    import whisper
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    audio = decode_audio(args.clip)
+    duration = len(audio) / env.TARGET_SAMPLE_RATE
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        variants = [
+            run_variant(
+                "fp32",
+                lambda: whisper.load_model(args.model, device="cpu"),
+                audio,
+                args.runs,
+                args.language,
+            ),
+            # Diretório vazio: mede também a quantização na primeira carga.
+            run_variant(
+                "int8",
+                lambda: load_quantized_whisper(args.model, cache_dir),
+                audio,
+                args.runs,
+                args.language,
+            ),
+        ]
+        start = time.perf_counter()
+        load_quantized_whisper(args.model, cache_dir)
+        cached_load = time.perf_counter() - start
+
+    if args.reference:
+        with open(args.reference, "r", encoding="utf-8") as f:
+            reference, reference_name = f.read(), "referência"
+    else:
+        reference, reference_name = variants[0]["text"], "fp32"
+
+    print(
+        f"Clipe: {args.clip} ({duration:.1f}s), modelo '{args.model}', "
+        f"{torch.get_num_threads()} threads, mediana de {args.runs} execuções"
+    )
+    print(
+        f"{'variante':<8} {'carga (s)':>10} {'transcrição (s)':>16} {'RTF':>7} "
+        f"{'pesos (MiB)':>12} {'WER vs ' + reference_name:>16}"
+    )
+    for variant in variants:
+        wer = word_error_rate(reference, variant["text"])
+        print(
+            f"{variant['name']:<8} {variant['load']:>10.2f} {variant['time']:>16.2f} "
+            f"{variant['time'] / duration:>7.3f} {variant['size'] / 2**20:>12.1f} "
+            f"{100 * wer:>15.1f}%"
+        )
+
+    fp32, int8 = variants
+    print(
+        f"\nint8: {fp32['time'] / int8['time']:.2f}x mais rápido, pesos "
+        f"{fp32['size'] / int8['size']:.2f}x menores; carga do checkpoint "
+        f"em cache: {cached_load:.2f}s"
+    )
+    if not args.reference:
+        print(f"\nTexto fp32: {fp32['text'].strip()[:300]}")
+        print(f"Texto int8: {int8['text'].strip()[:300]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark da renderização com legendas queimadas: processo único x paralela
+x inteligente (reencode apenas dos trechos com legenda).
+
+Gera um vídeo sintético com as fontes 'lavfi' do ffmpeg (testsrc2 + sine),
+cria legendas sintéticas e mede o tempo de cada caminho de renderização.
+Também confere se as saídas têm o mesmo número de quadros e se decodificam
+sem erros (trechos copiados e reencodados incompatíveis aparecem aqui).
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_render --duration 300 --size 1920x1080 --workers 4 8
+    python -m benchmarks.bench_render --density 0.1 --spacing 30   # legendas esparsas
+"""
+
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+from src.models.subtitle import SubtitleSegment
+from src.services.rendering import RenderingService
+
+STYLE_OPTIONS = {
+    "default": {"font_name": "Arial", "font_size": "28", "font_color": "#FFFFFF"},
+    "speakers": {
+        "Interlocutor 1": {"name": "Ana", "color": "#FFD700"},
+        "Interlocutor 2": {"name": "Bruno", "color": "#00BFFF"},
+    },
+}
+
+
+def make_video(path: str, duration: float, size: str, fps: int, gop: int):
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc2=size={size}:rate={fps}",
+            "-f",
+            "lavfi",
+            "-i",
+            "sine=frequency=440:sample_rate=48000",
+            "-t",
+            str(duration),
+            "-c:v",
+            "libx264",
+            "-preset",
+            "veryfast",
+            "-g",
+            str(gop),
+            "-c:a",
+            "aac",
+            path,
+            "-y",
+        ],
+        check=True,
+    )
+
+
+def make_subtitles(duration: float, density: float, step: float = 4.0):
+    """
+    Uma legenda a cada 'step' segundos; 'density' = fração do tempo coberta.
+    """
+    subtitles = []
+    cursor = 0.0
+    index = 0
+    while cursor < duration:
+        subtitles.append(
+            SubtitleSegment(
+                start=cursor,
+                end=min(cursor + step * density, duration),
+                text=f"Legenda sintética número {index}",
+                speaker=f"Interlocutor {index % 2 + 1}",
+            )
+        )
+        cursor += step
+        index += 1
+    return subtitles
+
+
+def count_frames(path: str) -> int:
+    """Conta os quadros de vídeo decodificando o arquivo."""
+    result = subprocess.run(
+        ["ffmpeg", "-i", path, "-map", "0:v:0", "-f", "null", "-"],
+        capture_output=True,
+        text=True,
+    )
+    frames = [line for line in result.stderr.splitlines() if "frame=" in line]
+    return int(frames[-1].split("frame=")[1].split()[0]) if frames else -1
+
+
+def decode_errors(path: str) -> int:
+    """Decodifica o arquivo inteiro e conta as linhas de erro do ffmpeg."""
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", path, "-f", "null", "-"],
+        capture_output=True,
+        text=True,
+    )
+    errors = result.stderr.splitlines()
+    if result.returncode != 0 and not errors:
+        errors = [f"código de saída {result.returncode}"]
+    for line in errors[:5]:
+        print(f"  erro de decodificação: {line}")
+    return len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=120.0)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--gop", type=int, default=60)
+    parser.add_argument("--density", type=float, default=0.8)
+    parser.add_argument("--spacing", type=float, default=4.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    service = RenderingService()
+    subtitles = make_subtitles(args.duration, args.density, args.spacing)
+
+    with tempfile.TemporaryDirectory(prefix="bench_render_") as work_dir:
+        source = os.path.join(work_dir, "source.mp4")
+        make_video(source, args.duration, args.size, args.fps, args.gop)
+        source_frames = count_frames(source)
+
+        output = os.path.join(work_dir, "single.mp4")
+        start = time.perf_counter()
+        service._render_single_process(source, output, subtitles, STYLE_OPTIONS)
+        single_time = time.perf_counter() - start
+        print(
+            f"processo único: {single_time:.2f}s "
+            f"(quadros: {count_frames(output)}/{source_frames}, "
+            f"erros: {decode_errors(output)})"
+        )
+
+        for workers in args.workers:
+            output = os.path.join(work_dir, f"parallel_{workers}.mp4")
+            start = time.perf_counter()
+            service.render_video_parallel(
+                source, output, subtitles, STYLE_OPTIONS, workers=workers
+            )
+            elapsed = time.perf_counter() - start
+            print(
+                f"paralelo ({workers} workers): {elapsed:.2f}s "
+                f"speedup={single_time / elapsed:.2f}x "
+                f"(quadros: {count_frames(output)}/{source_frames}, "
+                f"erros: {decode_errors(output)})"
+            )
+
+        output = os.path.join(work_dir, "smart.mp4")
+        start = time.perf_counter()
+        service.render_video_smart(source, output, subtitles, STYLE_OPTIONS)
+        elapsed = time.perf_counter() - start
+        print(
+            f"inteligente: {elapsed:.2f}s speedup={single_time / elapsed:.2f}x "
+            f"(quadros: {count_frames(output)}/{source_frames}, "
+            f"erros: {decode_errors(output)})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,197 @@ DIARIZATION_MODEL: str = os.environ.get(
     "DIARIZATION_MODEL", "pyannote/speaker-diarization-community-1"
 )
 
+# O áudio decodificado uma vez é compartilhado por Whisper, VAD e Pyannote; o Whisper
+# só aceita 16 kHz (whisper.audio.SAMPLE_RATE), então outros valores são recusados.
 TARGET_SAMPLE_RATE: int = int(os.environ.get("TARGET_SAMPLE_RATE", 16000))
 
+if TARGET_SAMPLE_RATE != 16000:
+    raise ValueError(
+        f"TARGET_SAMPLE_RATE={TARGET_SAMPLE_RATE} não suportado: o áudio compartilhado "
+        "com o Whisper precisa estar em 16000 Hz."
+    )
+
 HF_TOKEN: str | None = os.environ.get("HF_TOKEN")
+
+AUDIO_USE_MMAP: bool = os.environ.get("AUDIO_USE_MMAP", "False").lower() == "true"
+
+AUDIO_TEMP_DIR: str | None = os.environ.get("AUDIO_TEMP_DIR")
+
+# "sequential" executa Whisper e depois Pyannote; "concurrent" executa os dois em paralelo.
+PIPELINE_MODE: str = os.environ.get("PIPELINE_MODE", "sequential").lower()
+
+# Fração das threads de CPU destinadas ao Whisper no modo concorrente (o resto vai
+# para o Pyannote). A divisão é exata quando o Whisper roda no pool de processos
+# (TRANSCRIPTION_WORKERS > 1); no mesmo processo, as duas etapas usam a menor parte.
+TRANSCRIPTION_THREAD_SHARE: float = float(
+    os.environ.get("TRANSCRIPTION_THREAD_SHARE", 0.5)
+)
+
+# Total de threads de CPU a dividir entre os modelos (0 = os.cpu_count()).
+TORCH_NUM_THREADS: int = int(os.environ.get("TORCH_NUM_THREADS", 0))
+
+# Número de workers que executam jobs de geração em paralelo.
+JOB_WORKERS: int = int(os.environ.get("JOB_WORKERS", 1))
+
+# Workers dos jobs de renderização (0 = RENDER_MAX_CONCURRENT), em um pool separado
+# da geração; os encoders continuam limitados pelo RenderScheduler.
+RENDER_JOB_WORKERS: int = int(os.environ.get("RENDER_JOB_WORKERS", 0))
+
+# Workers dos jobs de prévia: pool próprio, para não esperar atrás de gerações
+# e renderizações completas (o RenderScheduler dá prioridade às prévias).
+PREVIEW_JOB_WORKERS: int = int(os.environ.get("PREVIEW_JOB_WORKERS", 2))
+
+# Máximo de jobs na fila + em execução; excedentes recebem HTTP 429.
+MAX_PENDING_JOBS: int = int(os.environ.get("MAX_PENDING_JOBS", 8))
+
+# Tempo (s) que o resultado de um job concluído fica disponível para consulta.
+JOB_RESULT_TTL: int = int(os.environ.get("JOB_RESULT_TTL", 3600))
+
+RESULT_CACHE_ENABLED: bool = (
+    os.environ.get("RESULT_CACHE_ENABLED", "True").lower() == "true"
+)
+
+RESULT_CACHE_DIR: str = os.environ.get("RESULT_CACHE_DIR", "cache/results")
+
+# Tamanho máximo do cache de resultados em disco (padrão: 1 GiB).
+RESULT_CACHE_MAX_BYTES: int = int(
+    os.environ.get("RESULT_CACHE_MAX_BYTES", 1024 * 1024 * 1024)
+)
+
+# Tamanho dos blocos usados para gravar uploads em disco (padrão: 8 MiB).
+UPLOAD_CHUNK_SIZE: int = int(os.environ.get("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+
+# Extrai o áudio com ffmpeg enquanto o upload ainda está sendo recebido.
+STREAMING_AUDIO_EXTRACTION: bool = (
+    os.environ.get("STREAMING_AUDIO_EXTRACTION", "False").lower() == "true"
+)
+
+# Processos ffmpeg usados para queimar legendas em paralelo (1 = processo único).
+# A renderização inteira ocupa um só encoder do RenderScheduler (RENDER_MAX_CONCURRENT)
+# e suas partes dividem as threads dele.
+RENDER_PARALLEL_WORKERS: int = int(os.environ.get("RENDER_PARALLEL_WORKERS", 1))
+
+# Encoders libx264 executados ao mesmo tempo; os demais aguardam na fila (prévias primeiro).
+RENDER_MAX_CONCURRENT: int = int(os.environ.get("RENDER_MAX_CONCURRENT", 2))
+
+# Threads de cada encoder (0 = os.cpu_count() dividido por RENDER_MAX_CONCURRENT).
+RENDER_ENCODER_THREADS: int = int(os.environ.get("RENDER_ENCODER_THREADS", 0))
+
+# Duração mínima (s) do vídeo para usar a renderização paralela.
+RENDER_PARALLEL_MIN_DURATION: float = float(
+    os.environ.get("RENDER_PARALLEL_MIN_DURATION", 120)
+)
+
+# Duração máxima (s) da janela aceita pela rota /preview.
+PREVIEW_MAX_DURATION: float = float(os.environ.get("PREVIEW_MAX_DURATION", 30))
+
+# Linhas finais do stderr do ffmpeg mantidas para as mensagens de erro.
+FFMPEG_STDERR_LINES: int = int(os.environ.get("FFMPEG_STDERR_LINES", 200))
+
+RENDER_CACHE_DIR: str = os.environ.get("RENDER_CACHE_DIR", "cache/renders")
+
+# Limites do cache de vídeos renderizados (padrão: 10 GiB e 2 dias; 0 = sem limite).
+RENDER_CACHE_MAX_BYTES: int = int(
+    os.environ.get("RENDER_CACHE_MAX_BYTES", 10 * 1024 * 1024 * 1024)
+)
+RENDER_CACHE_MAX_AGE: float = float(os.environ.get("RENDER_CACHE_MAX_AGE", 2 * 86400))
+
+# Arquivos parciais sem escrita há mais que isso (s) são de renderizações interrompidas
+# e são removidos; o ffmpeg atualiza o mtime enquanto escreve.
+RENDER_CACHE_PARTIAL_MAX_AGE: float = float(
+    os.environ.get("RENDER_CACHE_PARTIAL_MAX_AGE", 3600)
+)
+
+# Retenção dos uploads em 'uploads/' (padrão: 1 dia; 0 = sem limite).
+# Vídeos de sessões válidas e de jobs não concluídos nunca são removidos.
+UPLOADS_MAX_AGE: float = float(os.environ.get("UPLOADS_MAX_AGE", 86400))
+UPLOADS_MAX_BYTES: int = int(os.environ.get("UPLOADS_MAX_BYTES", 0))
+
+# Intervalo (s) entre as limpezas de 'uploads/' (0 = desativado).
+UPLOADS_PRUNE_INTERVAL: float = float(os.environ.get("UPLOADS_PRUNE_INTERVAL", 3600))
+
+# Banco SQLite das sessões de legendas (segmentos e estilos editados no servidor).
+SESSIONS_DB_PATH: str = os.environ.get("SESSIONS_DB_PATH", "cache/sessions.db")
+
+# Sessões sem alterações por mais que isso (s) são removidas (padrão: 7 dias; 0 = sem limite).
+SESSIONS_MAX_AGE: float = float(os.environ.get("SESSIONS_MAX_AGE", 7 * 86400))
+
+# Sessões mantidas em memória já prontas para renderizar (0 = sempre lê do banco).
+SESSIONS_MEMORY_SIZE: int = int(os.environ.get("SESSIONS_MEMORY_SIZE", 16))
+
+# Carrega e aquece os modelos na inicialização da API em vez de na primeira requisição.
+PRELOAD_MODELS: bool = os.environ.get("PRELOAD_MODELS", "False").lower() == "true"
+
+# Duração (s) do áudio sintético usado no aquecimento dos modelos (0 = sem aquecimento).
+WARMUP_DURATION: float = float(os.environ.get("WARMUP_DURATION", 2))
+
+# Workers criados por 'python -m src.serve' (modelos compartilhados via fork).
+SERVE_WORKERS: int = int(os.environ.get("SERVE_WORKERS", 2))
+
+# Intervalo (s) do log de memória por worker em 'src.serve' (0 = desativado).
+MEMORY_REPORT_INTERVAL: float = float(os.environ.get("MEMORY_REPORT_INTERVAL", 60))
+
+# "whisper" transcreve o áudio inteiro; "chunked" divide o áudio nas pausas (VAD),
+# descarta o silêncio e transcreve os trechos em paralelo.
+TRANSCRIPTION_ENGINE: str = os.environ.get("TRANSCRIPTION_ENGINE", "whisper").lower()
+
+# Processos que transcrevem chunks em paralelo (1 = no próprio processo).
+# Cada processo carrega sua própria cópia do modelo Whisper.
+TRANSCRIPTION_WORKERS: int = int(os.environ.get("TRANSCRIPTION_WORKERS", 1))
+
+# Origem das regiões de fala no modo "chunked": "energy" (VAD por energia) ou
+# "diarization" (turnos do Pyannote; executa a diarização primeiro no modo sequencial).
+VAD_SOURCE: str = os.environ.get("VAD_SOURCE", "energy").lower()
+
+# Pausa mínima (s) que separa duas regiões de fala e margem (s) mantida em volta de cada uma.
+VAD_MIN_SILENCE: float = float(os.environ.get("VAD_MIN_SILENCE", 1.0))
+VAD_PADDING: float = float(os.environ.get("VAD_PADDING", 0.2))
+
+# Quadros acima do ruído de fundo + esta margem (dB) são considerados fala.
+VAD_ENERGY_MARGIN_DB: float = float(os.environ.get("VAD_ENERGY_MARGIN_DB", 10))
+
+# Duração máxima (s) de cada chunk enviado ao Whisper.
+VAD_CHUNK_DURATION: float = float(os.environ.get("VAD_CHUNK_DURATION", 30))
+
+# Backend de inferência: "models" (Whisper e Pyannote) ou "stub" (resultados
+# sintéticos, sem modelos; usado por 'benchmarks/bench_e2e.py').
+INFERENCE_BACKEND: str = os.environ.get("INFERENCE_BACKEND", "models").lower()
+
+# Com INFERENCE_BACKEND="stub": duração (s) de cada legenda e número de interlocutores.
+STUB_SEGMENT_DURATION: float = float(os.environ.get("STUB_SEGMENT_DURATION", 3))
+STUB_SPEAKERS: int = int(os.environ.get("STUB_SPEAKERS", 2))
+
+# Adiciona o cabeçalho 'Server-Timing' (duração de cada etapa) às respostas da API.
+METRICS_TIMING_HEADERS: bool = (
+    os.environ.get("METRICS_TIMING_HEADERS", "False").lower() == "true"
+)
+
+# Diarização em janelas (memória limitada em gravações longas): duração (s) de
+# cada janela lida do PCM e sobreposição (s) entre janelas vizinhas.
+# 0 = o áudio inteiro em uma única passada do Pyannote.
+DIARIZATION_WINDOW_DURATION: float = float(
+    os.environ.get("DIARIZATION_WINDOW_DURATION", 0)
+)
+DIARIZATION_WINDOW_OVERLAP: float = float(
+    os.environ.get("DIARIZATION_WINDOW_OVERLAP", 30)
+)
+
+# Distância de cosseno máxima entre embeddings para considerar dois locutores
+# de janelas diferentes como a mesma pessoa.
+DIARIZATION_LINK_THRESHOLD: float = float(
+    os.environ.get("DIARIZATION_LINK_THRESHOLD", 0.7)
+)
+
+# Quantização do Whisper na CPU: "none" (fp32) ou "int8" (quantização dinâmica das camadas lineares).
+WHISPER_CPU_QUANTIZATION: str = os.environ.get("WHISPER_CPU_QUANTIZATION", "none").lower()
+
+# Diretório dos checkpoints quantizados gerados na primeira carga.
+WHISPER_QUANTIZED_CACHE_DIR: str = os.environ.get(
+    "WHISPER_QUANTIZED_CACHE_DIR", "cache/models"
+)
+
+# Perfil de decodificação padrão do Whisper: "fast", "balanced" (padrões da biblioteca) ou "accurate".
+TRANSCRIPTION_PROFILE: str = os.environ.get("TRANSCRIPTION_PROFILE", "balanced").lower()
+
+# Idioma forçado na transcrição (ex: "pt"); vazio = detecção automática.
+TRANSCRIPTION_LANGUAGE: str | None = os.environ.get("TRANSCRIPTION_LANGUAGE") or None
@@ -1,10 +1,20 @@
+import asyncio
 import logging
+import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from src import env
 from src.routes import subtitle
+from src.services.cache import load_render_cache
+from src.services.jobs import load_job_manager
+from src.services.memory import read_memory_usage
+from src.services.metrics import MetricsMiddleware, load_metrics_registry
+from src.services.startup import load_model_readiness
 
 logging.basicConfig(
     level=logging.INFO,
@@ -14,10 +24,50 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+
+async def _prune_uploads_periodically():
+    """
+    Limpa 'uploads/' e o RenderCache (inclusive parciais órfãos) a cada
+    UPLOADS_PRUNE_INTERVAL segundos, fora das requisições.
+    """
+    while True:
+        try:
+            await run_in_threadpool(subtitle.prune_uploads)
+            await run_in_threadpool(load_render_cache().prune)
+        except Exception as e:
+            logger.error(f"Startup: Falha ao limpar os uploads: {e}", exc_info=True)
+        await asyncio.sleep(env.UPLOADS_PRUNE_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Com PRELOAD_MODELS, carrega e aquece os modelos em segundo plano:
+    o servidor aceita conexões (liveness) enquanto a readiness
+    só é sinalizada quando os modelos estão prontos.
+    A limpeza periódica dos uploads também roda em segundo plano.
+    """
+    readiness = load_model_readiness()
+    preload_task = None
+    if readiness.preload:
+        preload_task = asyncio.create_task(
+            run_in_threadpool(readiness.preload_models)
+        )
+    prune_task = None
+    if env.UPLOADS_PRUNE_INTERVAL > 0:
+        prune_task = asyncio.create_task(_prune_uploads_periodically())
+    yield
+    if prune_task is not None:
+        prune_task.cancel()
+    if preload_task is not None and not preload_task.done():
+        logger.info("Startup: Encerrando antes do fim do pré-carregamento.")
+
+
 app = FastAPI(
     title="API de Legendas e Narração",
     description="Backend para processamento de vídeo (Whisper, Pyannote) e TTS.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 logging.info(f"Configurando CORS para as origens: {env.CORS_ORIGINS}")
@@ -29,6 +79,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Mede todas as requisições; com METRICS_TIMING_HEADERS, adiciona 'Server-Timing'.
+app.add_middleware(MetricsMiddleware, timing_headers=env.METRICS_TIMING_HEADERS)
+
 app.include_router(subtitle.router, prefix="/api/subtitles", tags=["Subtitles"])
 
 
@@ -36,3 +89,44 @@ app.include_router(subtitle.router, prefix="/api/subtitles", tags=["Subtitles"])
 def read_root():
     """Rota principal para verificar se a API está online."""
     return {"status": "Backend is running!"}
+
+
+@app.get("/health/live")
+def health_live():
+    """Liveness: o processo está de pé e respondendo."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+def health_ready():
+    """
+    Readiness: os modelos estão carregados e aquecidos (com PRELOAD_MODELS).
+    Retorna 503 enquanto o pré-carregamento não termina ou se ele falhou.
+    """
+    readiness = load_model_readiness()
+    return JSONResponse(
+        content=readiness.to_dict(), status_code=200 if readiness.is_ready else 503
+    )
+
+
+@app.get("/health/memory")
+def health_memory():
+    """
+    Memória do worker que atendeu a requisição (bytes): 'rss' inclui as
+    páginas compartilhadas com outros workers, 'pss' as divide entre eles.
+    """
+    return {"pid": os.getpid(), **read_memory_usage()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Métricas no formato texto do Prometheus: duração por etapa, fator de
+    tempo real, duração das requisições, jobs e memória do worker.
+    """
+    # Garante que as métricas de jobs existam antes do primeiro job.
+    load_job_manager()
+    return PlainTextResponse(
+        load_metrics_registry().render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,30 @@
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+
+class JobSubmitResponse(BaseModel):
+    """
+    Resposta imediata das rotas assíncronas (/generate/jobs e /render/jobs).
+    """
+
+    job_id: str
+    status: str
+
+
+class JobStatusResponse(BaseModel):
+    """
+    Estado de um job consultado via polling em /jobs/{job_id}.
+    """
+
+    job_id: str
+    kind: str
+    status: str
+    stage: str
+    progress: float
+    details: Dict[str, Any] = {}
+    error: Optional[str] = None
+    result: Optional[Any] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
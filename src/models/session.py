@@ -0,0 +1,57 @@
+from typing import Any, List, Literal, Optional
+
+from pydantic import BaseModel
+
+from src.models.subtitle import StyleOptions, SubtitleSegment
+
+
+class SessionCreateRequest(BaseModel):
+    """
+    Cria uma sessão a partir de legendas já existentes no cliente
+    (o /generate já cria uma sessão e retorna o 'session_id').
+    """
+
+    video_path: str
+
+    subtitles: List[SubtitleSegment]
+
+    styles: Optional[StyleOptions] = None
+
+
+class PatchOperation(BaseModel):
+    """
+    Uma operação do patch (subconjunto do JSON Patch, RFC 6902).
+    Ex: {"op": "replace", "path": "/segments/12/text", "value": "Olá"}.
+    """
+
+    op: Literal["add", "remove", "replace"]
+
+    path: str
+
+    value: Any = None
+
+
+class SessionPatchRequest(BaseModel):
+    """
+    Corpo do PATCH de uma sessão. Com 'version', o patch é rejeitado (409)
+    se a sessão tiver sido alterada depois dessa versão.
+    """
+
+    operations: List[PatchOperation]
+
+    version: Optional[int] = None
+
+
+class SessionVersionResponse(BaseModel):
+    """Resposta da criação e do PATCH: só o id e a nova versão."""
+
+    session_id: str
+    version: int
+
+
+class SessionRenderRequest(BaseModel):
+    """Renderização de uma sessão: legendas e estilos vêm do servidor."""
+
+    mode: Literal["burn", "soft", "smart"] = "burn"
+
+    container: Literal["mp4", "mkv"] = "mp4"
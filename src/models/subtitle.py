@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Dict
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Dict, Literal, Optional
 
 
 class SubtitleSegment(BaseModel):
@@ -55,3 +55,54 @@ class RenderRequest(BaseModel):
     subtitles: List[SubtitleSegment]
 
     styles: StyleOptions
+
+    # "burn" queima as legendas (reencode); "soft" adiciona uma faixa selecionável;
+    # "smart" queima as legendas reencodando apenas os trechos que as contêm.
+    mode: Literal["burn", "soft", "smart"] = "burn"
+
+    container: Literal["mp4", "mkv"] = "mp4"
+
+
+class PreviewWindow(BaseModel):
+    """
+    Janela [start, end) e altura de uma prévia
+    (usada pelo /preview e pela prévia de sessões).
+    """
+
+    start: float = Field(ge=0)
+
+    end: float
+
+    # Altura do vídeo de prévia (a largura acompanha a proporção original).
+    height: Optional[int] = Field(default=360, ge=64, le=2160)
+
+    @model_validator(mode="after")
+    def _check_window(self):
+        if self.end <= self.start:
+            raise ValueError("'end' deve ser maior que 'start'.")
+        return self
+
+
+class PreviewRequest(PreviewWindow):
+    """
+    Corpo da rota /preview: renderiza apenas a janela [start, end)
+    em baixa resolução, para conferir estilos rapidamente.
+    """
+
+    video_path: str
+
+    subtitles: List[SubtitleSegment]
+
+    styles: StyleOptions
+
+
+class ExportRequest(BaseModel):
+    """
+    Corpo da rota /export: gera apenas o arquivo de legenda, sem ffmpeg.
+    """
+
+    subtitles: List[SubtitleSegment]
+
+    styles: StyleOptions
+
+    format: Literal["ass", "srt", "vtt"] = "srt"
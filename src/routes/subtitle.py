@@ -1,18 +1,88 @@
+import asyncio
+import json
 import logging
 import os
-import shutil
 import uuid
+from typing import Any, Callable, Dict, Iterable, List, Literal
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
-from fastapi.responses import FileResponse
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from starlette.background import BackgroundTask
 
-from src.models.subtitle import RenderRequest
+from src.models.job import JobStatusResponse, JobSubmitResponse
+from src import env
+from src.models.session import (
+    SessionCreateRequest,
+    SessionPatchRequest,
+    SessionRenderRequest,
+    SessionVersionResponse,
+)
+from src.models.subtitle import (
+    ExportRequest,
+    PreviewRequest,
+    PreviewWindow,
+    RenderRequest,
+    StyleOptions,
+    SubtitleSegment,
+)
+from src.services.cache import (
+    RenderCache,
+    hash_file_cached,
+    load_render_cache,
+    load_result_cache,
+    prune_directory,
+    remember_file_hash,
+)
+from src.services.ffmpeg import RenderCancelledError, RenderProgress
+from src.services.jobs import (
+    JOB_CANCELLED,
+    JOB_FAILED,
+    Job,
+    JobManager,
+    JobQueueFullError,
+    load_job_manager,
+)
+from src.services.metrics import load_metrics_registry
+from src.services.sessions import (
+    SessionNotFoundError,
+    SessionPatchError,
+    SessionStore,
+    SessionVersionError,
+    load_session_store,
+)
 from src.services.subtitle import SubtitleService, load_subtitle_service
+from src.services.transcription import resolve_decoding_options
+from src.services.upload import (
+    UploadResult,
+    iter_request_body,
+    iter_upload_file,
+    save_upload_stream,
+)
 
 UPLOADS_DIR = "uploads"
 OUTPUT_DIR = "output"
 
+VIDEO_MEDIA_TYPES = {".mp4": "video/mp4", ".mkv": "video/x-matroska"}
+
+SUBTITLE_MEDIA_TYPES = {
+    "ass": "text/x-ssa",
+    "srt": "application/x-subrip",
+    "vtt": "text/vtt",
+}
+
+# Intervalo (s) entre as verificações de desconexão do cliente durante o /render e o /preview.
+DISCONNECT_POLL_INTERVAL = 1.0
+
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
@@ -31,56 +101,484 @@ def get_subtitle_service() -> SubtitleService:
         )
 
 
-router = APIRouter()
+def get_job_manager() -> JobManager:
+    """Dependência do FastAPI que fornece o gerenciador de jobs."""
+    return load_job_manager()
 
 
-@router.post("/generate")
-async def generate_subtitles_route(
-    file: UploadFile = File(...),
-    service: SubtitleService = Depends(get_subtitle_service),
-):
-    """
-    Endpoint para upload de vídeo (Etapa 1).
-    Salva o vídeo em 'uploads/' e retorna dados + caminho.
-    """
-    if not file.content_type.startswith("video/"):
+def get_session_store() -> SessionStore:
+    """Dependência do FastAPI que fornece o armazenamento de sessões."""
+    return load_session_store()
+
+
+def _ensure_capacity(job_manager: JobManager):
+    """Rejeita a requisição com 429 antes de qualquer trabalho se a fila estiver cheia."""
+    if job_manager.is_full():
+        logging.warning("API: Limite de jobs pendentes atingido. Rejeitando requisição.")
+        raise HTTPException(
+            status_code=429,
+            detail="Servidor ocupado. Tente novamente em instantes.",
+        )
+
+
+def _submit_job(
+    job_manager: JobManager,
+    kind: str,
+    func: Callable[[Job], Any],
+    on_discard: Callable[[], None] | None = None,
+    files: Iterable[str] = (),
+) -> Job:
+    try:
+        return job_manager.submit(kind, func, on_discard, files)
+    except JobQueueFullError as e:
+        logging.warning(f"API: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail="Servidor ocupado. Tente novamente em instantes.",
+        )
+
+
+def _ensure_video_content_type(content_type: str | None):
+    if not content_type or not content_type.startswith("video/"):
         raise HTTPException(
             status_code=400,
             detail="Tipo de arquivo inválido. Por favor, envie um vídeo.",
         )
 
-    persistent_video_path = None
-    try:
-        suffix = os.path.splitext(file.filename)[1]
-        video_filename = f"{uuid.uuid4()}{suffix}"
-        persistent_video_path = os.path.join(UPLOADS_DIR, video_filename)
 
-        logging.info(f"API: Salvando upload em {persistent_video_path}")
-        with open(persistent_video_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+async def _save_chunks(chunks, filename: str | None) -> UploadResult:
+    """
+    Grava o upload em 'uploads/' em blocos, calculando o hash enquanto
+    os bytes chegam e sem bloquear o event loop.
+    """
+    suffix = os.path.splitext(filename or "")[1]
+    video_filename = f"{uuid.uuid4()}{suffix}"
+    persistent_video_path = os.path.join(UPLOADS_DIR, video_filename)
 
+    try:
+        logging.info(f"API: Salvando upload em {persistent_video_path}")
+        with load_metrics_registry().time_stage("upload"):
+            upload = await save_upload_stream(chunks, persistent_video_path)
+        remember_file_hash(persistent_video_path, upload.content_hash)
+        return upload
     except Exception as e:
+        if os.path.exists(persistent_video_path):
+            os.remove(persistent_video_path)
         logging.error(f"API: Erro ao salvar arquivo de upload: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Erro ao salvar arquivo: {e}")
+
+
+async def _save_upload(file: UploadFile) -> UploadResult:
+    """Valida e salva um upload multipart."""
+    _ensure_video_content_type(file.content_type)
+    try:
+        return await _save_chunks(iter_upload_file(file), file.filename)
     finally:
         await file.close()
 
+
+def prune_uploads() -> List[str]:
+    """
+    Aplica a retenção de 'uploads/' (UPLOADS_MAX_AGE, UPLOADS_MAX_BYTES),
+    preservando os vídeos de sessões válidas e de jobs não concluídos.
+    Executada periodicamente pela aplicação, fora das requisições.
+    """
+    in_use = load_session_store().video_paths() | load_job_manager().files_in_use()
+    in_use = {os.path.abspath(path) for path in in_use}
+    removed = prune_directory(
+        UPLOADS_DIR,
+        env.UPLOADS_MAX_BYTES,
+        env.UPLOADS_MAX_AGE,
+        skip=lambda name: os.path.abspath(os.path.join(UPLOADS_DIR, name)) in in_use,
+    )
+    if removed:
+        logging.info(f"API: {len(removed)} uploads antigos removidos.")
+    return removed
+
+
+def _discard_upload(upload: UploadResult):
+    for path in (upload.video_path, upload.pcm_path):
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def _ensure_decoding_profile(profile: str | None, language: str | None):
+    try:
+        resolve_decoding_options(profile, language)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _generate_job(
+    service: SubtitleService,
+    upload: UploadResult,
+    profile: str | None = None,
+    language: str | None = None,
+    emit: Callable[[str, Dict[str, Any]], None] | None = None,
+) -> Callable[[Job], Dict[str, Any]]:
+    """
+    Cria a função executada pelo worker para gerar as legendas.
+    Com 'emit(evento, dados)', publica os segmentos parciais, os interlocutores
+    e o fim do processamento (usado pelo /generate/events).
+    """
+    persistent_video_path = upload.video_path
+
+    def run(job: Job) -> Dict[str, Any]:
+        if emit is not None:
+            emit("started", {"job_id": job.id})
+        try:
+            logging.info(
+                f"API: Chamando SubtitleService.generate_subtitle_data para {persistent_video_path}"
+            )
+            timings: Dict[str, float] = {}
+            metadata: Dict[str, Any] = {}
+            subtitle_json = service.generate_subtitle_data(
+                persistent_video_path,
+                timings=timings,
+                progress_callback=job.update,
+                content_hash=upload.content_hash,
+                pcm_path=upload.pcm_path,
+                profile=profile,
+                language=language,
+                metadata=metadata,
+                on_segment=(
+                    (lambda segment: emit("segment", segment))
+                    if emit is not None
+                    else None
+                ),
+            )
+            logging.info("API: Geração de dados concluída.")
+            metadata["decode_time"] = timings.get("transcription", 0.0)
+            metadata["timings"] = timings
+            # Sessão no servidor: as edições e renderizações seguintes
+            # podem referenciar só o 'session_id'.
+            session = load_session_store().create(persistent_video_path, subtitle_json)
+            if emit is not None:
+                emit(
+                    "speakers",
+                    {"speakers": [segment["speaker"] for segment in subtitle_json]},
+                )
+                emit(
+                    "done",
+                    {
+                        "video_path": persistent_video_path,
+                        "session_id": session["session_id"],
+                        "count": len(subtitle_json),
+                        "metadata": metadata,
+                    },
+                )
+            return {
+                "segments": subtitle_json,
+                "video_path": persistent_video_path,
+                "session_id": session["session_id"],
+                "metadata": metadata,
+            }
+        except Exception as e:
+            if emit is not None:
+                emit("error", {"detail": str(e)})
+            if os.path.exists(persistent_video_path):
+                logging.warning(
+                    f"API: Removendo arquivo de upload devido a erro no processamento: {persistent_video_path}"
+                )
+                os.remove(persistent_video_path)
+            raise
+        finally:
+            if upload.pcm_path and os.path.exists(upload.pcm_path):
+                os.remove(upload.pcm_path)
+
+    return run
+
+
+def _submit_generate_job(
+    job_manager: JobManager,
+    service: SubtitleService,
+    upload: UploadResult,
+    profile: str | None = None,
+    language: str | None = None,
+    emit: Callable[[str, Dict[str, Any]], None] | None = None,
+) -> Job:
+    """
+    Enfileira a geração. Se o job for cancelado ainda na fila, o upload é
+    apagado e o stream do /generate/events recebe 'error' (o worker não roda).
+    """
+
+    def discard():
+        if emit is not None:
+            emit("error", {"detail": "Job cancelado."})
+        _discard_upload(upload)
+
     try:
-        logging.info(
-            f"API: Chamando SubtitleService.generate_subtitle_data para {persistent_video_path}"
+        return _submit_job(
+            job_manager,
+            "generate",
+            _generate_job(service, upload, profile, language, emit),
+            on_discard=discard,
+            files=(upload.video_path,),
         )
-        subtitle_json = service.generate_subtitle_data(persistent_video_path)
-        logging.info("API: Geração de dados concluída.")
+    except HTTPException:
+        _discard_upload(upload)
+        raise
 
-        return {"segments": subtitle_json, "video_path": persistent_video_path}
 
+def _render_job(
+    service: SubtitleService, request_data: RenderRequest
+) -> Callable[[Job], Dict[str, Any]]:
+    """
+    Cria a função executada pelo worker para renderizar o vídeo.
+    Renderizações idênticas (mesmo vídeo, legendas, estilos e modo)
+    são servidas a partir do RenderCache.
+    """
+    original_video_path = request_data.video_path
+    render_cache = load_render_cache()
+    extension = request_data.container
+
+    def run(job: Job) -> Dict[str, Any]:
+        progress = RenderProgress(
+            on_update=lambda percent, fps: job.update(
+                "rendering", percent, fps=round(fps, 1)
+            )
+        )
+        # Cancelar o job encerra o ffmpeg e libera o worker.
+        job.on_cancel(progress.cancel)
+        job.update("hashing", 0)
+        cache_key = render_cache.make_key(
+            content_hash=hash_file_cached(original_video_path),
+            subtitles=[segment.model_dump() for segment in request_data.subtitles],
+            styles=request_data.styles.model_dump(),
+            mode=request_data.mode,
+            container=request_data.container,
+        )
+
+        cached_video_path = render_cache.get(cache_key, extension)
+        if cached_video_path:
+            logging.info(f"API: Renderização encontrada no cache: {cached_video_path}")
+            return {"output_video_path": cached_video_path}
+
+        output_video_path = render_cache.reserve(cache_key, extension)
+        try:
+            logging.info(
+                f"API: Chamando SubtitleService.render_final_video para {original_video_path} -> {output_video_path}"
+            )
+            job.update("rendering", 0)
+            service.render_final_video(
+                original_video_path=original_video_path,
+                output_video_path=output_video_path,
+                subtitles_data=request_data.subtitles,
+                style_options=request_data.styles.model_dump(),
+                mode=request_data.mode,
+                container=request_data.container,
+                progress=progress,
+            )
+            output_video_path = render_cache.commit(
+                output_video_path, cache_key, extension
+            )
+            logging.info(f"API: Renderização concluída: {output_video_path}")
+            return {"output_video_path": output_video_path}
+        except Exception:
+            if os.path.exists(output_video_path):
+                logging.warning(
+                    f"API: Removendo arquivo de saída devido a erro na renderização: {output_video_path}"
+                )
+                os.remove(output_video_path)
+            raise
+
+    return run
+
+
+def _ensure_source_video(original_video_path: str):
+    if not os.path.exists(original_video_path):
+        logging.error(
+            f"API: Arquivo de vídeo original não encontrado para renderização: {original_video_path}"
+        )
+        raise HTTPException(
+            status_code=404,
+            detail="Arquivo de vídeo original não encontrado. Pode ter expirado ou sido removido.",
+        )
+
+
+async def _wait_for_render(
+    job: Job, request: Request, job_manager: JobManager
+) -> Dict[str, Any]:
+    """
+    Aguarda o job de renderização. Se o cliente desconectar antes do fim,
+    cancela o job para que o ffmpeg não continue ocupando a CPU.
+    """
+    future = asyncio.wrap_future(job.future)
+    while not future.done():
+        await asyncio.wait({future}, timeout=DISCONNECT_POLL_INTERVAL)
+        if not future.done() and await request.is_disconnected():
+            logging.info(f"API: Cliente desconectou. Cancelando o job {job.id}.")
+            job_manager.cancel(job)
+            raise HTTPException(status_code=409, detail="Renderização cancelada.")
+
+    try:
+        return future.result()
+    except (RenderCancelledError, asyncio.CancelledError):
+        raise HTTPException(status_code=409, detail="Renderização cancelada.")
     except Exception as e:
-        if persistent_video_path and os.path.exists(persistent_video_path):
-            logging.warning(
-                f"API: Removendo arquivo de upload devido a erro no processamento: {persistent_video_path}"
+        logging.error(f"API: Erro durante a renderização: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {e}")
+
+
+class _CachedFileResponse(FileResponse):
+    """
+    FileResponse de um vídeo do RenderCache: o arquivo fica protegido da
+    retenção até o envio terminar, inclusive se o cliente desconectar.
+    """
+
+    def __init__(self, render_cache: RenderCache, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.render_cache = render_cache
+        render_cache.acquire(self.path)
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.render_cache.release(self.path)
+
+
+def _rendered_file_response(result: Dict[str, Any]) -> FileResponse:
+    """
+    Envia o vídeo renderizado. Os arquivos não são apagados após o
+    download: a retenção é feita pelas políticas do RenderCache e de uploads.
+    """
+    output_video_path = result["output_video_path"]
+    extension = os.path.splitext(output_video_path)[1]
+
+    return _CachedFileResponse(
+        load_render_cache(),
+        path=output_video_path,
+        media_type=VIDEO_MEDIA_TYPES.get(extension, "video/mp4"),
+        filename=f"video_legendado{extension}",
+    )
+
+
+def _preview_job(
+    service: SubtitleService,
+    video_path: str,
+    subtitles: List[SubtitleSegment],
+    styles: StyleOptions,
+    window: PreviewWindow,
+) -> Callable[[Job], Dict[str, Any]]:
+    """Cria a função executada pelo worker para renderizar a prévia."""
+
+    def run(job: Job) -> Dict[str, Any]:
+        progress = RenderProgress(
+            on_update=lambda percent, fps: job.update(
+                "rendering", percent, fps=round(fps, 1)
             )
-            os.remove(persistent_video_path)
+        )
+        job.on_cancel(progress.cancel)
+        output_video_path = os.path.join(OUTPUT_DIR, f"{uuid.uuid4()}_preview.mp4")
+        try:
+            job.update("rendering", 0)
+            service.render_preview(
+                original_video_path=video_path,
+                output_video_path=output_video_path,
+                subtitles_data=subtitles,
+                style_options=styles.model_dump(),
+                start=window.start,
+                end=window.end,
+                height=window.height,
+                progress=progress,
+            )
+            return {"output_video_path": output_video_path}
+        except Exception:
+            if os.path.exists(output_video_path):
+                os.remove(output_video_path)
+            raise
 
+    return run
+
+
+def _remove_file(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _remove_preview_output(future):
+    """Apaga a prévia de um job que terminou sem que o cliente a recebesse."""
+    if not future.cancelled() and future.exception() is None:
+        _remove_file(future.result()["output_video_path"])
+
+
+async def _preview_response(
+    service: SubtitleService,
+    video_path: str,
+    subtitles: List[SubtitleSegment],
+    styles: StyleOptions,
+    window: PreviewWindow,
+    request: Request,
+    job_manager: JobManager,
+) -> FileResponse:
+    """
+    Renderiza a prévia da janela pedida no pool de jobs (sujeita ao limite
+    de pendentes e cancelada se o cliente desconectar) e a envia, apagando
+    o arquivo depois.
+    """
+    _ensure_source_video(video_path)
+
+    if window.end - window.start > env.PREVIEW_MAX_DURATION:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A janela de prévia deve ter no máximo {env.PREVIEW_MAX_DURATION:g}s.",
+        )
+
+    job = _submit_job(
+        job_manager,
+        "preview",
+        _preview_job(service, video_path, subtitles, styles, window),
+        files=(video_path,),
+    )
+    try:
+        result = await _wait_for_render(job, request, job_manager)
+    except HTTPException:
+        # O job pode terminar mesmo assim (ex: junto com a desconexão).
+        job.future.add_done_callback(_remove_preview_output)
+        raise
+
+    return FileResponse(
+        path=result["output_video_path"],
+        media_type="video/mp4",
+        filename="previa.mp4",
+        background=BackgroundTask(_remove_file, result["output_video_path"]),
+    )
+
+
+router = APIRouter()
+
+
+@router.post("/generate")
+async def generate_subtitles_route(
+    file: UploadFile = File(...),
+    profile: str | None = Form(None),
+    language: str | None = Form(None),
+    service: SubtitleService = Depends(get_subtitle_service),
+    job_manager: JobManager = Depends(get_job_manager),
+):
+    """
+    Endpoint para upload de vídeo (Etapa 1).
+    Salva o vídeo em 'uploads/' e retorna dados + caminho.
+    O processamento roda no pool de jobs, fora do event loop.
+
+    'profile' (fast, balanced, accurate) e 'language' ajustam a decodificação;
+    'metadata' na resposta informa o perfil usado e o tempo de decodificação.
+    """
+    _ensure_decoding_profile(profile, language)
+    _ensure_capacity(job_manager)
+    upload = await _save_upload(file)
+
+    job = _submit_generate_job(job_manager, service, upload, profile, language)
+
+    try:
+        return await asyncio.wrap_future(job.future)
+    except asyncio.CancelledError:
+        # Só o cancelamento do job (ainda na fila) vira 409.
+        if not job.future.cancelled():
+            raise
+        raise HTTPException(status_code=409, detail="Job cancelado.")
+    except Exception as e:
         logging.error(
             f"API: Erro durante o processamento de geração: {e}", exc_info=True
         )
@@ -90,68 +588,420 @@ async def generate_subtitles_route(
 @router.post("/render", response_class=FileResponse)
 async def render_subtitles_route(
     request_data: RenderRequest,
+    request: Request,
     service: SubtitleService = Depends(get_subtitle_service),
+    job_manager: JobManager = Depends(get_job_manager),
 ):
     """
     Endpoint para renderizar o vídeo (Etapa 2).
     Renderiza o vídeo, retorna para download e limpa os arquivos.
+    Se o cliente desconectar, a renderização é cancelada.
     """
-    original_video_path = request_data.video_path
-    output_video_path = None
+    _ensure_source_video(request_data.video_path)
+    job = _submit_job(
+        job_manager,
+        "render",
+        _render_job(service, request_data),
+        files=(request_data.video_path,),
+    )
+    result = await _wait_for_render(job, request, job_manager)
 
-    if not os.path.exists(original_video_path):
-        logging.error(
-            f"API: Arquivo de vídeo original não encontrado para renderização: {original_video_path}"
+    logging.info(
+        f"API: Renderização concluída. Preparando envio do arquivo: {result['output_video_path']}"
+    )
+    return _rendered_file_response(result)
+
+
+@router.post("/preview", response_class=FileResponse)
+async def preview_subtitles_route(
+    request_data: PreviewRequest,
+    request: Request,
+    service: SubtitleService = Depends(get_subtitle_service),
+    job_manager: JobManager = Depends(get_job_manager),
+):
+    """
+    Renderiza uma prévia curta (janela [start, end)) em baixa resolução,
+    para conferir estilos sem renderizar o vídeo inteiro.
+    Como o /render, passa pelo pool de jobs e é cancelada se o cliente desconectar.
+    """
+    return await _preview_response(
+        service,
+        request_data.video_path,
+        request_data.subtitles,
+        request_data.styles,
+        request_data,
+        request,
+        job_manager,
+    )
+
+
+@router.post("/export")
+def export_subtitles_route(
+    request_data: ExportRequest,
+    service: SubtitleService = Depends(get_subtitle_service),
+):
+    """
+    Exporta as legendas como arquivo lateral (.ass, .srt ou .vtt),
+    sem acionar o ffmpeg.
+    """
+    try:
+        content = service.export_subtitles(
+            request_data.subtitles,
+            request_data.styles.model_dump(),
+            request_data.format,
         )
+    except Exception as e:
+        logging.error(f"API: Erro ao exportar legendas: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {e}")
+
+    return Response(
+        content=content,
+        media_type=f"{SUBTITLE_MEDIA_TYPES[request_data.format]}; charset=utf-8",
+        headers={
+            "Content-Disposition": f'attachment; filename="legendas.{request_data.format}"'
+        },
+    )
+
+
+def _format_event(event: str, data: Dict[str, Any], fmt: str) -> str:
+    if fmt == "ndjson":
+        return json.dumps({"event": event, "data": data}, ensure_ascii=False) + "\n"
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/generate/events")
+async def generate_events_route(
+    file: UploadFile = File(...),
+    profile: str | None = Form(None),
+    language: str | None = Form(None),
+    event_format: Literal["sse", "ndjson"] = Query("sse", alias="format"),
+    service: SubtitleService = Depends(get_subtitle_service),
+    job_manager: JobManager = Depends(get_job_manager),
+):
+    """
+    Igual ao /generate, mas transmite o resultado aos poucos, via
+    Server-Sent Events (padrão) ou NDJSON (?format=ndjson):
+
+    - 'queued': job_id do processamento;
+    - 'started': o worker começou a processar;
+    - 'segment': cada segmento transcrito, com 'speaker' nulo, assim que
+      seu trecho de áudio é decodificado;
+    - 'speakers': interlocutor de cada segmento (na ordem de 'index'),
+      após a diarização;
+    - 'done': caminho do vídeo e metadados; ou 'error', em caso de falha.
+
+    Se o cliente desconectar com o job ainda na fila, ele é cancelado.
+    """
+    _ensure_decoding_profile(profile, language)
+    _ensure_capacity(job_manager)
+    upload = await _save_upload(file)
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: str, data: Dict[str, Any]):
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    job = _submit_generate_job(job_manager, service, upload, profile, language, emit)
+
+    async def stream():
+        completed = False
+        try:
+            yield _format_event("queued", {"job_id": job.id}, event_format)
+            while True:
+                event, data = await events.get()
+                yield _format_event(event, data, event_format)
+                if event in ("done", "error"):
+                    completed = True
+                    break
+        finally:
+            if not completed:
+                logging.info(f"API: Cliente desconectou. Cancelando o job {job.id}.")
+                job_manager.cancel(job)
+
+    return StreamingResponse(
+        stream(),
+        media_type=(
+            "application/x-ndjson" if event_format == "ndjson" else "text/event-stream"
+        ),
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/generate/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_generate_job_route(
+    file: UploadFile = File(...),
+    profile: str | None = Form(None),
+    language: str | None = Form(None),
+    service: SubtitleService = Depends(get_subtitle_service),
+    job_manager: JobManager = Depends(get_job_manager),
+):
+    """
+    Versão assíncrona do /generate: salva o upload e retorna um job_id
+    imediatamente. O resultado é consultado em /jobs/{job_id}.
+    """
+    _ensure_decoding_profile(profile, language)
+    _ensure_capacity(job_manager)
+    upload = await _save_upload(file)
+
+    job = _submit_generate_job(job_manager, service, upload, profile, language)
+
+    return JobSubmitResponse(job_id=job.id, status=job.status)
+
+
+@router.post("/generate/stream", response_model=JobSubmitResponse, status_code=202)
+async def submit_generate_stream_route(
+    request: Request,
+    filename: str | None = None,
+    profile: str | None = None,
+    language: str | None = None,
+    service: SubtitleService = Depends(get_subtitle_service),
+    job_manager: JobManager = Depends(get_job_manager),
+):
+    """
+    Upload em streaming: o corpo da requisição é o próprio vídeo
+    (Content-Type: video/*). Os bytes são gravados e hasheados conforme
+    chegam da rede e, com STREAMING_AUDIO_EXTRACTION, o áudio já é
+    decodificado durante a transferência. Retorna um job_id.
+    'profile' e 'language' são passados como query params.
+    """
+    _ensure_video_content_type(request.headers.get("content-type"))
+    _ensure_decoding_profile(profile, language)
+    _ensure_capacity(job_manager)
+    upload = await _save_chunks(iter_request_body(request), filename)
+
+    job = _submit_generate_job(job_manager, service, upload, profile, language)
+
+    return JobSubmitResponse(job_id=job.id, status=job.status)
+
+
+@router.post("/render/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_render_job_route(
+    request_data: RenderRequest,
+    service: SubtitleService = Depends(get_subtitle_service),
+    job_manager: JobManager = Depends(get_job_manager),
+):
+    """
+    Versão assíncrona do /render: retorna um job_id imediatamente.
+    O vídeo é baixado em /jobs/{job_id}/result quando o job terminar.
+    """
+    _ensure_source_video(request_data.video_path)
+    job = _submit_job(
+        job_manager,
+        "render",
+        _render_job(service, request_data),
+        files=(request_data.video_path,),
+    )
+    return JobSubmitResponse(job_id=job.id, status=job.status)
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+def get_job_status_route(
+    job_id: str, job_manager: JobManager = Depends(get_job_manager)
+):
+    """Retorna estado, etapa, progresso e (para /generate) o resultado do job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return job.to_dict(include_result=job.kind == "generate")
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobStatusResponse, status_code=202)
+def cancel_job_route(
+    job_id: str, job_manager: JobManager = Depends(get_job_manager)
+):
+    """
+    Cancela um job na fila ou uma renderização em andamento: o ffmpeg é
+    encerrado e o worker liberado. Retorna 409 se o job já terminou ou não
+    pode ser interrompido (uma geração já em execução).
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    if not job_manager.cancel(job):
         raise HTTPException(
-            status_code=404,
-            detail="Arquivo de vídeo original não encontrado. Pode ter expirado ou sido removido.",
+            status_code=409, detail="O job já terminou ou não pode ser interrompido."
         )
+    return job.to_dict(include_result=False)
+
+
+@router.get("/jobs/{job_id}/result")
+def get_job_result_route(
+    job_id: str, job_manager: JobManager = Depends(get_job_manager)
+):
+    """
+    Retorna o resultado de um job concluído: o JSON de legendas (generate)
+    ou o vídeo renderizado para download (render).
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    if job.status == JOB_CANCELLED:
+        raise HTTPException(status_code=409, detail="Job cancelado.")
+    if job.status == JOB_FAILED:
+        raise HTTPException(status_code=500, detail=f"Job falhou: {job.error}")
+    if not job.is_finished:
+        raise HTTPException(status_code=409, detail="Job ainda em processamento.")
+
+    if job.kind == "render":
+        if not os.path.exists(job.result["output_video_path"]):
+            raise HTTPException(
+                status_code=410, detail="Vídeo renderizado não está mais disponível."
+            )
+        return _rendered_file_response(job.result)
+    return job.result
+
 
+async def _load_session_render_data(store: SessionStore, session_id: str):
     try:
-        output_filename = f"{uuid.uuid4()}_rendered.mp4"
-        output_video_path = os.path.join(OUTPUT_DIR, output_filename)
+        return await run_in_threadpool(store.load_render_data, session_id)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
-        logging.info(
-            f"API: Chamando SubtitleService.render_final_video para {original_video_path} -> {output_video_path}"
-        )
 
-        service.render_final_video(
-            original_video_path=original_video_path,
-            output_video_path=output_video_path,
-            subtitles_data=request_data.subtitles,
-            style_options=request_data.styles.model_dump(),
-        )
+async def _session_render_request(
+    store: SessionStore, session_id: str, request_data: SessionRenderRequest
+) -> RenderRequest:
+    """Monta o RenderRequest a partir da sessão, sem revalidar os segmentos."""
+    video_path, subtitles, styles = await _load_session_render_data(store, session_id)
+    _ensure_source_video(video_path)
+    return RenderRequest.model_construct(
+        video_path=video_path,
+        subtitles=subtitles,
+        styles=styles,
+        mode=request_data.mode,
+        container=request_data.container,
+    )
 
-        logging.info(
-            f"API: Renderização concluída. Preparando envio do arquivo: {output_video_path}"
-        )
 
-        combined_cleanup_task = BackgroundTask(
-            lambda path_out, path_in: (
-                os.remove(path_out) if os.path.exists(path_out) else None,
-                os.remove(path_in) if os.path.exists(path_in) else None,
-            ),
-            output_video_path,
-            original_video_path,
-        )
-        logging.info(
-            f"API: Agendada limpeza dos arquivos: {output_video_path} e {original_video_path}"
-        )
+@router.post("/sessions", response_model=SessionVersionResponse, status_code=201)
+def create_session_route(
+    request_data: SessionCreateRequest,
+    store: SessionStore = Depends(get_session_store),
+):
+    """
+    Cria uma sessão com legendas já existentes no cliente.
+    (O /generate já cria uma e retorna o 'session_id'.)
+    """
+    return store.create(
+        request_data.video_path,
+        request_data.subtitles,
+        request_data.styles.model_dump() if request_data.styles else None,
+    )
+
+
+@router.get("/sessions/{session_id}")
+def get_session_route(
+    session_id: str, store: SessionStore = Depends(get_session_store)
+):
+    """Retorna a sessão completa (ex: para recarregar o editor)."""
+    try:
+        return store.get(session_id)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
-        return FileResponse(
-            path=output_video_path,
-            media_type="video/mp4",
-            filename="video_legendado.mp4",
-            background=combined_cleanup_task,
+
+@router.patch("/sessions/{session_id}", response_model=SessionVersionResponse)
+def patch_session_route(
+    session_id: str,
+    request_data: SessionPatchRequest,
+    store: SessionStore = Depends(get_session_store),
+):
+    """
+    Aplica edições incrementais (JSON Patch: add, remove, replace em
+    '/segments/...' e '/styles/...'). Ou todas as operações são aplicadas,
+    ou nenhuma; a resposta traz a nova versão da sessão.
+    """
+    try:
+        version = store.apply_patch(
+            session_id,
+            [operation.model_dump() for operation in request_data.operations],
+            expected_version=request_data.version,
         )
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except SessionVersionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except SessionPatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return SessionVersionResponse(session_id=session_id, version=version)
 
-    except Exception as e:
-        if output_video_path and os.path.exists(output_video_path):
-            logging.warning(
-                f"API: Removendo arquivo de saída devido a erro na renderização: {output_video_path}"
-            )
-            os.remove(output_video_path)
 
-        logging.error(f"API: Erro durante a renderização: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {e}")
+@router.delete("/sessions/{session_id}", status_code=204)
+def delete_session_route(
+    session_id: str, store: SessionStore = Depends(get_session_store)
+):
+    try:
+        store.delete(session_id)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return Response(status_code=204)
+
+
+@router.post("/sessions/{session_id}/render", response_class=FileResponse)
+async def render_session_route(
+    session_id: str,
+    request_data: SessionRenderRequest,
+    request: Request,
+    service: SubtitleService = Depends(get_subtitle_service),
+    store: SessionStore = Depends(get_session_store),
+    job_manager: JobManager = Depends(get_job_manager),
+):
+    """Igual ao /render, com as legendas e estilos gravados na sessão."""
+    render_request = await _session_render_request(store, session_id, request_data)
+    job = _submit_job(
+        job_manager,
+        "render",
+        _render_job(service, render_request),
+        files=(render_request.video_path,),
+    )
+    result = await _wait_for_render(job, request, job_manager)
+    return _rendered_file_response(result)
+
+
+@router.post(
+    "/sessions/{session_id}/render/jobs",
+    response_model=JobSubmitResponse,
+    status_code=202,
+)
+async def submit_session_render_job_route(
+    session_id: str,
+    request_data: SessionRenderRequest,
+    service: SubtitleService = Depends(get_subtitle_service),
+    store: SessionStore = Depends(get_session_store),
+    job_manager: JobManager = Depends(get_job_manager),
+):
+    """Versão assíncrona do /sessions/{session_id}/render."""
+    render_request = await _session_render_request(store, session_id, request_data)
+    job = _submit_job(
+        job_manager,
+        "render",
+        _render_job(service, render_request),
+        files=(render_request.video_path,),
+    )
+    return JobSubmitResponse(job_id=job.id, status=job.status)
+
+
+@router.post("/sessions/{session_id}/preview", response_class=FileResponse)
+async def preview_session_route(
+    session_id: str,
+    request_data: PreviewWindow,
+    request: Request,
+    service: SubtitleService = Depends(get_subtitle_service),
+    store: SessionStore = Depends(get_session_store),
+    job_manager: JobManager = Depends(get_job_manager),
+):
+    """Igual ao /preview, com as legendas e estilos gravados na sessão."""
+    video_path, subtitles, styles = await _load_session_render_data(store, session_id)
+    return await _preview_response(
+        service, video_path, subtitles, styles, request_data, request, job_manager
+    )
+
+
+@router.get("/cache/stats")
+def get_cache_stats_route():
+    """Contadores de hit/miss e ocupação dos caches de resultados e de renderização."""
+    return {
+        "results": load_result_cache().stats(),
+        "renders": load_render_cache().stats(),
+    }
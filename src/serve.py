@@ -0,0 +1,213 @@
+"""
+Servidor multiprocesso com pesos compartilhados entre os workers.
+
+'uvicorn --workers N' cria cada worker com 'spawn': todo processo importa a
+aplicação do zero e carrega sua própria cópia dos modelos, e a RAM cresce
+linearmente com N. Aqui o processo pai carrega Whisper e Pyannote uma única
+vez, congela o heap ('gc.freeze') e cria os workers com 'fork' sobre o mesmo
+socket. Os pesos ficam em páginas copy-on-write compartilhadas, pois a
+inferência apenas os lê.
+
+O aquecimento roda em cada worker, depois do fork: inferências no pai
+iniciariam pools de threads (OpenMP) que não sobrevivem ao fork. Com GPU
+(CUDA/ROCm) os modelos não podem ser carregados antes do fork, e cada worker
+carrega os seus.
+
+Uso (a partir da raiz do repositório):
+    python -m src.serve --workers 4
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+from src import env
+from src.main import app
+from src.services.memory import format_memory_usage, read_memory_usage
+from src.services.startup import load_model_readiness
+
+logger = logging.getLogger("src.serve")
+
+
+def _cuda_available() -> bool:
+    try:
+        import torch
+
+        return torch.cuda.is_available()
+    except Exception:
+        return False
+
+
+def preload_shared_models() -> bool:
+    """
+    Carrega os modelos no processo pai (sem aquecimento) e congela o heap.
+    Retorna False se os modelos não puderem ser compartilhados.
+    """
+    if _cuda_available():
+        logger.warning(
+            "Serve: GPU detectada; contextos CUDA não sobrevivem ao fork. "
+            "Cada worker carregará seus próprios modelos."
+        )
+        return False
+
+    readiness = load_model_readiness()
+    readiness.preload_models(warmup_duration=0)
+    if not readiness.is_ready:
+        raise RuntimeError(f"Falha ao pré-carregar os modelos: {readiness.error}")
+
+    # Move os objetos atuais para uma geração permanente: o coletor de lixo
+    # deixa de percorrê-los e não suja suas páginas nos workers.
+    gc.collect()
+    gc.freeze()
+    logger.info(
+        f"Serve: Modelos carregados no processo pai "
+        f"({format_memory_usage(read_memory_usage())})."
+    )
+    return True
+
+
+def create_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, host: str, port: int):
+    """Executado no processo filho: serve a aplicação no socket herdado."""
+    import uvicorn
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    # O lifespan executa o aquecimento neste worker; os modelos já
+    # carregados pelo pai são reaproveitados pelos 'load_*_service'.
+    load_model_readiness().preload = True
+
+    config = uvicorn.Config(app, host=host, port=port, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """Cria os workers via fork, recria os que morrem e repassa sinais."""
+
+    def __init__(self, sock: socket.socket, host: str, port: int, workers: int):
+        self.sock = sock
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.children: Dict[int, int] = {}
+        self.stopping = False
+
+    def spawn(self, index: int):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                run_worker(self.sock, self.host, self.port)
+            except BaseException:
+                logger.exception(f"Serve: Erro fatal no worker {index}.")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        self.children[pid] = index
+        logger.info(f"Serve: Worker {index} iniciado (pid {pid}).")
+
+    def stop(self, signum, _frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info(f"Serve: Sinal {signum} recebido; encerrando workers...")
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def log_memory(self):
+        total_pss = 0
+        for pid, index in sorted(self.children.items(), key=lambda item: item[1]):
+            try:
+                usage = read_memory_usage(pid)
+            except (FileNotFoundError, ProcessLookupError):
+                continue
+            total_pss += usage.get("pss", 0)
+            logger.info(f"Serve: Worker {index} (pid {pid}): {format_memory_usage(usage)}")
+        if total_pss:
+            logger.info(f"Serve: PSS total dos workers: {total_pss / 2**20:.1f}MiB")
+
+    def run(self, memory_report_interval: float):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        for index in range(self.workers):
+            self.spawn(index)
+
+        next_report = time.monotonic() + memory_report_interval
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                time.sleep(0.5)
+                if memory_report_interval and time.monotonic() >= next_report:
+                    self.log_memory()
+                    next_report = time.monotonic() + memory_report_interval
+                continue
+
+            index = self.children.pop(pid, None)
+            if index is None:
+                continue
+            if not self.stopping:
+                logger.warning(
+                    f"Serve: Worker {index} (pid {pid}) encerrou "
+                    f"(status {status}); recriando..."
+                )
+                self.spawn(index)
+
+        logger.info("Serve: Todos os workers foram encerrados.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default=env.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=env.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=env.SERVE_WORKERS)
+    parser.add_argument(
+        "--memory-report-interval",
+        type=float,
+        default=env.MEMORY_REPORT_INTERVAL,
+        help="intervalo (s) do log de memória por worker (0 = desativado)",
+    )
+    parser.add_argument(
+        "--no-preload",
+        action="store_true",
+        help="não carrega os modelos no pai (cada worker carrega os seus)",
+    )
+    args = parser.parse_args()
+
+    # O relatório de memória é a principal saída do supervisor.
+    logger.setLevel(logging.INFO)
+
+    if not args.no_preload:
+        preload_shared_models()
+
+    sock = create_socket(args.host, args.port)
+    logger.info(
+        f"Serve: Escutando em {args.host}:{args.port} com {args.workers} worker(s)."
+    )
+    Supervisor(sock, args.host, args.port, args.workers).run(
+        args.memory_report_interval
+    )
+    sock.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
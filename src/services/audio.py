@@ -0,0 +1,134 @@
+import logging
+import mmap
+import os
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+import numpy as np
+
+from src import env
+
+
+def decode_audio_to_pcm(
+    video_file_path: str, pcm_path: str, sample_rate: int = env.TARGET_SAMPLE_RATE
+) -> str:
+    """
+    Decodifica o áudio de um arquivo de mídia para PCM float32 mono (f32le)
+    na taxa de amostragem indicada, gravando o resultado em 'pcm_path'.
+    """
+    if not os.path.exists(video_file_path):
+        raise FileNotFoundError(f"Arquivo não encontrado: {video_file_path}")
+
+    ffmpeg_command = [
+        "ffmpeg",
+        "-nostdin",
+        "-threads",
+        "0",
+        "-loglevel",
+        "error",
+        "-i",
+        video_file_path,
+        "-vn",
+        "-f",
+        "f32le",
+        "-acodec",
+        "pcm_f32le",
+        "-ac",
+        "1",
+        "-ar",
+        str(sample_rate),
+        pcm_path,
+        "-y",
+    ]
+
+    try:
+        subprocess.run(ffmpeg_command, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Erro ao extrair áudio com ffmpeg: {e.stderr}")
+        raise RuntimeError(f"Falha ao extrair áudio: {e.stderr}") from e
+
+    return pcm_path
+
+
+def load_pcm(pcm_path: str, use_mmap: bool = env.AUDIO_USE_MMAP) -> np.ndarray:
+    """
+    Carrega um arquivo PCM float32 mono.
+    Com 'use_mmap', o arquivo é mapeado em memória (páginas carregadas sob demanda).
+    """
+    if use_mmap:
+        if os.path.getsize(pcm_path) == 0:
+            return np.zeros(0, dtype=np.float32)
+        return np.memmap(pcm_path, dtype=np.float32, mode="c")
+    return np.fromfile(pcm_path, dtype=np.float32)
+
+
+def release_pages(audio: np.ndarray, start: int, end: int):
+    """
+    Devolve ao sistema as páginas de um PCM mapeado em memória ('load_pcm'
+    com mmap) no intervalo de amostras [start, end), já processado. Se forem
+    lidas de novo, as páginas voltam do arquivo. Em arrays comuns não faz nada.
+    """
+    if not isinstance(getattr(audio, "base", None), mmap.mmap):
+        return
+    if not hasattr(mmap, "MADV_DONTNEED"):
+        return
+
+    page_size = mmap.PAGESIZE
+    first = (start * audio.itemsize + audio.offset) // page_size * page_size
+    last = min(end * audio.itemsize + audio.offset, len(audio.base))
+    if last > first:
+        audio.base.madvise(mmap.MADV_DONTNEED, first, last - first)
+
+
+@contextmanager
+def extracted_audio(
+    video_file_path: str,
+    sample_rate: int = env.TARGET_SAMPLE_RATE,
+    use_mmap: bool = env.AUDIO_USE_MMAP,
+) -> Iterator[np.ndarray]:
+    """
+    Extrai o áudio do vídeo uma única vez e o disponibiliza como um buffer
+    float32 mono, compartilhável entre transcrição e diarização.
+    O arquivo PCM temporário é removido ao sair do contexto.
+    """
+    fd, pcm_path = tempfile.mkstemp(suffix=".pcm", dir=env.AUDIO_TEMP_DIR)
+    os.close(fd)
+    try:
+        logging.info(
+            f"AudioService: Extraindo áudio de {video_file_path} ({sample_rate}Hz, mono)..."
+        )
+        decode_audio_to_pcm(video_file_path, pcm_path, sample_rate)
+        audio = load_pcm(pcm_path, use_mmap=use_mmap)
+        logging.info(
+            f"AudioService: Áudio extraído ({len(audio) / sample_rate:.1f}s, mmap={use_mmap})."
+        )
+        yield audio
+    finally:
+        audio = None
+        if os.path.exists(pcm_path):
+            os.remove(pcm_path)
+
+
+@contextmanager
+def pcm_audio(
+    pcm_path: str, use_mmap: bool = env.AUDIO_USE_MMAP
+) -> Iterator[np.ndarray]:
+    """
+    Disponibiliza um PCM já extraído (ex: durante o upload) com a mesma
+    interface de 'extracted_audio'. O arquivo é removido ao sair do contexto.
+    """
+    try:
+        yield load_pcm(pcm_path, use_mmap=use_mmap)
+    finally:
+        if os.path.exists(pcm_path):
+            os.remove(pcm_path)
+
+
+def decode_audio(
+    video_file_path: str, sample_rate: int = env.TARGET_SAMPLE_RATE
+) -> np.ndarray:
+    """Decodifica o áudio completo para um array float32 em memória."""
+    with extracted_audio(video_file_path, sample_rate, use_mmap=False) as audio:
+        return audio
@@ -0,0 +1,420 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from src import env
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def hash_file(file_path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """Calcula o SHA-256 de um arquivo lendo-o em blocos (sem carregá-lo inteiro)."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_file_hashes: Dict[str, tuple] = {}
+_file_hashes_lock = threading.Lock()
+
+
+def remember_file_hash(file_path: str, content_hash: str):
+    """Registra o hash já calculado de um arquivo (ex: durante o upload)."""
+    stat = os.stat(file_path)
+    with _file_hashes_lock:
+        _file_hashes[os.path.abspath(file_path)] = (
+            stat.st_size,
+            stat.st_mtime_ns,
+            content_hash,
+        )
+
+
+def hash_file_cached(file_path: str) -> str:
+    """
+    Igual a 'hash_file', mas reaproveita o hash enquanto o arquivo
+    não mudar (mesmo tamanho e mtime).
+    """
+    stat = os.stat(file_path)
+    key = os.path.abspath(file_path)
+    with _file_hashes_lock:
+        known = _file_hashes.get(key)
+    if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+        return known[2]
+
+    content_hash = hash_file(file_path)
+    with _file_hashes_lock:
+        _file_hashes[key] = (stat.st_size, stat.st_mtime_ns, content_hash)
+    return content_hash
+
+
+def prune_directory(
+    directory: str,
+    max_bytes: int = 0,
+    max_age: float = 0,
+    skip: Callable[[str], bool] | None = None,
+) -> List[str]:
+    """
+    Aplica a política de retenção a um diretório (não recursivo):
+    remove arquivos mais antigos que 'max_age' segundos e, se o total
+    passar de 'max_bytes', os menos usados recentemente. Zero desativa
+    o respectivo limite. Retorna os caminhos removidos.
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    now = time.time()
+    entries = []
+    for entry in os.scandir(directory):
+        if not entry.is_file() or (skip and skip(entry.name)):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    removed = []
+
+    def remove(path: str) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        removed.append(path)
+        return True
+
+    if max_age:
+        kept = []
+        for mtime, size, path in entries:
+            if now - mtime > max_age:
+                remove(path)
+            else:
+                kept.append((mtime, size, path))
+        entries = kept
+
+    if max_bytes:
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= max_bytes:
+                break
+            if remove(path):
+                total_size -= size
+
+    if removed:
+        logger.info(f"Retenção: {len(removed)} arquivo(s) removido(s) de '{directory}'.")
+    return removed
+
+
+def make_cache_key(**parts: Any) -> str:
+    """Gera uma chave estável a partir de valores serializáveis em JSON."""
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Cache persistente em disco (JSON) para resultados de inferência,
+    separado por namespace (ex: 'transcription', 'diarization').
+
+    O tamanho total é limitado por 'max_bytes'; ao exceder, as entradas
+    menos usadas recentemente (mtime mais antigo) são removidas.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = env.RESULT_CACHE_DIR,
+        max_bytes: int = env.RESULT_CACHE_MAX_BYTES,
+        enabled: bool = env.RESULT_CACHE_ENABLED,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        logger.info(
+            f"Iniciando ResultCache em '{cache_dir}' (limite={max_bytes} bytes, ativo={enabled})."
+        )
+
+    def _entry_path(self, namespace: str, key: str) -> str:
+        return os.path.join(self.cache_dir, namespace, f"{key}.json")
+
+    def _count(self, namespace: str, counter: str):
+        with self._lock:
+            counters = self._counters.setdefault(namespace, {"hits": 0, "misses": 0})
+            counters[counter] += 1
+
+    def get(self, namespace: str, key: str) -> Any | None:
+        """Retorna o valor armazenado ou None em caso de miss."""
+        if not self.enabled:
+            return None
+
+        path = self._entry_path(namespace, key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._count(namespace, "misses")
+            return None
+
+        self._count(namespace, "hits")
+        logger.info(f"ResultCache: Hit em '{namespace}' ({key[:12]}).")
+        return value
+
+    def set(self, namespace: str, key: str, value: Any):
+        """Grava o valor de forma atômica e aplica a política de evicção."""
+        if not self.enabled:
+            return
+
+        namespace_dir = os.path.join(self.cache_dir, namespace)
+        os.makedirs(namespace_dir, exist_ok=True)
+
+        fd, temp_path = tempfile.mkstemp(dir=namespace_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(temp_path, self._entry_path(namespace, key))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self._evict()
+
+    def _list_entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        """Remove as entradas menos recentes até o cache caber em 'max_bytes'."""
+        with self._lock:
+            entries = self._list_entries()
+            total_size = sum(size for _, size, _ in entries)
+            if total_size <= self.max_bytes:
+                return
+
+            entries.sort()
+            for _, size, path in entries:
+                if total_size <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total_size -= size
+                    logger.info(f"ResultCache: Entrada removida (LRU): {path}")
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de hit/miss por namespace e ocupação atual do disco."""
+        entries = self._list_entries() if self.enabled else []
+        with self._lock:
+            counters = {ns: dict(values) for ns, values in self._counters.items()}
+        return {
+            "enabled": self.enabled,
+            "entries": len(entries),
+            "size_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "counters": counters,
+        }
+
+
+class RenderCache:
+    """
+    Cache de vídeos renderizados, indexado pelo hash do vídeo de origem,
+    das legendas, dos estilos e das opções de renderização.
+    A retenção é limitada por tamanho total e por idade (ver 'prune_directory');
+    vídeos sendo enviados a clientes ('acquire'/'release') são preservados.
+    """
+
+    PARTIAL_MARKER = ".partial"
+
+    def __init__(
+        self,
+        cache_dir: str = env.RENDER_CACHE_DIR,
+        max_bytes: int = env.RENDER_CACHE_MAX_BYTES,
+        max_age: float = env.RENDER_CACHE_MAX_AGE,
+        partial_max_age: float = env.RENDER_CACHE_PARTIAL_MAX_AGE,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.partial_max_age = partial_max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Nome do arquivo -> número de respostas que ainda o estão enviando.
+        self._serving: Dict[str, int] = {}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        logger.info(
+            f"Iniciando RenderCache em '{cache_dir}' "
+            f"(limite={max_bytes} bytes, idade máxima={max_age}s)."
+        )
+
+    def make_key(
+        self,
+        content_hash: str,
+        subtitles: List[Dict[str, Any]],
+        styles: Dict[str, Any],
+        **options: Any,
+    ) -> str:
+        return make_cache_key(
+            content_hash=content_hash,
+            subtitles=subtitles,
+            styles=styles,
+            options=options,
+        )
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{extension}")
+
+    def get(self, key: str, extension: str) -> str | None:
+        """Retorna o caminho do vídeo em cache (renovando seu mtime) ou None."""
+        path = self._path(key, extension)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        logger.info(f"RenderCache: Hit ({key[:12]}).")
+        return path
+
+    def reserve(self, key: str, extension: str) -> str:
+        """Caminho temporário onde o vídeo deve ser renderizado."""
+        return os.path.join(
+            self.cache_dir, f"{key}{self.PARTIAL_MARKER}-{os.getpid()}-"
+            f"{threading.get_ident()}.{extension}"
+        )
+
+    def commit(self, partial_path: str, key: str, extension: str) -> str:
+        """Publica o vídeo renderizado no cache e aplica a retenção."""
+        path = self._path(key, extension)
+        os.replace(partial_path, path)
+        self.prune()
+        return path
+
+    def acquire(self, path: str):
+        """Marca um vídeo do cache como em envio, protegendo-o da retenção."""
+        name = os.path.basename(path)
+        with self._lock:
+            self._serving[name] = self._serving.get(name, 0) + 1
+
+    def release(self, path: str):
+        name = os.path.basename(path)
+        with self._lock:
+            remaining = self._serving.get(name, 0) - 1
+            if remaining > 0:
+                self._serving[name] = remaining
+            else:
+                self._serving.pop(name, None)
+
+    def _is_serving(self, name: str) -> bool:
+        with self._lock:
+            return name in self._serving
+
+    def prune(self) -> List[str]:
+        # Parciais parados há mais de 'partial_max_age' são sobras de renderizações
+        # interrompidas; os demais ainda estão sendo escritos.
+        removed = prune_directory(
+            self.cache_dir,
+            max_age=self.partial_max_age,
+            skip=lambda name: self.PARTIAL_MARKER not in name,
+        )
+        removed += prune_directory(
+            self.cache_dir,
+            self.max_bytes,
+            self.max_age,
+            skip=lambda name: self.PARTIAL_MARKER in name or self._is_serving(name),
+        )
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        sizes = []
+        partial_sizes = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file():
+                continue
+            try:
+                size = entry.stat().st_size
+            except FileNotFoundError:
+                continue
+            if self.PARTIAL_MARKER in entry.name:
+                partial_sizes.append(size)
+            else:
+                sizes.append(size)
+        with self._lock:
+            return {
+                "entries": len(sizes),
+                "size_bytes": sum(sizes),
+                "partial_entries": len(partial_sizes),
+                "partial_size_bytes": sum(partial_sizes),
+                "serving": sum(self._serving.values()),
+                "max_bytes": self.max_bytes,
+                "max_age": self.max_age,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+resultCache: ResultCache | None = None
+
+_result_cache_lock = threading.Lock()
+
+
+def load_result_cache():
+    """
+    Cria o ResultCache na primeira chamada (mesmo padrão dos serviços).
+    """
+    global resultCache
+
+    if resultCache is None:
+        with _result_cache_lock:
+            if resultCache is None:
+                resultCache = ResultCache()
+
+    return resultCache
+
+
+renderCache: RenderCache | None = None
+
+_render_cache_lock = threading.Lock()
+
+
+def load_render_cache():
+    """
+    Cria o RenderCache na primeira chamada (mesmo padrão dos serviços).
+    """
+    global renderCache
+
+    if renderCache is None:
+        with _render_cache_lock:
+            if renderCache is None:
+                renderCache = RenderCache()
+
+    return renderCache
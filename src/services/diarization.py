@@ -1,13 +1,130 @@
 import logging
 import os
 import threading
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
-import torch
-import whisper
-from pyannote.audio import Pipeline
+import numpy as np
 
 from src import env
+from src.services.audio import extracted_audio, release_pages
+from src.services.stubs import StubDiarizationService
+
+# 'torch' e 'pyannote.audio' são importados apenas ao carregar o modelo:
+# importá-los no topo do módulo atrasa em vários segundos o boot da API.
+
+Window = Tuple[float, float]
+
+
+def get_diarization_options() -> Dict[str, Any]:
+    """
+    Opções que influenciam o resultado da diarização, usadas na chave do
+    cache. Vazio na passada única (mantém as chaves já existentes).
+    """
+    if env.DIARIZATION_WINDOW_DURATION <= 0:
+        return {}
+    return {
+        "window": {
+            "duration": env.DIARIZATION_WINDOW_DURATION,
+            "overlap": env.DIARIZATION_WINDOW_OVERLAP,
+            "link_threshold": env.DIARIZATION_LINK_THRESHOLD,
+        }
+    }
+
+
+def plan_windows(duration: float, window: float, overlap: float) -> List[Window]:
+    """
+    Janelas de 'window' segundos com 'overlap' segundos de sobreposição.
+    A última janela é recuada para terminar no fim do áudio, em vez de
+    ficar curta demais para um embedding confiável.
+    """
+    overlap = min(max(overlap, 0.0), window / 2)
+    windows: List[Window] = []
+    start = 0.0
+    while True:
+        end = start + window
+        if end >= duration:
+            windows.append((max(0.0, duration - window), duration))
+            return windows
+        windows.append((start, end))
+        start = end - overlap
+
+
+def window_ownership(windows: List[Window], duration: float) -> List[Window]:
+    """
+    Trecho pelo qual cada janela responde: o meio de cada sobreposição,
+    onde as duas janelas vizinhas têm mais contexto.
+    """
+    boundaries = [0.0]
+    for previous, current in zip(windows, windows[1:]):
+        boundaries.append((current[0] + previous[1]) / 2)
+    boundaries.append(duration)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+class SpeakerLinker:
+    """
+    Liga os locutores de janelas independentes a locutores globais pelo
+    centroide (média ponderada pela duração da fala) de seus embeddings.
+
+    Dois locutores da mesma janela nunca vão para o mesmo locutor global: o
+    Pyannote já os separou com mais contexto. A memória cresce apenas com o
+    número de locutores, não com a duração do áudio.
+    """
+
+    def __init__(self, threshold: float = env.DIARIZATION_LINK_THRESHOLD):
+        self.threshold = threshold
+        # None: locutor sem embedding válido (não recebe novas ligações).
+        self.centroids: List[np.ndarray | None] = []
+
+    def _distance(self, embedding: np.ndarray, index: int) -> float | None:
+        centroid = self.centroids[index]
+        if centroid is None:
+            return None
+        return 1.0 - float(embedding @ centroid) / float(np.linalg.norm(centroid))
+
+    def link(
+        self, embeddings: Dict[str, np.ndarray], durations: Dict[str, float]
+    ) -> Dict[str, str]:
+        """Mapeia os rótulos locais de uma janela para rótulos globais."""
+        normalized: Dict[str, np.ndarray | None] = {}
+        for label, embedding in embeddings.items():
+            embedding = np.asarray(embedding, dtype=np.float64)
+            norm = float(np.linalg.norm(embedding))
+            valid = norm > 0 and np.isfinite(embedding).all()
+            normalized[label] = embedding / norm if valid else None
+
+        # Pares (distância, local, global) abaixo do limiar, dos mais próximos
+        # para os mais distantes.
+        candidates = []
+        for label, embedding in normalized.items():
+            if embedding is None:
+                continue
+            for index in range(len(self.centroids)):
+                distance = self._distance(embedding, index)
+                if distance is not None and distance <= self.threshold:
+                    candidates.append((distance, label, index))
+
+        assignment: Dict[str, int] = {}
+        taken = set()
+        for _, label, index in sorted(candidates):
+            if label not in assignment and index not in taken:
+                assignment[label] = index
+                taken.add(index)
+
+        for label in sorted(normalized):
+            if label not in assignment:
+                assignment[label] = len(self.centroids)
+                self.centroids.append(None)
+
+        for label, index in assignment.items():
+            embedding = normalized[label]
+            if embedding is None:
+                continue
+            weighted = embedding * max(durations.get(label, 0.0), 1e-3)
+            centroid = self.centroids[index]
+            self.centroids[index] = weighted if centroid is None else centroid + weighted
+
+        return {label: f"SPEAKER_{index:02d}" for label, index in assignment.items()}
 
 
 class DiarizationService:
@@ -19,6 +136,9 @@ class DiarizationService:
         self.model_id = env.DIARIZATION_MODEL
         self.sample_rate = env.TARGET_SAMPLE_RATE
         self.hf_token = env.HF_TOKEN
+        self.window_duration = env.DIARIZATION_WINDOW_DURATION
+        self.window_overlap = env.DIARIZATION_WINDOW_OVERLAP
+        self.link_threshold = env.DIARIZATION_LINK_THRESHOLD
 
         logging.info(
             f"Iniciando DiarizationService (carregando modelo '{self.model_id}')..."
@@ -26,6 +146,9 @@ class DiarizationService:
 
         self.device = None
         self.pipeline = None
+        # O pipeline é compartilhado entre os jobs e não é seguro entre threads:
+        # gerações concorrentes (JOB_WORKERS > 1) executam uma inferência por vez.
+        self._inference_lock = threading.Lock()
 
         self._load_model()
 
@@ -33,6 +156,9 @@ class DiarizationService:
         """
         Método privado para detectar dispositivo e carregar o modelo Pyannote.
         """
+        import torch
+        from pyannote.audio import Pipeline
+
         try:
             if torch.cuda.is_available():
                 self.device = torch.device("cuda")
@@ -68,30 +194,46 @@ class DiarizationService:
         """
         Método público para processar um arquivo e retornar os segmentos de fala.
         """
-        if self.pipeline is None:
-            raise RuntimeError("Modelo Pyannote não foi carregado corretamente.")
-
         if not os.path.exists(video_file_path):
             raise FileNotFoundError(
                 f"Arquivo não encontrado no serviço: {video_file_path}"
             )
 
         logging.info(f"Iniciando diarização para: {video_file_path}...")
+        logging.info(f"Pré-carregando e reamostrando áudio para {self.sample_rate}Hz...")
+        # Em janelas, o PCM é mapeado em memória e lido uma janela por vez.
+        with extracted_audio(
+            video_file_path, self.sample_rate, use_mmap=self.window_duration > 0
+        ) as audio:
+            return self.diarize_audio(audio)
 
-        try:
-            logging.info(
-                f"Pré-carregando e reamostrando áudio para {self.sample_rate}Hz..."
-            )
+    def _run_pipeline(self, audio: np.ndarray):
+        import torch
+
+        waveform_tensor = torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32))
+        waveform_tensor = waveform_tensor.unsqueeze(0).to(self.device)
 
-            waveform_numpy = whisper.load_audio(video_file_path, sr=self.sample_rate)
-            waveform_tensor = torch.from_numpy(waveform_numpy)
-            waveform_tensor = waveform_tensor.unsqueeze(0).to(self.device)
+        audio_data = {"waveform": waveform_tensor, "sample_rate": self.sample_rate}
+        with self._inference_lock:
+            return self.pipeline(audio_data)
 
-            audio_data = {"waveform": waveform_tensor, "sample_rate": self.sample_rate}
+    def diarize_audio(self, audio: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Executa a diarização sobre um áudio já decodificado
+        (float32 mono em TARGET_SAMPLE_RATE, pode ser um np.memmap).
+        Áudios maiores que DIARIZATION_WINDOW_DURATION são processados em janelas.
+        """
+        if self.pipeline is None:
+            raise RuntimeError("Modelo Pyannote não foi carregado corretamente.")
+
+        duration = len(audio) / self.sample_rate
+        try:
+            if 0 < self.window_duration < duration:
+                return self._diarize_windowed(audio, duration)
 
             logging.info("Áudio pré-carregado. Executando pipeline Pyannote...")
 
-            diarization_result = self.pipeline(audio_data)
+            diarization_result = self._run_pipeline(audio)
 
             segments = []
             for turn, speaker in diarization_result.speaker_diarization:
@@ -110,8 +252,104 @@ class DiarizationService:
             logging.error(f"Erro durante a execução da diarização: {e}", exc_info=True)
             raise e
 
+    def _diarize_windowed(
+        self, audio: np.ndarray, duration: float
+    ) -> List[Dict[str, Any]]:
+        """
+        Diariza janelas sobrepostas, uma por vez, e liga os locutores entre
+        elas pelos embeddings. Só uma janela (e as ativações do Pyannote
+        sobre ela) fica em memória, qualquer que seja a duração do áudio.
+        """
+        windows = plan_windows(duration, self.window_duration, self.window_overlap)
+        ownership = window_ownership(windows, duration)
+        linker = SpeakerLinker(self.link_threshold)
+        logging.info(
+            f"Diarização em {len(windows)} janelas de {self.window_duration:.0f}s "
+            f"({self.window_overlap:.0f}s de sobreposição)..."
+        )
+
+        turns: List[Dict[str, Any]] = []
+        for index, ((start, end), (own_start, own_end)) in enumerate(
+            zip(windows, ownership)
+        ):
+            first, last = int(start * self.sample_rate), int(end * self.sample_rate)
+            output = self._run_pipeline(audio[first:last])
+            # Libera o que já foi lido, menos a sobreposição com a próxima janela.
+            next_start = windows[index + 1][0] if index + 1 < len(windows) else end
+            release_pages(audio, first, int(next_start * self.sample_rate))
+            annotation = output.speaker_diarization
+            labels = annotation.labels()
+
+            embeddings = getattr(output, "speaker_embeddings", None)
+            if embeddings is None:
+                raise RuntimeError(
+                    f"O pipeline '{self.model_id}' não retorna embeddings dos "
+                    "locutores; use DIARIZATION_WINDOW_DURATION=0."
+                )
+            mapping = linker.link(
+                dict(zip(labels, embeddings)),
+                {label: annotation.label_duration(label) for label in labels},
+            )
+
+            # Cada janela contribui apenas com o trecho que lhe pertence.
+            for turn, speaker in annotation:
+                turn_start = max(start + turn.start, own_start)
+                turn_end = min(start + turn.end, own_end)
+                if turn_end > turn_start:
+                    turns.append(
+                        {"speaker": mapping[speaker], "start": turn_start, "end": turn_end}
+                    )
+            logging.info(
+                f"Diarização: janela {index + 1}/{len(windows)} concluída "
+                f"({len(labels)} locutores, {len(linker.centroids)} no total)."
+            )
+
+        segments = self._join_turns(turns, {own_end for _, own_end in ownership})
+        logging.info("Diarização concluída.")
+        return segments
+
+    def _join_turns(
+        self, turns: List[Dict[str, Any]], boundaries: set
+    ) -> List[Dict[str, Any]]:
+        """
+        Reúne os turnos cortados na fronteira entre duas janelas quando o
+        mesmo locutor fala dos dois lados.
+        """
+        joined: List[Dict[str, Any]] = []
+        last_turn: Dict[str, Dict[str, Any]] = {}
+        for turn in sorted(turns, key=lambda t: (t["start"], t["end"])):
+            previous = last_turn.get(turn["speaker"])
+            if (
+                previous is not None
+                and previous["end"] in boundaries
+                and previous["end"] == turn["start"]
+            ):
+                previous["end"] = turn["end"]
+                continue
+            joined.append(turn)
+            last_turn[turn["speaker"]] = turn
+
+        return [
+            {
+                "speaker": turn["speaker"],
+                "start": round(turn["start"], 3),
+                "end": round(turn["end"], 3),
+            }
+            for turn in joined
+        ]
+
+    def warm_up(self, duration: float = env.WARMUP_DURATION):
+        """
+        Executa uma inferência curta sobre áudio sintético (ruído fraco) para
+        disparar as alocações e caminhos de inicialização únicos do pipeline.
+        """
+        audio = np.random.default_rng(0).normal(
+            0.0, 0.01, int(duration * self.sample_rate)
+        ).astype(np.float32)
+        self.diarize_audio(audio)
+
 
-diarizationService: DiarizationService | None = None
+diarizationService: DiarizationService | StubDiarizationService | None = None
 
 _diarization_lock = threading.Lock()
 
@@ -128,6 +366,9 @@ def load_diarization_service():
     if diarizationService is None:
         with _diarization_lock:
             if diarizationService is None:
-                diarizationService = DiarizationService()
+                if env.INFERENCE_BACKEND == "stub":
+                    diarizationService = StubDiarizationService()
+                else:
+                    diarizationService = DiarizationService()
 
     return diarizationService
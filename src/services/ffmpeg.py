@@ -0,0 +1,208 @@
+import logging
+import re
+import subprocess
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Deque, Dict, Iterator, List, Tuple
+
+from src import env
+
+logger = logging.getLogger(__name__)
+
+# "Duration: 00:01:02.50" da primeira entrada, usado quando a duração não é informada.
+_DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d{2}):(\d{2}(?:\.\d+)?)")
+
+
+class RenderCancelledError(Exception):
+    """Lançada quando a renderização é cancelada (o ffmpeg é encerrado)."""
+
+
+class RenderProgress:
+    """
+    Progresso e cancelamento de uma renderização, compartilhado por todos
+    os processos ffmpeg dela (inclusive as partes paralelas).
+    'on_update(percentual, fps)' é chamado a cada bloco do '-progress'.
+    """
+
+    def __init__(self, on_update: Callable[[float, float], None] | None = None):
+        self.on_update = on_update
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._processes: Dict[int, subprocess.Popen] = {}
+        # id do processo -> (segundos codificados, duração, fps)
+        self._parts: Dict[int, Tuple[float, float, float]] = {}
+        self._expected = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def expect(self, seconds: float):
+        """Duração total que será codificada, quando há várias partes."""
+        with self._lock:
+            self._expected = seconds
+
+    def cancel(self):
+        """Encerra os processos em execução e impede que novos comecem."""
+        self._cancelled.set()
+        with self._lock:
+            processes = list(self._processes.values())
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+
+    def percent(self) -> float:
+        with self._lock:
+            return self._percent()
+
+    def _percent(self) -> float:
+        done = sum(min(seconds, duration) for seconds, duration, _ in self._parts.values())
+        total = max(self._expected, sum(duration for _, duration, _ in self._parts.values()))
+        return 100.0 * done / total if total > 0 else 0.0
+
+    def _attach(self, process: subprocess.Popen):
+        with self._lock:
+            self._processes[process.pid] = process
+        # Cancelado antes (ou durante) o início do processo.
+        if self.cancelled:
+            process.kill()
+
+    def _detach(self, process: subprocess.Popen):
+        with self._lock:
+            self._processes.pop(process.pid, None)
+            part = self._parts.get(process.pid)
+            if part is not None:
+                # Parte concluída: conta inteira e não soma mais ao fps.
+                self._parts[process.pid] = (part[1], part[1], 0.0)
+
+    def _report(self, process: subprocess.Popen, seconds: float, duration: float, fps: float):
+        with self._lock:
+            self._parts[process.pid] = (seconds, duration, fps)
+            percent = self._percent()
+            total_fps = sum(part_fps for _, _, part_fps in self._parts.values())
+        if self.on_update is not None:
+            self.on_update(percent, total_fps)
+
+
+_render_progress: ContextVar[RenderProgress | None] = ContextVar(
+    "render_progress", default=None
+)
+
+
+@contextmanager
+def track_render(progress: RenderProgress | None) -> Iterator[None]:
+    """Associa 'progress' aos processos ffmpeg iniciados dentro do bloco."""
+    token = _render_progress.set(progress)
+    try:
+        yield
+    finally:
+        _render_progress.reset(token)
+
+
+def current_render() -> RenderProgress | None:
+    """Renderização ativa no contexto atual, se houver."""
+    return _render_progress.get()
+
+
+def expect_render_duration(seconds: float):
+    """Informa a duração total a codificar à renderização atual, se houver."""
+    progress = _render_progress.get()
+    if progress is not None:
+        progress.expect(seconds)
+
+
+def _parse_duration(line: str) -> float | None:
+    match = _DURATION_PATTERN.search(line)
+    if match is None:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def run_ffmpeg(
+    ffmpeg_command: List[str], duration: float | None = None, track: bool = True
+):
+    """
+    Executa o ffmpeg lendo o '-progress' incrementalmente. O stderr é mantido
+    apenas nas últimas FFMPEG_STDERR_LINES linhas (usadas na mensagem de erro).
+
+    Com uma renderização ativa ('track_render'), o processo pode ser cancelado
+    e, com 'track', reporta o tempo codificado em relação a 'duration' (ou à
+    duração da primeira entrada, lida do stderr). Etapas de cópia rápidas
+    usam 'track=False' para não distorcer o percentual.
+    """
+    progress = _render_progress.get()
+    if progress is not None and progress.cancelled:
+        raise RenderCancelledError("Renderização cancelada.")
+
+    command = [ffmpeg_command[0], "-nostats", "-progress", "pipe:1", *ffmpeg_command[1:]]
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+    )
+
+    stderr_tail: Deque[str] = deque(maxlen=max(env.FFMPEG_STDERR_LINES, 1))
+    input_duration: List[float] = []
+
+    def drain_stderr():
+        for line in process.stderr:
+            stderr_tail.append(line)
+            if duration is None and not input_duration:
+                parsed = _parse_duration(line)
+                if parsed is not None:
+                    input_duration.append(parsed)
+
+    stderr_thread = threading.Thread(target=drain_stderr, daemon=True)
+    stderr_thread.start()
+
+    if progress is not None:
+        progress._attach(process)
+    try:
+        block: Dict[str, str] = {}
+        for line in process.stdout:
+            key, _, value = line.strip().partition("=")
+            if key != "progress":
+                block[key] = value
+                continue
+
+            if progress is not None and track:
+                # 'out_time_ms' também é em microssegundos (nome histórico do ffmpeg).
+                out_time = block.get("out_time_us") or block.get("out_time_ms") or ""
+                total = duration if duration is not None else (input_duration or [0.0])[0]
+                try:
+                    seconds = max(int(out_time), 0) / 1_000_000
+                except ValueError:
+                    seconds = 0.0
+                try:
+                    fps = float(block.get("fps", 0) or 0)
+                except ValueError:
+                    fps = 0.0
+                if value == "end":
+                    seconds, fps = total, 0.0
+                progress._report(process, seconds, total, fps)
+            block = {}
+
+        process.wait()
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        stderr_thread.join()
+        if progress is not None:
+            progress._detach(process)
+
+    if progress is not None and progress.cancelled:
+        logger.info("FFMPEG: Processo encerrado por cancelamento.")
+        raise RenderCancelledError("Renderização cancelada.")
+
+    if process.returncode != 0:
+        stderr = "".join(stderr_tail)
+        logger.error("Erro durante a renderização do ffmpeg:")
+        logger.error(stderr)
+        raise RuntimeError(f"Falha no FFMPEG: {stderr}")
@@ -0,0 +1,309 @@
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Set
+
+from src import env
+from src.services.metrics import load_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+
+class JobQueueFullError(Exception):
+    """Lançada quando o limite de jobs pendentes é atingido."""
+
+
+class Job:
+    """
+    Representa uma tarefa de geração ou renderização executada fora
+    do event loop, com estado consultável via polling.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        on_discard: Callable[[], None] | None = None,
+        files: Iterable[str] = (),
+    ):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        # Arquivos lidos pelo job, protegidos da limpeza enquanto ele não termina.
+        self.files = frozenset(files)
+        self.status = JOB_QUEUED
+        self.stage = JOB_QUEUED
+        self.progress = 0.0
+        self.result: Any = None
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        # Informações extras da etapa atual (ex: fps do ffmpeg).
+        self.details: Dict[str, Any] = {}
+        self.future: Future | None = None
+        self.cancel_requested = threading.Event()
+        self._cancel_callbacks: List[Callable[[], None]] = []
+        # Limpeza do que 'func' liberaria ao terminar, caso ela nunca execute.
+        self._on_discard = on_discard
+        self._lock = threading.Lock()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+    def update(self, stage: str, progress: float | None = None, **details: Any):
+        """Atualiza a etapa atual e, opcionalmente, o percentual (0-100) e os detalhes."""
+        with self._lock:
+            if stage != self.stage:
+                self.details = {}
+            self.stage = stage
+            if progress is not None:
+                self.progress = round(min(max(progress, 0.0), 100.0), 1)
+            self.details.update(details)
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """
+        Registra como interromper o job em execução (ex: encerrar o ffmpeg).
+        Jobs sem callback só podem ser cancelados enquanto estão na fila.
+        """
+        with self._lock:
+            self._cancel_callbacks.append(callback)
+        if self.cancel_requested.is_set():
+            callback()
+
+    def cancel(self) -> bool:
+        """Interrompe o job em execução; False se ele não puder ser interrompido."""
+        with self._lock:
+            if self.is_finished or not self._cancel_callbacks:
+                return False
+            self.cancel_requested.set()
+            callbacks = list(self._cancel_callbacks)
+        for callback in callbacks:
+            callback()
+        return True
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": self.progress,
+                "details": dict(self.details),
+                "error": self.error,
+                "result": self.result if include_result else None,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """
+    Executa jobs em pools limitados de workers, um por tipo de job: uma
+    prévia ou renderização não espera na fila atrás de gerações (e vice-versa),
+    e as renderizações concorrentes chegam ao RenderScheduler, que ordena
+    os encoders por prioridade.
+    Rejeita novos jobs quando 'max_pending' (fila + execução) é atingido.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = env.JOB_WORKERS,
+        max_pending: int = env.MAX_PENDING_JOBS,
+        result_ttl: int = env.JOB_RESULT_TTL,
+        render_workers: int = env.RENDER_JOB_WORKERS,
+        preview_workers: int = env.PREVIEW_JOB_WORKERS,
+    ):
+        workers = {
+            "generate": max(1, max_workers),
+            "render": max(1, render_workers or env.RENDER_MAX_CONCURRENT),
+            "preview": max(1, preview_workers),
+        }
+        logger.info(
+            f"Iniciando JobManager (workers={workers}, max_pending={max_pending})..."
+        )
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._executors = {
+            kind: ThreadPoolExecutor(
+                max_workers=count, thread_name_prefix=f"job-{kind}"
+            )
+            for kind, count in workers.items()
+        }
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def pending_count(self) -> int:
+        """Quantidade de jobs na fila ou em execução."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.is_finished)
+
+    def status_counts(self) -> Dict[str, int]:
+        """Quantidade de jobs na fila e em execução."""
+        counts = {JOB_QUEUED: 0, JOB_RUNNING: 0}
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status in counts:
+                    counts[job.status] += 1
+        return counts
+
+    def files_in_use(self) -> Set[str]:
+        """Arquivos usados pelos jobs na fila ou em execução."""
+        with self._lock:
+            return {
+                path
+                for job in self._jobs.values()
+                if not job.is_finished
+                for path in job.files
+            }
+
+    def is_full(self) -> bool:
+        return self.pending_count() >= self.max_pending
+
+    def submit(
+        self,
+        kind: str,
+        func: Callable[[Job], Any],
+        on_discard: Callable[[], None] | None = None,
+        files: Iterable[str] = (),
+    ) -> Job:
+        """
+        Enfileira 'func(job)' no pool do tipo 'kind' ("generate", "render"
+        ou "preview"). O valor retornado por 'func' vira o resultado do job.
+        'on_discard' é chamado se o job for cancelado antes de iniciar,
+        já que 'func' não chega a executar (ex: apagar o upload). 'files'
+        são os arquivos que o job lê (ver 'files_in_use').
+        """
+        self._expire_finished()
+
+        job = Job(kind, on_discard, files)
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if not j.is_finished)
+            if pending >= self.max_pending:
+                raise JobQueueFullError(
+                    f"Limite de {self.max_pending} jobs pendentes atingido."
+                )
+            self._jobs[job.id] = job
+            # O contexto acompanha o job (ex: etapas anotadas no 'Server-Timing').
+            job.future = self._executors[kind].submit(
+                contextvars.copy_context().run, self._run, job, func
+            )
+
+        logger.info(f"JobManager: Job {job.id} ({kind}) enfileirado.")
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job: Job) -> bool:
+        """
+        Cancela o job: se ainda estiver na fila, ele não chega a executar;
+        em execução, é interrompido via 'Job.on_cancel' e libera o worker.
+        Retorna False se o job já terminou ou não pode ser interrompido.
+        """
+        if job.future is not None and job.future.cancel():
+            with job._lock:
+                job.status = JOB_CANCELLED
+                job.stage = JOB_CANCELLED
+                job.finished_at = time.time()
+            load_metrics_registry().jobs_total.inc(kind=job.kind, status=JOB_CANCELLED)
+            logger.info(f"JobManager: Job {job.id} cancelado antes de iniciar.")
+            if job._on_discard is not None:
+                try:
+                    job._on_discard()
+                except Exception as e:
+                    logger.error(
+                        f"JobManager: Falha na limpeza do job {job.id}: {e}", exc_info=True
+                    )
+            return True
+
+        if not job.cancel():
+            return False
+        logger.info(f"JobManager: Cancelamento do job {job.id} solicitado.")
+        return True
+
+    def _run(self, job: Job, func: Callable[[Job], Any]) -> Any:
+        with job._lock:
+            job.status = JOB_RUNNING
+            job.stage = "starting"
+            job.started_at = time.time()
+
+        metrics = load_metrics_registry()
+        metrics.observe_stage("queue_wait", job.started_at - job.created_at)
+        try:
+            result = func(job)
+        except Exception as e:
+            status = JOB_CANCELLED if job.cancel_requested.is_set() else JOB_FAILED
+            if status == JOB_CANCELLED:
+                logger.info(f"JobManager: Job {job.id} cancelado.")
+            else:
+                logger.error(f"JobManager: Job {job.id} falhou: {e}", exc_info=True)
+            with job._lock:
+                job.status = status
+                job.stage = status
+                job.error = str(e)
+                job.finished_at = time.time()
+            metrics.jobs_total.inc(kind=job.kind, status=status)
+            raise
+
+        with job._lock:
+            job.status = JOB_COMPLETED
+            job.stage = JOB_COMPLETED
+            job.progress = 100.0
+            job.result = result
+            job.finished_at = time.time()
+        metrics.jobs_total.inc(kind=job.kind, status=JOB_COMPLETED)
+        logger.info(f"JobManager: Job {job.id} concluído.")
+        return result
+
+    def _expire_finished(self):
+        """Remove do registro os jobs concluídos há mais de 'result_ttl' segundos."""
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id
+                for job_id, job in self._jobs.items()
+                if job.is_finished
+                and job.finished_at is not None
+                and now - job.finished_at > self.result_ttl
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+jobManager: JobManager | None = None
+
+_job_manager_lock = threading.Lock()
+
+
+def load_job_manager():
+    """
+    Cria o JobManager na primeira chamada (mesmo padrão dos serviços).
+    """
+    global jobManager
+
+    if jobManager is None:
+        with _job_manager_lock:
+            if jobManager is None:
+                jobManager = JobManager()
+                load_metrics_registry().register_gauge(
+                    "multimidia_jobs",
+                    "Jobs na fila (queued) e em execução (running).",
+                    lambda: {
+                        (("status", status),): float(count)
+                        for status, count in jobManager.status_counts().items()
+                    },
+                )
+
+    return jobManager
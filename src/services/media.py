@@ -0,0 +1,85 @@
+import json
+import logging
+import subprocess
+from typing import Any, Dict, List
+
+
+def _run_ffprobe(args: List[str]) -> str:
+    ffprobe_command = ["ffprobe", "-v", "error", *args]
+    try:
+        result = subprocess.run(
+            ffprobe_command, capture_output=True, text=True, check=True
+        )
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Erro ao executar ffprobe: {e.stderr}")
+        raise RuntimeError(f"Falha no FFPROBE: {e.stderr}") from e
+    return result.stdout
+
+
+def probe_video(video_path: str) -> Dict[str, Any]:
+    """
+    Retorna informações básicas do contêiner e do primeiro stream de vídeo:
+    duração, instante inicial, codec, perfil, nível, resolução, pix_fmt,
+    taxa de quadros, timebase, entrelaçamento e descrição de cores.
+    """
+    output = _run_ffprobe(
+        [
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            "format=duration,start_time:stream=codec_name,width,height,pix_fmt,"
+            "avg_frame_rate,profile,level,time_base,field_order,color_range,"
+            "color_space,color_transfer,color_primaries",
+            "-of",
+            "json",
+            video_path,
+        ]
+    )
+    data = json.loads(output)
+    format_info = data.get("format", {})
+    stream = (data.get("streams") or [{}])[0]
+
+    return {
+        "duration": float(format_info.get("duration") or 0.0),
+        "start_time": float(format_info.get("start_time") or 0.0),
+        "codec_name": stream.get("codec_name"),
+        "profile": stream.get("profile"),
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+        "pix_fmt": stream.get("pix_fmt"),
+        "avg_frame_rate": stream.get("avg_frame_rate"),
+        "level": stream.get("level"),
+        "time_base": stream.get("time_base"),
+        "field_order": stream.get("field_order"),
+        "color_range": stream.get("color_range"),
+        "color_space": stream.get("color_space"),
+        "color_transfer": stream.get("color_transfer"),
+        "color_primaries": stream.get("color_primaries"),
+    }
+
+
+def probe_keyframes(video_path: str, start_time: float = 0.0) -> List[float]:
+    """
+    Lista os instantes (s) dos quadros-chave do primeiro stream de vídeo,
+    relativos ao início do arquivo. Lê apenas os pacotes, sem decodificar.
+    """
+    output = _run_ffprobe(
+        [
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            "packet=pts_time,flags",
+            "-of",
+            "csv=p=0",
+            video_path,
+        ]
+    )
+
+    keyframes = []
+    for line in output.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" not in flags or pts_time in ("", "N/A"):
+            continue
+        keyframes.append(round(float(pts_time) - start_time, 6))
+
+    return sorted(set(keyframes))
@@ -0,0 +1,54 @@
+import os
+from typing import Dict
+
+# Campos de /proc/<pid>/smaps_rollup, em kB, e seus nomes na resposta.
+SMAPS_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared_clean",
+    "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean",
+    "Private_Dirty": "private_dirty",
+    "Swap": "swap",
+}
+
+
+def read_memory_usage(pid: int | str = "self") -> Dict[str, int]:
+    """
+    Uso de memória de um processo, em bytes (Linux).
+
+    'rss' conta as páginas compartilhadas (ex: pesos herdados do processo
+    pai via fork) em cada worker; 'pss' as divide entre os processos que
+    as compartilham, e 'shared'/'private' separam as duas partes.
+    Sem 'smaps_rollup' (kernels antigos), usa '/proc/<pid>/statm'.
+    """
+    usage: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in SMAPS_FIELDS:
+                    usage[SMAPS_FIELDS[name]] = int(value.split()[0]) * 1024
+    except FileNotFoundError:
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        with open(f"/proc/{pid}/statm", "r") as f:
+            _, resident, shared, *_ = (int(value) for value in f.read().split())
+        usage = {
+            "rss": resident * page_size,
+            "shared_clean": shared * page_size,
+            "private_clean": 0,
+            "private_dirty": (resident - shared) * page_size,
+        }
+
+    usage["shared"] = usage.get("shared_clean", 0) + usage.get("shared_dirty", 0)
+    usage["private"] = usage.get("private_clean", 0) + usage.get("private_dirty", 0)
+    return usage
+
+
+def format_memory_usage(usage: Dict[str, int]) -> str:
+    """Resumo legível (MiB) de 'read_memory_usage' para logs."""
+    parts = []
+    for key in ("rss", "pss", "shared", "private"):
+        if key in usage:
+            parts.append(f"{key}={usage[key] / 2**20:.1f}MiB")
+    return " ".join(parts)
@@ -0,0 +1,96 @@
+from typing import Any, Dict, List
+
+UNKNOWN_SPEAKER = "UNKNOWN"
+
+
+def find_dominant_speaker(
+    segment_start: float,
+    segment_end: float,
+    diarization_result: List[Dict[str, Any]],
+) -> str:
+    """
+    Encontra o interlocutor dominante em um segmento de texto varrendo
+    todos os turnos da diarização (O(M) por segmento).
+    Retorna 'UNKNOWN' se não houver overlap.
+
+    Mantida como implementação de referência para 'assign_dominant_speakers'.
+    """
+    speaker_overlap = {}
+    max_overlap = 0
+    dominant_speaker = UNKNOWN_SPEAKER
+    for turn in diarization_result:
+        turn_start = turn["start"]
+        turn_end = turn["end"]
+        speaker = turn["speaker"]
+        overlap = max(0, min(segment_end, turn_end) - max(segment_start, turn_start))
+        if overlap > 0:
+            current_total = speaker_overlap.get(speaker, 0) + overlap
+            speaker_overlap[speaker] = current_total
+            if current_total > max_overlap:
+                max_overlap = current_total
+                dominant_speaker = speaker
+    return dominant_speaker
+
+
+def assign_dominant_speakers(
+    segments: List[Dict[str, Any]],
+    diarization_result: List[Dict[str, Any]],
+) -> List[str]:
+    """
+    Atribui o interlocutor dominante a cada segmento com uma varredura
+    ordenada (dois ponteiros) sobre segmentos e turnos.
+
+    Custo O((N + M) log(N + M) + K), onde K é o número de pares que
+    realmente se sobrepõem. O resultado é idêntico ao de chamar
+    'find_dominant_speaker' para cada segmento: os overlaps de cada
+    segmento são acumulados na ordem original dos turnos, preservando
+    o mesmo critério de desempate.
+    """
+    turn_starts = [turn["start"] for turn in diarization_result]
+    turn_ends = [turn["end"] for turn in diarization_result]
+    turn_speakers = [turn["speaker"] for turn in diarization_result]
+
+    turn_order = sorted(range(len(diarization_result)), key=turn_starts.__getitem__)
+    segment_order = sorted(range(len(segments)), key=lambda i: segments[i]["start"])
+
+    dominant_speakers = [UNKNOWN_SPEAKER] * len(segments)
+    active_turns: List[int] = []
+    next_turn = 0
+
+    for segment_index in segment_order:
+        segment_start = segments[segment_index]["start"]
+        segment_end = segments[segment_index]["end"]
+
+        # Entram os turnos que começam antes do fim do segmento.
+        while (
+            next_turn < len(turn_order)
+            and turn_starts[turn_order[next_turn]] < segment_end
+        ):
+            active_turns.append(turn_order[next_turn])
+            next_turn += 1
+
+        # Segmentos seguintes começam depois deste: turnos já encerrados saem.
+        active_turns = [i for i in active_turns if turn_ends[i] > segment_start]
+
+        candidates = sorted(i for i in active_turns if turn_starts[i] < segment_end)
+
+        speaker_overlap = {}
+        max_overlap = 0
+        dominant_speaker = UNKNOWN_SPEAKER
+        for turn_index in candidates:
+            overlap = max(
+                0,
+                min(segment_end, turn_ends[turn_index])
+                - max(segment_start, turn_starts[turn_index]),
+            )
+            if overlap > 0:
+                speaker = turn_speakers[turn_index]
+                current_total = speaker_overlap.get(speaker, 0) + overlap
+                speaker_overlap[speaker] = current_total
+                if current_total > max_overlap:
+                    max_overlap = current_total
+                    dominant_speaker = speaker
+
+        dominant_speakers[segment_index] = dominant_speaker
+
+    return dominant_speakers
@@ -0,0 +1,306 @@
+import bisect
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+from src.services.memory import read_memory_usage
+
+# Limites (s) dos histogramas de duração: de buscas no cache a transcrições longas.
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0,
+)
+
+# Limites do fator de tempo real (segundos de áudio por segundo de processamento).
+REALTIME_FACTOR_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0, 200.0)
+
+# Durações (s) das etapas da requisição atual, para o cabeçalho 'Server-Timing'.
+# Propagado para as threads dos jobs junto com o contexto.
+_request_timings: ContextVar[Dict[str, float] | None] = ContextVar(
+    "request_timings", default=None
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Tuple[str, str] | None = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(str(v))}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    """Histograma cumulativo no formato do Prometheus, por combinação de rótulos."""
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        # rótulos -> (contagem por faixa, soma, total)
+        self._series: Dict[Labels, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, count = self._series.get(
+                key, ([0] * (len(self.buckets) + 1), 0.0, 0)
+            )
+            counts[index] += 1
+            self._series[key] = (counts, total + value, count + 1)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = {key: (list(c), s, n) for key, (c, s, n) in self._series.items()}
+        for labels, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{_format_labels(labels, ('le', _format_value(bound)))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Counter:
+    """Contador monotônico no formato do Prometheus, por combinação de rótulos."""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Valor instantâneo, lido de 'collect()' a cada coleta."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], Dict[Labels, float]],
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+        ]
+        for labels, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+def _process_memory() -> Dict[Labels, float]:
+    usage = read_memory_usage()
+    # ru_maxrss é informado em kB no Linux.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    values = {(("kind", "peak_rss"),): float(peak)}
+    for key in ("rss", "pss", "shared", "private"):
+        if key in usage:
+            values[(("kind", key),)] = float(usage[key])
+    return values
+
+
+class MetricsRegistry:
+    """
+    Métricas do processo, expostas em '/metrics' no formato texto do
+    Prometheus. Com vários workers ('src.serve'), cada worker mantém
+    as suas, e o Prometheus deve coletar (ou somar) por instância.
+    """
+
+    def __init__(self):
+        self.stage_duration = Histogram(
+            "multimidia_stage_duration_seconds",
+            "Duração de cada etapa do processamento.",
+            DURATION_BUCKETS,
+        )
+        self.realtime_factor = Histogram(
+            "multimidia_realtime_factor",
+            "Segundos de áudio processados por segundo de relógio.",
+            REALTIME_FACTOR_BUCKETS,
+        )
+        self.request_duration = Histogram(
+            "multimidia_http_request_duration_seconds",
+            "Duração das requisições HTTP.",
+            DURATION_BUCKETS,
+        )
+        self.jobs_total = Counter(
+            "multimidia_jobs_total",
+            "Jobs finalizados, por tipo e status.",
+        )
+        self._gauges: List[Gauge] = [
+            Gauge(
+                "multimidia_process_memory_bytes",
+                "Memória do processo (RSS, PSS, compartilhada, privada e pico de RSS).",
+                _process_memory,
+            )
+        ]
+
+    def register_gauge(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], Dict[Labels, float]],
+    ):
+        self._gauges.append(Gauge(name, documentation, collect))
+
+    def observe_stage(
+        self, stage: str, seconds: float, audio_duration: float | None = None
+    ):
+        """
+        Registra a duração de uma etapa (e o fator de tempo real, se
+        'audio_duration' for informado) e a anota na requisição atual.
+        """
+        self.stage_duration.observe(seconds, stage=stage)
+        if audio_duration and seconds > 0:
+            self.realtime_factor.observe(audio_duration / seconds, stage=stage)
+
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def time_stage(
+        self, stage: str, audio_duration: float | None = None
+    ) -> Iterator[None]:
+        """Mede o bloco como uma etapa (registrada também em caso de erro)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - start, audio_duration)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in (
+            self.stage_duration,
+            self.realtime_factor,
+            self.request_duration,
+            self.jobs_total,
+            *self._gauges,
+        ):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def format_server_timing(timings: Dict[str, float], total: float) -> str:
+    """Valor do cabeçalho 'Server-Timing' (durações em milissegundos)."""
+    entries = [
+        f"{stage};dur={1000 * seconds:.1f}" for stage, seconds in timings.items()
+    ]
+    entries.append(f"total;dur={1000 * total:.1f}")
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mede cada requisição HTTP e, com 'timing_headers',
+    adiciona o cabeçalho 'Server-Timing' com as etapas executadas até o
+    início da resposta.
+    """
+
+    def __init__(self, app, timing_headers: bool = False):
+        self.app = app
+        self.timing_headers = timing_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = load_metrics_registry()
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status = "500"
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                if self.timing_headers:
+                    header = format_server_timing(timings, time.perf_counter() - start)
+                    message = {
+                        **message,
+                        "headers": [
+                            *message.get("headers", []),
+                            (b"server-timing", header.encode("latin-1")),
+                        ],
+                    }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            # Nome da função da rota: cardinalidade limitada e independente
+            # do prefixo com que o router foi incluído.
+            route = scope.get("route")
+            registry.request_duration.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                handler=getattr(route, "name", None) or "unmatched",
+                status=status,
+            )
+
+
+metricsRegistry: MetricsRegistry | None = None
+
+_metrics_lock = threading.Lock()
+
+
+def load_metrics_registry():
+    """
+    Cria o MetricsRegistry na primeira chamada (mesmo padrão dos serviços).
+    """
+    global metricsRegistry
+
+    if metricsRegistry is None:
+        with _metrics_lock:
+            if metricsRegistry is None:
+                metricsRegistry = MetricsRegistry()
+
+    return metricsRegistry
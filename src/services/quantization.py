@@ -0,0 +1,135 @@
+import dataclasses
+import logging
+import os
+import time
+
+from src import env
+
+logger = logging.getLogger(__name__)
+
+
+def _checkpoint_path(model_name: str, cache_dir: str) -> str:
+    """
+    Os pesos quantizados dependem das versões do torch e do whisper, então
+    o nome inclui as duas: uma atualização gera um novo arquivo.
+    """
+    import torch
+    import whisper
+
+    whisper_version = getattr(whisper, "__version__", "unknown")
+    file_name = (
+        f"whisper-{model_name}-int8-torch{torch.__version__}-"
+        f"whisper{whisper_version}.pt"
+    ).replace(os.sep, "_")
+    return os.path.join(cache_dir, file_name)
+
+
+def _replace_linear_layers(module):
+    """
+    Troca as camadas 'whisper.model.Linear' por 'torch.nn.Linear' com os
+    mesmos pesos: 'quantize_dynamic' só reconhece o tipo exato.
+    """
+    import torch
+
+    for name, child in module.named_children():
+        if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+            linear = torch.nn.Linear(
+                child.in_features, child.out_features, bias=child.bias is not None
+            )
+            linear.weight = child.weight
+            if child.bias is not None:
+                linear.bias = child.bias
+            setattr(module, name, linear)
+        else:
+            _replace_linear_layers(child)
+
+
+def quantize_whisper_int8(model):
+    """
+    Quantização dinâmica int8 das camadas lineares (atenção e MLP) do
+    Whisper: pesos em int8, ativações quantizadas em tempo de execução.
+    Convoluções, embeddings e LayerNorm continuam em fp32.
+    """
+    import torch
+
+    model.eval()
+    _replace_linear_layers(model)
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def _checkpoint(model) -> dict:
+    """
+    Só tensores e tipos simples, no formato dos checkpoints do whisper:
+    o arquivo pode ser lido com 'weights_only=True', sem executar código.
+    A máscara de cabeças de alinhamento não faz parte do 'state_dict'.
+    """
+    return {
+        "dims": dataclasses.asdict(model.dims),
+        "model_state_dict": model.state_dict(),
+        "alignment_heads": model.alignment_heads.to_dense(),
+    }
+
+
+def _load_checkpoint(checkpoint_path: str):
+    """
+    Recria a arquitetura a partir das dimensões, quantiza e carrega os
+    pesos int8 gravados.
+    """
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+
+    checkpoint = torch.load(checkpoint_path, map_location="cpu", weights_only=True)
+    model = quantize_whisper_int8(Whisper(ModelDimensions(**checkpoint["dims"])))
+    model.load_state_dict(checkpoint["model_state_dict"])
+    model.register_buffer(
+        "alignment_heads", checkpoint["alignment_heads"].to_sparse(), persistent=False
+    )
+    return model
+
+
+def load_quantized_whisper(
+    model_name: str, cache_dir: str = env.WHISPER_QUANTIZED_CACHE_DIR
+):
+    """
+    Carrega o Whisper quantizado em int8 (CPU). Reaproveita o checkpoint
+    quantizado em 'cache_dir' ou, na primeira vez, carrega o modelo fp32,
+    quantiza e grava o resultado.
+    """
+    import torch
+    import whisper
+
+    checkpoint_path = _checkpoint_path(model_name, cache_dir)
+    if os.path.exists(checkpoint_path):
+        try:
+            start = time.perf_counter()
+            model = _load_checkpoint(checkpoint_path)
+            logger.info(
+                f"Quantization: Checkpoint int8 carregado de '{checkpoint_path}' "
+                f"({time.perf_counter() - start:.1f}s)."
+            )
+            return model
+        except Exception as e:
+            logger.warning(
+                f"Quantization: Checkpoint inválido em '{checkpoint_path}' ({e}); "
+                "quantizando novamente."
+            )
+
+    start = time.perf_counter()
+    model = quantize_whisper_int8(whisper.load_model(model_name, device="cpu"))
+    logger.info(
+        f"Quantization: Modelo '{model_name}' quantizado em int8 "
+        f"({time.perf_counter() - start:.1f}s)."
+    )
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{checkpoint_path}.{os.getpid()}.tmp"
+        torch.save(_checkpoint(model), temp_path)
+        os.replace(temp_path, checkpoint_path)
+        logger.info(f"Quantization: Checkpoint int8 gravado em '{checkpoint_path}'.")
+    except Exception as e:
+        logger.warning(f"Quantization: Não foi possível gravar o checkpoint: {e}")
+
+    return model
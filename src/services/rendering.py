@@ -1,11 +1,27 @@
+import bisect
+import contextvars
+import heapq
+import itertools
 import logging
 import os
-import subprocess
+import shutil
 import tempfile
 import threading
-from typing import Any, Dict, List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, TextIO, Tuple
 
+from src import env
 from src.models.subtitle import SubtitleSegment
+from src.services.ffmpeg import (
+    RenderCancelledError,
+    current_render,
+    expect_render_duration,
+    run_ffmpeg,
+)
+from src.services.media import probe_keyframes, probe_video
+from src.services.metrics import load_metrics_registry
 
 
 def _format_time_ass(seconds: float) -> str:
@@ -17,6 +33,20 @@ def _format_time_ass(seconds: float) -> str:
     return f"{hours}:{minutes:02}:{sec:02}.{hundredths:02}"
 
 
+def _format_time_srt(seconds: float) -> str:
+    """Converte segundos (float) para o formato HH:MM:SS,mmm do SRT"""
+    total_ms = int(round(max(seconds, 0) * 1000))
+    hours, rest = divmod(total_ms, 3_600_000)
+    minutes, rest = divmod(rest, 60_000)
+    sec, ms = divmod(rest, 1000)
+    return f"{hours:02}:{minutes:02}:{sec:02},{ms:03}"
+
+
+def _format_time_vtt(seconds: float) -> str:
+    """Converte segundos (float) para o formato HH:MM:SS.mmm do WebVTT"""
+    return _format_time_srt(seconds).replace(",", ".")
+
+
 def _format_color_ass(hex_color: str) -> str:
     """Converte cor Hex (#RRGGBB) para o formato ASS (&HBBGGRR)"""
     if not hex_color.startswith("#") or len(hex_color) != 7:
@@ -31,11 +61,19 @@ class AssSubtitleGenerator:
     """
     Gera o conteúdo de um arquivo de legenda .ass a partir
     de dados de legenda e definições de estilo.
+
+    Os eventos ficam em uma lista (concatenada uma única vez em
+    'get_content') ou são gravados direto no arquivo com 'write'.
     """
 
     def __init__(self, style_options: Dict[str, Any]):
         self.styles = self._generate_style_header(style_options)
-        self.events = self._generate_events_header()
+        self.events: List[str] = [self._generate_events_header()]
+        self.speakers = self._build_speaker_lookup(style_options.get("speakers", {}))
+        # Último 'speaker_styles' recebido por 'add_dialogue' e a tabela dele.
+        self._custom_speakers: (
+            Tuple[Dict[str, Any], Dict[str, Tuple[str, str]]] | None
+        ) = None
 
     def _generate_style_header(self, options: Dict[str, Any]) -> str:
         default_font = options.get("default", {}).get("font_name", "Arial")
@@ -44,7 +82,8 @@ class AssSubtitleGenerator:
             options.get("default", {}).get("font_color", "#FFFFFF")
         )
 
-        header = "[V4+ Styles]\n"
+        header = "[Script Info]\nScriptType: v4.00+\n\n"
+        header += "[V4+ Styles]\n"
         header += "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n"
         header += f"Style: Default,{default_font},{default_size},{default_color},&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,1,2,10,10,10,1\n"
 
@@ -66,35 +105,393 @@ class AssSubtitleGenerator:
         header += "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
         return header
 
-    def add_dialogue(self, subtitle: SubtitleSegment, speaker_styles: Dict[str, Any]):
+    def _build_speaker_lookup(
+        self, speaker_styles: Dict[str, Any]
+    ) -> Dict[str, Tuple[str, str]]:
         """
-        Adiciona uma linha de diálogo.
+        Calcula uma vez, por interlocutor, o início da linha 'Dialogue'
+        (estilo e nome) e o prefixo do texto com o nome em negrito.
+        """
+        lookup = {}
+        for speaker_id, style in speaker_styles.items():
+            speaker_name = style.get("name", "")
+            prefix = f"{{\\b1}}{speaker_name}:{{\\b0}} " if speaker_name else ""
+            lookup[speaker_id] = (
+                f"{speaker_id},{speaker_name},0,0,0,,",
+                prefix.replace("\n", "\\N"),
+            )
+        return lookup
+
+    def format_dialogue(
+        self,
+        subtitle: SubtitleSegment,
+        speakers: Dict[str, Tuple[str, str]] | None = None,
+    ) -> str:
+        """
+        Formata uma linha de diálogo.
         Recebe um objeto Pydantic 'SubtitleSegment', não um dicionário.
         """
+        speakers = self.speakers if speakers is None else speakers
+        fields, prefix = speakers.get(subtitle.speaker, ("Default,,0,0,0,,", ""))
+        text = subtitle.text.replace("\n", "\\N")
+        return (
+            f"Dialogue: 0,{_format_time_ass(subtitle.start)},"
+            f"{_format_time_ass(subtitle.end)},{fields}{prefix}{text}\n"
+        )
 
-        start = _format_time_ass(subtitle.start)
-        end = _format_time_ass(subtitle.end)
-        text = subtitle.text
-        speaker_id = subtitle.speaker
+    def add_dialogue(
+        self, subtitle: SubtitleSegment, speaker_styles: Dict[str, Any] | None = None
+    ):
+        """
+        Adiciona uma linha de diálogo ao conteúdo em memória.
+        'speaker_styles', se informado, substitui os interlocutores passados
+        ao construtor nesta linha; a tabela dele é calculada uma vez e reusada
+        enquanto o mesmo dicionário for passado.
+        """
+        if speaker_styles is None:
+            self.events.append(self.format_dialogue(subtitle))
+            return
 
-        style_name = speaker_id if speaker_id in speaker_styles else "Default"
-        speaker_name = speaker_styles.get(speaker_id, {}).get("name", "")
+        if self._custom_speakers is None or self._custom_speakers[0] is not speaker_styles:
+            self._custom_speakers = (
+                speaker_styles,
+                self._build_speaker_lookup(speaker_styles),
+            )
+        self.events.append(self.format_dialogue(subtitle, self._custom_speakers[1]))
 
-        if speaker_name:
-            text = f"{{\\b1}}{speaker_name}:{{\\b0}} {text}"
+    def get_content(self) -> str:
+        return self.styles + "".join(self.events)
 
-        text = text.replace("\n", "\\N")
-        self.events += (
-            f"Dialogue: 0,{start},{end},{style_name},{speaker_name},0,0,0,,{text}\n"
+    def write(self, file: TextIO, subtitles_data: Iterable[SubtitleSegment]):
+        """
+        Grava o cabeçalho e as linhas de diálogo direto em 'file', sem
+        montar o documento inteiro em memória.
+        """
+        file.write(self.styles)
+        file.writelines(self.events)
+        file.writelines(self.format_dialogue(subtitle) for subtitle in subtitles_data)
+
+
+def _plain_text(subtitle: SubtitleSegment, speaker_styles: Dict[str, Any]) -> str:
+    """Texto simples (SRT/WebVTT), prefixado pelo nome do interlocutor, se houver."""
+    speaker_name = speaker_styles.get(subtitle.speaker, {}).get("name", "")
+    text = subtitle.text.strip()
+    return f"{speaker_name}: {text}" if speaker_name else text
+
+
+def generate_subtitle_file(
+    subtitles_data: List[SubtitleSegment],
+    style_options: Dict[str, Any],
+    subtitle_format: str,
+) -> str:
+    """
+    Gera o conteúdo de um arquivo de legenda ('ass', 'srt' ou 'vtt')
+    sem passar pelo ffmpeg.
+    """
+    speaker_styles = style_options.get("speakers", {})
+
+    if subtitle_format == "ass":
+        ass_gen = AssSubtitleGenerator(style_options)
+        for subtitle_segment in subtitles_data:
+            ass_gen.add_dialogue(subtitle_segment)
+        return ass_gen.get_content()
+
+    if subtitle_format == "srt":
+        blocks = [
+            f"{index}\n{_format_time_srt(sub.start)} --> {_format_time_srt(sub.end)}\n"
+            f"{_plain_text(sub, speaker_styles)}\n"
+            for index, sub in enumerate(subtitles_data, start=1)
+        ]
+        return "\n".join(blocks)
+
+    if subtitle_format == "vtt":
+        blocks = [
+            f"{_format_time_vtt(sub.start)} --> {_format_time_vtt(sub.end)}\n"
+            f"{_plain_text(sub, speaker_styles)}\n"
+            for sub in subtitles_data
+        ]
+        return "WEBVTT\n\n" + "\n".join(blocks)
+
+    raise ValueError(f"Formato de legenda não suportado: {subtitle_format}")
+
+
+def _slice_subtitles(
+    subtitles_data: List[SubtitleSegment], start: float, end: float | None
+) -> List[SubtitleSegment]:
+    """
+    Seleciona as legendas que cruzam o intervalo [start, end), recortadas
+    ao intervalo e deslocadas para que 'start' vire o instante 0.
+    """
+    sliced = []
+    for subtitle in subtitles_data:
+        if subtitle.end <= start or (end is not None and subtitle.start >= end):
+            continue
+        clipped_end = subtitle.end if end is None else min(subtitle.end, end)
+        sliced.append(
+            subtitle.model_copy(
+                update={
+                    "start": max(subtitle.start, start) - start,
+                    "end": clipped_end - start,
+                }
+            )
         )
+    return sliced
 
-    def get_content(self) -> str:
-        return self.styles + self.events
+
+def _split_ranges(
+    keyframes: List[float], duration: float, parts: int
+) -> List[Tuple[float, float | None]]:
+    """
+    Divide o vídeo em até 'parts' intervalos de duração semelhante,
+    com cortes alinhados ao quadro-chave mais próximo de cada alvo.
+    O último intervalo termina em None (fim do arquivo).
+    """
+    boundaries = [0.0]
+    for index in range(1, parts):
+        target = duration * index / parts
+        position = bisect.bisect_left(keyframes, target)
+        nearby = keyframes[max(position - 1, 0) : position + 1]
+        if not nearby:
+            continue
+        keyframe = min(nearby, key=lambda k: abs(k - target))
+        if boundaries[-1] < keyframe < duration:
+            boundaries.append(keyframe)
+
+    return [
+        (start, boundaries[i + 1] if i + 1 < len(boundaries) else None)
+        for i, start in enumerate(boundaries)
+    ]
+
+
+def _smart_ranges(
+    subtitles_data: List[SubtitleSegment], keyframes: List[float]
+) -> List[Tuple[float, float | None, bool]]:
+    """
+    Calcula os intervalos cobertos por legendas, expandidos até os
+    quadros-chave que os envolvem, intercalados com os intervalos sem
+    legenda. Retorna (início, fim ou None para o fim do arquivo, reencode?).
+    """
+    infinity = float("inf")
+    covered: List[List[float]] = []
+    for subtitle in sorted(subtitles_data, key=lambda sub: sub.start):
+        if subtitle.end <= subtitle.start or not subtitle.text.strip():
+            continue
+
+        start_index = bisect.bisect_right(keyframes, subtitle.start) - 1
+        start = keyframes[start_index] if start_index >= 0 else 0.0
+        end_index = bisect.bisect_left(keyframes, subtitle.end)
+        end = keyframes[end_index] if end_index < len(keyframes) else infinity
+
+        if covered and start <= covered[-1][1]:
+            covered[-1][1] = max(covered[-1][1], end)
+        else:
+            covered.append([start, end])
+
+    ranges: List[Tuple[float, float | None, bool]] = []
+    cursor = 0.0
+    for start, end in covered:
+        if start > cursor:
+            ranges.append((cursor, start, False))
+        ranges.append((start, None if end == infinity else end, True))
+        cursor = end
+    if cursor != infinity:
+        ranges.append((cursor, None, False))
+    return ranges
+
+
+# Perfis H.264 (nome do ffprobe) que o libx264 consegue reproduzir.
+X264_PROFILES = {
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high",
+    "High 10": "high10",
+    "High 4:2:2": "high422",
+    "High 4:4:4 Predictive": "high444",
+}
+
+X264_PIX_FMTS = {
+    "yuv420p",
+    "yuvj420p",
+    "yuv422p",
+    "yuvj422p",
+    "yuv444p",
+    "yuvj444p",
+    "yuv420p10le",
+    "yuv422p10le",
+    "yuv444p10le",
+}
+
+# Campo do ffprobe -> opção do ffmpeg que descreve as cores no SPS (VUI).
+COLOR_OPTIONS = {
+    "color_range": "-color_range",
+    "color_primaries": "-color_primaries",
+    "color_transfer": "-color_trc",
+    "color_space": "-colorspace",
+}
+
+
+def _track_timescale(video_info: Dict[str, Any]) -> int | None:
+    """Timescale da trilha de vídeo da origem (denominador do time_base '1/N')."""
+    numerator, _, denominator = (video_info.get("time_base") or "").partition("/")
+    if numerator != "1" or not denominator.isdigit():
+        return None
+    return int(denominator)
+
+
+def _smart_encode_args(video_info: Dict[str, Any]) -> List[str] | None:
+    """
+    Opções do libx264 para que os trechos reencodados possam ser concatenados
+    aos copiados da origem: mesmo perfil, nível, pix_fmt, timebase e cores,
+    com SPS/PPS repetidos em cada quadro-chave. Retorna None quando a origem
+    não pode ser reproduzida (perfil ou pix_fmt sem equivalente, entrelaçado).
+    """
+    profile = X264_PROFILES.get(video_info.get("profile") or "")
+    pix_fmt = video_info.get("pix_fmt")
+    if profile is None or pix_fmt not in X264_PIX_FMTS:
+        return None
+    if video_info.get("field_order") not in (None, "unknown", "progressive"):
+        return None
+
+    args = ["-profile:v", profile, "-pix_fmt", pix_fmt]
+    level = video_info.get("level")
+    if isinstance(level, int) and level >= 10:
+        args += ["-level:v", f"{level / 10:.1f}"]
+    timescale = _track_timescale(video_info)
+    if timescale:
+        args += ["-video_track_timescale", str(timescale)]
+    for field, option in COLOR_OPTIONS.items():
+        value = video_info.get(field)
+        if value and value != "unknown":
+            args += [option, value]
+    args += ["-x264-params", "repeat-headers=1", "-bsf:v", "h264_mp4toannexb"]
+    return args
+
+
+# Prioridades do RenderScheduler (menor = atendido antes).
+PRIORITY_PREVIEW = 0
+PRIORITY_RENDER = 10
+
+# Intervalo (s) para conferir cancelamentos enquanto se aguarda um encoder.
+CANCEL_POLL_INTERVAL = 0.5
+
+
+class RenderScheduler:
+    """
+    Limita os encoders libx264 simultâneos a 'max_concurrent', cada um com
+    'threads' threads, para que renderizações concorrentes não disputem
+    todos os núcleos. Quem aguarda é atendido por prioridade e, na mesma
+    prioridade, por ordem de chegada (FIFO).
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = env.RENDER_MAX_CONCURRENT,
+        threads: int = env.RENDER_ENCODER_THREADS,
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.max_concurrent)
+        logging.info(
+            f"RenderScheduler: {self.max_concurrent} encoders simultâneos, "
+            f"{self.threads} threads cada."
+        )
+        self._condition = threading.Condition()
+        self._active = 0
+        # Heap de (prioridade, ordem de chegada) de quem aguarda.
+        self._waiting: List[Tuple[int, int]] = []
+        self._arrivals = itertools.count()
+
+    def counts(self) -> Dict[str, int]:
+        """Encoders em execução e aguardando."""
+        with self._condition:
+            return {"active": self._active, "waiting": len(self._waiting)}
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_RENDER) -> Iterator[None]:
+        """
+        Aguarda a vez (e um encoder livre) e o mantém ocupado durante o bloco.
+        Se a renderização atual for cancelada durante a espera, sai da fila.
+        """
+        progress = current_render()
+        ticket = (priority, next(self._arrivals))
+        start = time.perf_counter()
+
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while self._active >= self.max_concurrent or self._waiting[0] != ticket:
+                    if progress is not None and progress.cancelled:
+                        raise RenderCancelledError("Renderização cancelada.")
+                    self._condition.wait(timeout=CANCEL_POLL_INTERVAL)
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._active += 1
+            # O próximo da fila pode ocupar outro encoder livre.
+            self._condition.notify_all()
+
+        load_metrics_registry().observe_stage(
+            "encoder_wait", time.perf_counter() - start
+        )
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
 
 
 class RenderingService:
     def __init__(self):
         logging.info("Iniciando RenderingService...")
+        self.scheduler = RenderScheduler()
+
+    def _write_ass_file(
+        self, subtitles_data: List[SubtitleSegment], style_options: Dict[str, Any]
+    ) -> str:
+        """Gera o .ass em um arquivo temporário e retorna seu caminho."""
+        logging.info("RenderService: Gerando arquivo de legenda .ass...")
+        with load_metrics_registry().time_stage("ass"), tempfile.NamedTemporaryFile(
+            mode="w", suffix=".ass", encoding="utf-8", delete=False
+        ) as temp_ass_file:
+            AssSubtitleGenerator(style_options).write(temp_ass_file, subtitles_data)
+            temp_ass_path = temp_ass_file.name
+
+        logging.info(f"RenderService: Arquivo .ass salvo em: {temp_ass_path}")
+        return temp_ass_path
+
+    def _run_ffmpeg(
+        self,
+        ffmpeg_command: List[str],
+        duration: float | None = None,
+        track: bool = True,
+    ):
+        """
+        Executa o ffmpeg (ver 'run_ffmpeg'): reporta o progresso e pode ser
+        cancelado quando há uma renderização ativa ('track_render').
+        """
+        with load_metrics_registry().time_stage("ffmpeg"):
+            run_ffmpeg(ffmpeg_command, duration=duration, track=track)
+
+    def _run_encoder(
+        self,
+        ffmpeg_command: List[str],
+        duration: float | None = None,
+        priority: int = PRIORITY_RENDER,
+    ):
+        """Executa um encode libx264 dentro de um slot do RenderScheduler."""
+        with self.scheduler.slot(priority):
+            self._run_ffmpeg(ffmpeg_command, duration=duration)
+
+    def _remove_temp_ass(self, temp_ass_path: str | None):
+        if temp_ass_path and os.path.exists(temp_ass_path):
+            os.remove(temp_ass_path)
+            logging.info(
+                f"RenderService: Arquivo .ass temporário removido: {temp_ass_path}"
+            )
 
     def render_video_with_subtitles(
         self,
@@ -105,30 +502,43 @@ class RenderingService:
     ):
         """
         Renderiza (queima) legendas estilizadas em um vídeo usando ffmpeg.
+        Com RENDER_PARALLEL_WORKERS > 1, vídeos longos são renderizados
+        em partes paralelas (ver 'render_video_parallel').
         """
         if not os.path.exists(original_video_path):
             raise FileNotFoundError(
                 f"Vídeo original não encontrado: {original_video_path}"
             )
 
-        logging.info("RenderService: Gerando arquivo de legenda .ass...")
-
-        ass_gen = AssSubtitleGenerator(style_options)
-        speaker_styles = style_options.get("speakers", {})
+        if env.RENDER_PARALLEL_WORKERS > 1:
+            video_info = probe_video(original_video_path)
+            if video_info["duration"] >= env.RENDER_PARALLEL_MIN_DURATION:
+                self.render_video_parallel(
+                    original_video_path,
+                    output_video_path,
+                    subtitles_data,
+                    style_options,
+                    workers=env.RENDER_PARALLEL_WORKERS,
+                    video_info=video_info,
+                )
+                return
 
-        for subtitle_segment in subtitles_data:
-            ass_gen.add_dialogue(subtitle_segment, speaker_styles)
-        ass_content = ass_gen.get_content()
+        self._render_single_process(
+            original_video_path, output_video_path, subtitles_data, style_options
+        )
 
+    def _render_single_process(
+        self,
+        original_video_path: str,
+        output_video_path: str,
+        subtitles_data: List[SubtitleSegment],
+        style_options: Dict[str, Any],
+    ):
+        """Renderiza o vídeo inteiro em um único processo libx264."""
         temp_ass_path = None
         try:
-            with tempfile.NamedTemporaryFile(
-                mode="w", suffix=".ass", encoding="utf-8", delete=False
-            ) as temp_ass_file:
-                temp_ass_file.write(ass_content)
-                temp_ass_path = temp_ass_file.name
+            temp_ass_path = self._write_ass_file(subtitles_data, style_options)
 
-            logging.info(f"RenderService: Arquivo .ass salvo em: {temp_ass_path}")
             logging.info(
                 "RenderService: Iniciando renderização com ffmpeg (via subprocess)..."
             )
@@ -145,33 +555,515 @@ class RenderingService:
                 "23",
                 "-preset",
                 "fast",
+                "-threads",
+                str(self.scheduler.threads),
                 "-c:a",
                 "copy",
                 output_video_path,
                 "-y",
             ]
 
-            subprocess.run(ffmpeg_command, capture_output=True, text=True, check=True)
+            self._run_encoder(ffmpeg_command)
 
             logging.info(
                 f"RenderService: Renderização concluída! Vídeo salvo em: {output_video_path}"
             )
 
-        except subprocess.CalledProcessError as e:
-            logging.error("Erro durante a renderização do ffmpeg:")
-            logging.error(e.stderr)
-            raise RuntimeError(f"Falha no FFMPEG: {e.stderr}")
+        except (RuntimeError, RenderCancelledError):
+            raise
 
         except Exception as e:
             logging.error(f"Um erro inesperado ocorreu: {e}", exc_info=True)
             raise e
 
         finally:
-            if temp_ass_path and os.path.exists(temp_ass_path):
-                os.remove(temp_ass_path)
-                logging.info(
-                    f"RenderService: Arquivo .ass temporário removido: {temp_ass_path}"
+            self._remove_temp_ass(temp_ass_path)
+
+    def render_video_parallel(
+        self,
+        original_video_path: str,
+        output_video_path: str,
+        subtitles_data: List[SubtitleSegment],
+        style_options: Dict[str, Any],
+        workers: int = env.RENDER_PARALLEL_WORKERS,
+        video_info: Dict[str, Any] | None = None,
+    ):
+        """
+        Divide o vídeo em 'workers' intervalos alinhados a quadros-chave,
+        queima em cada um a fatia correspondente do .ass (em processos
+        ffmpeg paralelos) e concatena as partes sem reencode.
+        O áudio original é copiado por inteiro no final, mantendo a sincronia.
+        """
+        video_info = video_info or probe_video(original_video_path)
+        keyframes = probe_keyframes(original_video_path, video_info["start_time"])
+        ranges = _split_ranges(keyframes, video_info["duration"], workers)
+
+        if len(ranges) < 2:
+            logging.info(
+                "RenderService: Quadros-chave insuficientes para dividir o vídeo. "
+                "Renderizando em processo único."
+            )
+            self._render_single_process(
+                original_video_path, output_video_path, subtitles_data, style_options
+            )
+            return
+
+        logging.info(
+            f"RenderService: Renderização paralela em {len(ranges)} partes "
+            f"({workers} workers)..."
+        )
+
+        expect_render_duration(video_info["duration"])
+        work_dir = tempfile.mkdtemp(prefix="render_")
+        try:
+            part_paths = [
+                os.path.join(work_dir, f"part_{index:04}.mp4")
+                for index in range(len(ranges))
+            ]
+            concurrent_parts = min(workers, len(ranges))
+            threads = self._part_threads(concurrent_parts)
+            # Um único encoder do RenderScheduler para a renderização inteira:
+            # as partes simultâneas dividem as threads dele.
+            with self.scheduler.slot(), ThreadPoolExecutor(
+                max_workers=concurrent_parts, thread_name_prefix="render-part"
+            ) as executor:
+                # Cada parte herda o contexto (progresso e cancelamento da renderização).
+                futures = [
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        self._render_part,
+                        original_video_path,
+                        part_path,
+                        _slice_subtitles(subtitles_data, start, end),
+                        style_options,
+                        start,
+                        end,
+                        threads,
+                    )
+                    for part_path, (start, end) in zip(part_paths, ranges)
+                ]
+                for future in futures:
+                    future.result()
+
+            self._concat_parts(part_paths, original_video_path, output_video_path)
+
+            logging.info(
+                f"RenderService: Renderização paralela concluída! Vídeo salvo em: {output_video_path}"
+            )
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _part_threads(self, concurrent_parts: int) -> int:
+        """Threads de cada parte simultânea dentro de um único encoder."""
+        return max(1, self.scheduler.threads // max(1, concurrent_parts))
+
+    def _render_part(
+        self,
+        original_video_path: str,
+        part_path: str,
+        subtitles_data: List[SubtitleSegment],
+        style_options: Dict[str, Any],
+        start: float,
+        end: float | None,
+        threads: int,
+        extra_args: List[str] | None = None,
+    ):
+        """
+        Queima as legendas em um intervalo do vídeo (somente vídeo, sem áudio).
+        Quem chama já ocupa o encoder do RenderScheduler e define 'threads'.
+        """
+        temp_ass_path = None
+        try:
+            temp_ass_path = self._write_ass_file(subtitles_data, style_options)
+
+            ffmpeg_command = ["ffmpeg", "-ss", f"{start:.6f}", "-i", original_video_path]
+            if end is not None:
+                ffmpeg_command += ["-t", f"{end - start:.6f}"]
+            ffmpeg_command += [
+                "-map",
+                "0:v:0",
+                "-an",
+                "-sn",
+                "-vf",
+                f"ass={temp_ass_path}",
+                "-c:v",
+                "libx264",
+                "-crf",
+                "23",
+                "-preset",
+                "fast",
+                "-threads",
+                str(threads),
+                *(extra_args or []),
+                part_path,
+                "-y",
+            ]
+
+            self._run_ffmpeg(
+                ffmpeg_command, duration=end - start if end is not None else None
+            )
+        finally:
+            self._remove_temp_ass(temp_ass_path)
+
+    def render_preview(
+        self,
+        original_video_path: str,
+        output_video_path: str,
+        subtitles_data: List[SubtitleSegment],
+        style_options: Dict[str, Any],
+        start: float,
+        end: float,
+        height: int | None = None,
+    ):
+        """
+        Renderiza rapidamente apenas a janela [start, end): busca na entrada
+        com -ss/-t, reduz a resolução e usa o preset ultrafast.
+        Só os eventos que cruzam a janela entram no .ass.
+        """
+        if not os.path.exists(original_video_path):
+            raise FileNotFoundError(
+                f"Vídeo original não encontrado: {original_video_path}"
+            )
+
+        temp_ass_path = None
+        try:
+            temp_ass_path = self._write_ass_file(
+                _slice_subtitles(subtitles_data, start, end), style_options
+            )
+
+            video_filter = f"ass={temp_ass_path}"
+            if height:
+                video_filter = f"scale=-2:{height},{video_filter}"
+
+            logging.info(
+                f"RenderService: Gerando prévia de {start:.2f}s a {end:.2f}s "
+                f"(altura={height or 'original'})..."
+            )
+
+            ffmpeg_command = [
+                "ffmpeg",
+                "-ss",
+                f"{start:.3f}",
+                "-i",
+                original_video_path,
+                "-t",
+                f"{end - start:.3f}",
+                "-vf",
+                video_filter,
+                "-c:v",
+                "libx264",
+                "-preset",
+                "ultrafast",
+                "-crf",
+                "28",
+                "-threads",
+                str(self.scheduler.threads),
+                "-c:a",
+                "aac",
+                "-b:a",
+                "96k",
+                "-movflags",
+                "+faststart",
+                output_video_path,
+                "-y",
+            ]
+
+            # Prévias passam à frente das renderizações completas na fila.
+            self._run_encoder(
+                ffmpeg_command, duration=end - start, priority=PRIORITY_PREVIEW
+            )
+
+            logging.info(f"RenderService: Prévia salva em: {output_video_path}")
+        finally:
+            self._remove_temp_ass(temp_ass_path)
+
+    def render_video_smart(
+        self,
+        original_video_path: str,
+        output_video_path: str,
+        subtitles_data: List[SubtitleSegment],
+        style_options: Dict[str, Any],
+        video_info: Dict[str, Any] | None = None,
+    ):
+        """
+        Renderização inteligente: reencoda apenas os GOPs que contêm
+        legendas e copia (sem reencode) os trechos sem legenda.
+        Requer vídeo H.264 progressivo cujo perfil e pix_fmt o libx264 consiga
+        reproduzir (ver '_smart_encode_args'); caso contrário, renderiza o vídeo inteiro.
+        """
+        if not os.path.exists(original_video_path):
+            raise FileNotFoundError(
+                f"Vídeo original não encontrado: {original_video_path}"
+            )
+
+        video_info = video_info or probe_video(original_video_path)
+        if video_info["codec_name"] != "h264":
+            logging.info(
+                f"RenderService: Codec '{video_info['codec_name']}' não permite "
+                "cópia parcial com libx264. Renderizando o vídeo inteiro."
+            )
+            self._render_single_process(
+                original_video_path, output_video_path, subtitles_data, style_options
+            )
+            return
+
+        encode_args = _smart_encode_args(video_info)
+        if encode_args is None:
+            logging.info(
+                f"RenderService: Perfil '{video_info['profile']}', pix_fmt "
+                f"'{video_info['pix_fmt']}' ou entrelaçamento "
+                f"'{video_info.get('field_order')}' sem equivalente no libx264. "
+                "Renderizando o vídeo inteiro."
+            )
+            self._render_single_process(
+                original_video_path, output_video_path, subtitles_data, style_options
+            )
+            return
+
+        keyframes = probe_keyframes(original_video_path, video_info["start_time"])
+        ranges = _smart_ranges(subtitles_data, keyframes)
+
+        if all(encode for _, _, encode in ranges):
+            logging.info(
+                "RenderService: Legendas cobrem todos os GOPs. Renderizando o vídeo inteiro."
+            )
+            self._render_single_process(
+                original_video_path, output_video_path, subtitles_data, style_options
+            )
+            return
+
+        encoded_duration = sum(
+            (end if end is not None else video_info["duration"]) - start
+            for start, end, encode in ranges
+            if encode
+        )
+        logging.info(
+            f"RenderService: Renderização inteligente: {len(ranges)} trechos, "
+            f"{encoded_duration:.1f}s de {video_info['duration']:.1f}s reencodados."
+        )
+
+        work_dir = tempfile.mkdtemp(prefix="render_smart_")
+        try:
+            segment_paths = self._split_at_boundaries(
+                original_video_path,
+                work_dir,
+                [start for start, _, _ in ranges[1:]],
+                _track_timescale(video_info),
+            )
+            if len(segment_paths) != len(ranges):
+                logging.warning(
+                    "RenderService: Divisão em trechos inesperada. Renderizando o vídeo inteiro."
+                )
+                self._render_single_process(
+                    original_video_path,
+                    output_video_path,
+                    subtitles_data,
+                    style_options,
                 )
+                return
+
+            expect_render_duration(encoded_duration)
+            part_paths = list(segment_paths)
+            concurrent_parts = min(
+                max(1, env.RENDER_PARALLEL_WORKERS),
+                sum(1 for _, _, encode in ranges if encode),
+            )
+            threads = self._part_threads(concurrent_parts)
+            # Como na renderização paralela: um encoder, dividido entre as partes.
+            with self.scheduler.slot(), ThreadPoolExecutor(
+                max_workers=concurrent_parts,
+                thread_name_prefix="render-part",
+            ) as executor:
+                futures = []
+                for index, (start, end, encode) in enumerate(ranges):
+                    if not encode:
+                        continue
+                    part_paths[index] = os.path.join(work_dir, f"encoded_{index:04}.mp4")
+                    futures.append(
+                        executor.submit(
+                            contextvars.copy_context().run,
+                            self._render_part,
+                            segment_paths[index],
+                            part_paths[index],
+                            _slice_subtitles(subtitles_data, start, end),
+                            style_options,
+                            0.0,
+                            None,
+                            threads,
+                            encode_args,
+                        )
+                    )
+                for future in futures:
+                    future.result()
+
+            self._concat_parts(part_paths, original_video_path, output_video_path)
+
+            logging.info(
+                f"RenderService: Renderização inteligente concluída! Vídeo salvo em: {output_video_path}"
+            )
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _split_at_boundaries(
+        self,
+        original_video_path: str,
+        work_dir: str,
+        boundaries: List[float],
+        timescale: int | None = None,
+    ) -> List[str]:
+        """
+        Divide o stream de vídeo, sem reencode, nos quadros-chave indicados
+        usando o segment muxer (corte exato por pacote, um único passe).
+        SPS/PPS são repetidos em banda e a timescale da trilha é mantida
+        para que trechos copiados e reencodados possam ser concatenados.
+        """
+        segment_pattern = os.path.join(work_dir, "segment_%04d.mp4")
+        ffmpeg_command = [
+            "ffmpeg",
+            "-i",
+            original_video_path,
+            "-map",
+            "0:v:0",
+            "-an",
+            "-sn",
+            "-c:v",
+            "copy",
+            "-bsf:v",
+            "h264_mp4toannexb",
+            "-f",
+            "segment",
+            "-segment_format",
+            "mp4",
+            "-reset_timestamps",
+            "1",
+        ]
+        if timescale:
+            ffmpeg_command += [
+                "-segment_format_options",
+                f"video_track_timescale={timescale}",
+            ]
+        if boundaries:
+            # Margem de 1 ms: o corte acontece no primeiro quadro-chave >= tempo.
+            ffmpeg_command += [
+                "-segment_times",
+                ",".join(f"{max(b - 0.001, 0.0):.6f}" for b in boundaries),
+            ]
+        ffmpeg_command += [segment_pattern, "-y"]
+        self._run_ffmpeg(ffmpeg_command, track=False)
+
+        return sorted(
+            os.path.join(work_dir, name)
+            for name in os.listdir(work_dir)
+            if name.startswith("segment_")
+        )
+
+    def _concat_parts(
+        self, part_paths: List[str], original_video_path: str, output_video_path: str
+    ):
+        """
+        Junta as partes com o concat demuxer (-c copy) e adiciona
+        o áudio do vídeo original sem reencode.
+        """
+        list_path = os.path.join(os.path.dirname(part_paths[0]), "parts.txt")
+        with open(list_path, "w", encoding="utf-8") as list_file:
+            for part_path in part_paths:
+                list_file.write(f"file '{os.path.abspath(part_path)}'\n")
+
+        ffmpeg_command = [
+            "ffmpeg",
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            list_path,
+            "-i",
+            original_video_path,
+            "-map",
+            "0:v:0",
+            "-map",
+            "1:a:0?",
+            "-c",
+            "copy",
+            output_video_path,
+            "-y",
+        ]
+        self._run_ffmpeg(ffmpeg_command, track=False)
+
+    def mux_subtitles(
+        self,
+        original_video_path: str,
+        output_video_path: str,
+        subtitles_data: List[SubtitleSegment],
+        style_options: Dict[str, Any],
+        container: str = "mp4",
+    ):
+        """
+        Adiciona as legendas como uma faixa selecionável (soft subtitles),
+        copiando vídeo e áudio sem reencode (-c:v copy -c:a copy).
+        MKV mantém o .ass com estilos; MP4 usa mov_text (texto simples).
+        """
+        if not os.path.exists(original_video_path):
+            raise FileNotFoundError(
+                f"Vídeo original não encontrado: {original_video_path}"
+            )
+
+        subtitle_codec = {"mkv": "ass", "mp4": "mov_text"}.get(container)
+        if subtitle_codec is None:
+            raise ValueError(f"Contêiner não suportado: {container}")
+
+        temp_ass_path = None
+        try:
+            temp_ass_path = self._write_ass_file(subtitles_data, style_options)
+
+            logging.info(
+                f"RenderService: Adicionando faixa de legenda ({subtitle_codec}) sem reencode..."
+            )
+
+            ffmpeg_command = [
+                "ffmpeg",
+                "-i",
+                original_video_path,
+                "-f",
+                "ass",
+                "-i",
+                temp_ass_path,
+                "-map",
+                "0:v",
+                "-map",
+                "0:a?",
+                "-map",
+                "1:0",
+                "-c:v",
+                "copy",
+                "-c:a",
+                "copy",
+                "-c:s",
+                subtitle_codec,
+                "-disposition:s:0",
+                "default",
+                output_video_path,
+                "-y",
+            ]
+
+            self._run_ffmpeg(ffmpeg_command)
+
+            logging.info(
+                f"RenderService: Legendas adicionadas! Vídeo salvo em: {output_video_path}"
+            )
+
+        finally:
+            self._remove_temp_ass(temp_ass_path)
+
+    def export_subtitles(
+        self,
+        subtitles_data: List[SubtitleSegment],
+        style_options: Dict[str, Any],
+        subtitle_format: str,
+    ) -> str:
+        """Exporta as legendas como arquivo lateral (.ass, .srt ou .vtt)."""
+        logging.info(f"RenderService: Exportando legendas em '{subtitle_format}'...")
+        return generate_subtitle_file(subtitles_data, style_options, subtitle_format)
 
 
 renderingService: RenderingService | None = None
@@ -190,5 +1082,13 @@ def load_rendering_service():
         with _rendering_lock:
             if renderingService is None:
                 renderingService = RenderingService()
+                load_metrics_registry().register_gauge(
+                    "multimidia_render_encoders",
+                    "Encoders ffmpeg em execução (active) e aguardando vez (waiting).",
+                    lambda: {
+                        (("state", state),): float(count)
+                        for state, count in renderingService.scheduler.counts().items()
+                    },
+                )
 
     return renderingService
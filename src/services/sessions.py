@@ -0,0 +1,524 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from pydantic import ValidationError
+
+from src import env
+from src.models.subtitle import (
+    DefaultStyle,
+    SpeakerStyle,
+    StyleOptions,
+    SubtitleSegment,
+)
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_FIELDS = ("start", "end", "text", "speaker")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    video_path TEXT NOT NULL,
+    styles TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    seq REAL NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    text TEXT NOT NULL,
+    speaker TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions(updated_at);
+"""
+
+
+class SessionNotFoundError(Exception):
+    """Lançada quando a sessão não existe (ou já expirou)."""
+
+
+class SessionVersionError(Exception):
+    """Lançada quando o patch foi feito sobre uma versão desatualizada da sessão."""
+
+
+class SessionPatchError(ValueError):
+    """Lançada quando uma operação do patch é inválida; nada é aplicado."""
+
+
+def default_style_options() -> Dict[str, Any]:
+    return StyleOptions(default=DefaultStyle(), speakers={}).model_dump()
+
+
+def _build_style_options(styles: Dict[str, Any]) -> StyleOptions:
+    return StyleOptions.model_construct(
+        default=DefaultStyle.model_construct(**styles["default"]),
+        speakers={
+            speaker_id: SpeakerStyle.model_construct(**speaker)
+            for speaker_id, speaker in styles["speakers"].items()
+        },
+    )
+
+
+def _parse_pointer(path: str) -> List[str]:
+    """Divide um JSON Pointer (RFC 6901) em tokens."""
+    if not path.startswith("/"):
+        raise SessionPatchError(f"Caminho inválido: '{path}'.")
+    return [
+        token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")
+    ]
+
+
+def _parse_index(token: str, size: int, allow_end: bool) -> int:
+    if allow_end and token == "-":
+        return size
+    if not token.isdigit():
+        raise SessionPatchError(f"Índice de segmento inválido: '{token}'.")
+    index = int(token)
+    if index > size or (index == size and not allow_end):
+        raise SessionPatchError(f"Índice de segmento fora do intervalo: {index}.")
+    return index
+
+
+def _validate_segment(value: Any) -> SubtitleSegment:
+    try:
+        return SubtitleSegment.model_validate(value)
+    except ValidationError as e:
+        raise SessionPatchError(f"Segmento inválido: {e}")
+
+
+def _segment_row(session_id: str, seq: float, segment: SubtitleSegment) -> Tuple:
+    return (session_id, seq, segment.start, segment.end, segment.text, segment.speaker)
+
+
+def _seq_between(before: float | None, after: float | None) -> float | None:
+    """
+    Chave de ordenação entre dois vizinhos, ou None quando a precisão
+    do float se esgota (após muitas inserções no mesmo ponto).
+    """
+    if before is None:
+        return 0.0 if after is None else after - 1
+    if after is None:
+        return before + 1
+    middle = (before + after) / 2
+    return middle if before < middle < after else None
+
+
+def _apply_to_styles(styles: Dict[str, Any], op: str, tokens: List[str], value: Any):
+    """Aplica 'add', 'remove' ou 'replace' a um caminho dentro dos estilos."""
+    if not tokens:
+        if op != "replace":
+            raise SessionPatchError("Os estilos só podem ser substituídos por inteiro.")
+        if not isinstance(value, dict):
+            raise SessionPatchError("Os estilos devem ser um objeto.")
+        styles.clear()
+        styles.update(value)
+        return
+
+    parent = styles
+    for token in tokens[:-1]:
+        parent = parent.get(token) if isinstance(parent, dict) else None
+        if not isinstance(parent, dict):
+            raise SessionPatchError(f"Caminho de estilo inexistente: '{token}'.")
+
+    key = tokens[-1]
+    if op == "add":
+        parent[key] = value
+    elif key not in parent:
+        raise SessionPatchError(f"Caminho de estilo inexistente: '{key}'.")
+    elif op == "replace":
+        parent[key] = value
+    else:
+        del parent[key]
+
+
+class SessionStore:
+    """
+    Sessões de legendas persistidas no servidor (SQLite): os segmentos gerados
+    ficam gravados sob um 'session_id', as edições chegam como pequenos patches
+    (subconjunto do JSON Patch) e a renderização só precisa do id, sem reenviar
+    nem revalidar a lista completa a cada chamada.
+
+    Cada segmento é uma linha ordenada por uma chave fracionária ('seq'), então
+    editar, inserir ou remover um segmento não regrava os demais. As últimas
+    sessões usadas também ficam em memória, já como SubtitleSegment, e os
+    patches são aplicados a essa cópia, que segue válida enquanto a versão
+    gravada no banco for a mesma.
+    """
+
+    def __init__(
+        self,
+        db_path: str = env.SESSIONS_DB_PATH,
+        max_age: float = env.SESSIONS_MAX_AGE,
+        memory_size: int = env.SESSIONS_MEMORY_SIZE,
+    ):
+        logger.info(f"Iniciando SessionStore em {db_path}...")
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.max_age = max_age
+        self.memory_size = memory_size
+        # session_id -> (versão, segmentos), do menos para o mais recente.
+        self._loaded: OrderedDict[str, Tuple[int, List[SubtitleSegment]]] = OrderedDict()
+        # Uma conexão por processo, serializada pelo lock; o WAL e o
+        # 'timeout' permitem que vários workers ('src.serve') a compartilhem.
+        self._connection = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("PRAGMA foreign_keys=ON")
+            self._connection.executescript(SCHEMA)
+
+    def create(
+        self,
+        video_path: str,
+        segments: Iterable[SubtitleSegment | Dict[str, Any]],
+        styles: Dict[str, Any] | None = None,
+    ) -> Dict[str, Any]:
+        """Grava uma nova sessão e retorna o seu id e versão."""
+        session_id = uuid.uuid4().hex
+        now = time.time()
+        segments = [
+            segment
+            if isinstance(segment, SubtitleSegment)
+            else SubtitleSegment.model_construct(**segment)
+            for segment in segments
+        ]
+
+        with self._lock:
+            with self._connection:
+                self._expire(now)
+                self._connection.execute(
+                    "INSERT INTO sessions VALUES (?, ?, ?, 1, ?, ?)",
+                    (
+                        session_id,
+                        video_path,
+                        json.dumps(styles or default_style_options()),
+                        now,
+                        now,
+                    ),
+                )
+                self._insert_segments(session_id, segments)
+            self._remember(session_id, 1, segments)
+
+        logger.info(f"SessionStore: Sessão {session_id} criada.")
+        return {"session_id": session_id, "version": 1}
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        """Sessão completa: vídeo, estilos, versão e segmentos."""
+        with self._lock:
+            video_path, styles, version = self._load_header(session_id)
+            segments = [
+                dict(zip(SEGMENT_FIELDS, row)) for row in self._load_segments(session_id)
+            ]
+        return {
+            "session_id": session_id,
+            "version": version,
+            "video_path": video_path,
+            "styles": json.loads(styles),
+            "segments": segments,
+        }
+
+    def load_render_data(
+        self, session_id: str
+    ) -> Tuple[str, List[SubtitleSegment], StyleOptions]:
+        """
+        Vídeo, segmentos e estilos prontos para renderizar. Os modelos são
+        construídos sem revalidação (os dados já foram validados na gravação)
+        e reaproveitados da memória enquanto a sessão não mudar.
+        A lista retornada não deve ser alterada.
+        """
+        with self._lock:
+            video_path, styles, version = self._load_header(session_id)
+            segments = self._recall(session_id, version)
+            if segments is None:
+                segments = [
+                    SubtitleSegment.model_construct(
+                        start=start, end=end, text=text, speaker=speaker
+                    )
+                    for start, end, text, speaker in self._load_segments(session_id)
+                ]
+                self._remember(session_id, version, segments)
+
+        return video_path, segments, _build_style_options(json.loads(styles))
+
+    def apply_patch(
+        self,
+        session_id: str,
+        operations: List[Dict[str, Any]],
+        expected_version: int | None = None,
+    ) -> int:
+        """
+        Aplica as operações em ordem, numa única transação (tudo ou nada),
+        e retorna a nova versão. Caminhos aceitos:
+          /segments                  replace (lista inteira)
+          /segments/{i} ou /-        add, remove, replace (segmento inteiro)
+          /segments/{i}/{campo}      replace (start, end, text ou speaker)
+          /styles[/...]              add, remove, replace
+        Com 'expected_version', rejeita o patch se a sessão mudou nesse meio tempo.
+        """
+        with self._lock:
+            with self._connection:
+                # Reserva a escrita antes de ler a versão (outros workers esperam).
+                self._connection.execute("BEGIN IMMEDIATE")
+                _, styles_json, version = self._load_header(session_id)
+                if expected_version is not None and expected_version != version:
+                    raise SessionVersionError(
+                        f"A sessão está na versão {version}, não na {expected_version}."
+                    )
+
+                # A cópia em memória só é atualizada se a transação for concluída.
+                segments = self._recall(session_id, version)
+                if segments is not None:
+                    segments = list(segments)
+                size = self._connection.execute(
+                    "SELECT COUNT(*) FROM segments WHERE session_id = ?", (session_id,)
+                ).fetchone()[0]
+                styles = None
+
+                for operation in operations:
+                    op, path = operation["op"], operation["path"]
+                    value = operation.get("value")
+                    tokens = _parse_pointer(path)
+
+                    if tokens[0] == "segments":
+                        size = self._patch_segments(
+                            session_id, size, op, tokens[1:], value, segments
+                        )
+                    elif tokens[0] == "styles":
+                        if styles is None:
+                            styles = json.loads(styles_json)
+                        _apply_to_styles(styles, op, tokens[1:], value)
+                    else:
+                        raise SessionPatchError(f"Caminho não suportado: '{path}'.")
+
+                styles_json = None
+                if styles is not None:
+                    try:
+                        styles_json = json.dumps(
+                            StyleOptions.model_validate(styles).model_dump()
+                        )
+                    except ValidationError as e:
+                        raise SessionPatchError(f"Estilos inválidos: {e}")
+
+                version += 1
+                self._connection.execute(
+                    "UPDATE sessions SET version = ?, updated_at = ?,"
+                    " styles = COALESCE(?, styles) WHERE id = ?",
+                    (version, time.time(), styles_json, session_id),
+                )
+
+            if segments is not None:
+                self._remember(session_id, version, segments)
+
+        return version
+
+    def delete(self, session_id: str):
+        with self._lock:
+            with self._connection:
+                deleted = self._connection.execute(
+                    "DELETE FROM sessions WHERE id = ?", (session_id,)
+                ).rowcount
+            self._loaded.pop(session_id, None)
+        if not deleted:
+            raise SessionNotFoundError(f"Sessão {session_id} não encontrada.")
+
+    def video_paths(self) -> Set[str]:
+        """Vídeos referenciados pelas sessões ainda válidas."""
+        with self._lock:
+            with self._connection:
+                self._expire(time.time())
+                rows = self._connection.execute(
+                    "SELECT DISTINCT video_path FROM sessions"
+                ).fetchall()
+        return {video_path for (video_path,) in rows}
+
+    def _patch_segments(
+        self,
+        session_id: str,
+        size: int,
+        op: str,
+        tokens: List[str],
+        value: Any,
+        segments: List[SubtitleSegment] | None,
+    ) -> int:
+        """
+        Aplica uma operação sobre os segmentos (no banco e, se houver, na
+        cópia em memória) e retorna a nova quantidade.
+        """
+        execute = self._connection.execute
+
+        if not tokens:
+            if op != "replace" or not isinstance(value, list):
+                raise SessionPatchError(
+                    "'/segments' só aceita 'replace' com uma lista de segmentos."
+                )
+            replacement = [_validate_segment(segment) for segment in value]
+            execute("DELETE FROM segments WHERE session_id = ?", (session_id,))
+            self._insert_segments(session_id, replacement)
+            if segments is not None:
+                segments[:] = replacement
+            return len(replacement)
+
+        if len(tokens) > 2:
+            raise SessionPatchError(f"Caminho de segmento inválido: '/{'/'.join(tokens)}'.")
+
+        index = _parse_index(tokens[0], size, allow_end=op == "add" and len(tokens) == 1)
+
+        if op == "add" and len(tokens) == 1:
+            segment = _validate_segment(value)
+            seq = self._seq_for_insert(session_id, index, size)
+            execute(
+                "INSERT INTO segments VALUES (?, ?, ?, ?, ?, ?)",
+                _segment_row(session_id, seq, segment),
+            )
+            if segments is not None:
+                segments.insert(index, segment)
+            return size + 1
+
+        seq = self._seq_at(session_id, index)
+
+        if op == "remove" and len(tokens) == 1:
+            execute(
+                "DELETE FROM segments WHERE session_id = ? AND seq = ?",
+                (session_id, seq),
+            )
+            if segments is not None:
+                del segments[index]
+            return size - 1
+
+        if len(tokens) == 2:
+            field = tokens[1]
+            if field not in SEGMENT_FIELDS or op == "remove":
+                raise SessionPatchError(
+                    f"Só é possível substituir os campos {', '.join(SEGMENT_FIELDS)}."
+                )
+            row = execute(
+                "SELECT start_time, end_time, text, speaker FROM segments"
+                " WHERE session_id = ? AND seq = ?",
+                (session_id, seq),
+            ).fetchone()
+            segment = _validate_segment({**dict(zip(SEGMENT_FIELDS, row)), field: value})
+        else:
+            segment = _validate_segment(value)
+
+        execute(
+            "UPDATE segments SET start_time = ?, end_time = ?, text = ?, speaker = ?"
+            " WHERE session_id = ? AND seq = ?",
+            _segment_row(session_id, seq, segment)[2:] + (session_id, seq),
+        )
+        if segments is not None:
+            segments[index] = segment
+        return size
+
+    def _seq_at(self, session_id: str, index: int) -> float:
+        return self._connection.execute(
+            "SELECT seq FROM segments WHERE session_id = ? ORDER BY seq LIMIT 1 OFFSET ?",
+            (session_id, index),
+        ).fetchone()[0]
+
+    def _seq_for_insert(self, session_id: str, index: int, size: int) -> float:
+        """Chave para inserir na posição 'index', renumerando se necessário."""
+        before = self._seq_at(session_id, index - 1) if index > 0 else None
+        after = self._seq_at(session_id, index) if index < size else None
+        seq = _seq_between(before, after)
+        if seq is None:
+            self._renumber(session_id)
+            seq = _seq_between(
+                index - 1 if index > 0 else None, index if index < size else None
+            )
+        return seq
+
+    def _renumber(self, session_id: str):
+        """Regrava as chaves como 0, 1, 2... (raro: só quando a precisão se esgota)."""
+        rows = self._load_segments(session_id)
+        self._connection.execute(
+            "DELETE FROM segments WHERE session_id = ?", (session_id,)
+        )
+        self._connection.executemany(
+            "INSERT INTO segments VALUES (?, ?, ?, ?, ?, ?)",
+            ((session_id, seq, *row) for seq, row in enumerate(rows)),
+        )
+
+    def _insert_segments(self, session_id: str, segments: List[SubtitleSegment]):
+        self._connection.executemany(
+            "INSERT INTO segments VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                _segment_row(session_id, seq, segment)
+                for seq, segment in enumerate(segments)
+            ),
+        )
+
+    def _load_header(self, session_id: str) -> Tuple[str, str, int]:
+        row = self._connection.execute(
+            "SELECT video_path, styles, version FROM sessions WHERE id = ?",
+            (session_id,),
+        ).fetchone()
+        if row is None:
+            self._loaded.pop(session_id, None)
+            raise SessionNotFoundError(f"Sessão {session_id} não encontrada.")
+        return row
+
+    def _load_segments(self, session_id: str) -> List[Tuple]:
+        return self._connection.execute(
+            "SELECT start_time, end_time, text, speaker FROM segments"
+            " WHERE session_id = ? ORDER BY seq",
+            (session_id,),
+        ).fetchall()
+
+    def _recall(self, session_id: str, version: int) -> List[SubtitleSegment] | None:
+        """Segmentos em memória, se ainda forem da versão gravada no banco."""
+        loaded = self._loaded.get(session_id)
+        if loaded is None or loaded[0] != version:
+            return None
+        self._loaded.move_to_end(session_id)
+        return loaded[1]
+
+    def _remember(self, session_id: str, version: int, segments: List[SubtitleSegment]):
+        if self.memory_size <= 0:
+            return
+        self._loaded[session_id] = (version, segments)
+        self._loaded.move_to_end(session_id)
+        while len(self._loaded) > self.memory_size:
+            self._loaded.popitem(last=False)
+
+    def _expire(self, now: float):
+        """Remove as sessões sem alterações há mais de 'max_age' segundos."""
+        if self.max_age <= 0:
+            return
+        expired = self._connection.execute(
+            "DELETE FROM sessions WHERE updated_at < ?", (now - self.max_age,)
+        ).rowcount
+        if expired:
+            logger.info(f"SessionStore: {expired} sessões expiradas removidas.")
+
+
+sessionStore: SessionStore | None = None
+
+_session_store_lock = threading.Lock()
+
+
+def load_session_store():
+    """
+    Cria o SessionStore na primeira chamada (mesmo padrão dos serviços).
+    """
+    global sessionStore
+
+    if sessionStore is None:
+        with _session_store_lock:
+            if sessionStore is None:
+                sessionStore = SessionStore()
+
+    return sessionStore
@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from typing import Any, Dict
+
+from src import env
+from src.services.diarization import load_diarization_service
+from src.services.transcription import load_transcription_service
+
+logger = logging.getLogger(__name__)
+
+READINESS_PENDING = "pending"
+READINESS_LOADING = "loading"
+READINESS_READY = "ready"
+READINESS_FAILED = "failed"
+
+
+class ModelReadiness:
+    """
+    Estado do pré-carregamento dos modelos, consultado pela rota de readiness.
+
+    Sem pré-carregamento a API é considerada pronta desde o início
+    (os modelos continuam sendo carregados na primeira requisição).
+    """
+
+    def __init__(self, preload: bool = env.PRELOAD_MODELS):
+        self.preload = preload
+        self.state = READINESS_PENDING if preload else READINESS_READY
+        self.error: str | None = None
+        self.timings: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state == READINESS_READY
+
+    def _set(self, state: str, error: str | None = None):
+        with self._lock:
+            self.state = state
+            self.error = error
+
+    def _timed(self, stage: str, func):
+        stage_start = time.perf_counter()
+        result = func()
+        self.timings[stage] = round(time.perf_counter() - stage_start, 3)
+        return result
+
+    def preload_models(self, warmup_duration: float = env.WARMUP_DURATION):
+        """
+        Carrega Whisper e Pyannote pelos mesmos 'load_*_service' usados
+        pelas rotas e executa uma inferência sintética em cada um.
+
+        Falha no carregamento deixa a API como não pronta; falha apenas
+        no aquecimento é registrada, mas não impede o tráfego.
+        """
+        self._set(READINESS_LOADING)
+        logger.info("Startup: Pré-carregando modelos...")
+
+        try:
+            transcription = self._timed(
+                "transcription_load", load_transcription_service
+            )
+            diarization = self._timed("diarization_load", load_diarization_service)
+        except Exception as e:
+            logger.error(f"Startup: Falha ao carregar os modelos: {e}", exc_info=True)
+            self._set(READINESS_FAILED, str(e))
+            return
+
+        if warmup_duration > 0:
+            for stage, service in (
+                ("transcription_warmup", transcription),
+                ("diarization_warmup", diarization),
+            ):
+                try:
+                    self._timed(stage, lambda: service.warm_up(warmup_duration))
+                except Exception as e:
+                    logger.warning(f"Startup: Falha no aquecimento ({stage}): {e}")
+
+        self._set(READINESS_READY)
+        logger.info(f"Startup: Modelos prontos. Tempos (s): {self.timings}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "status": self.state,
+                "preload": self.preload,
+                "error": self.error,
+                "timings": dict(self.timings),
+            }
+
+
+modelReadiness: ModelReadiness | None = None
+
+_readiness_lock = threading.Lock()
+
+
+def load_model_readiness():
+    """
+    Cria o ModelReadiness na primeira chamada (mesmo padrão dos serviços).
+    """
+    global modelReadiness
+
+    if modelReadiness is None:
+        with _readiness_lock:
+            if modelReadiness is None:
+                modelReadiness = ModelReadiness()
+
+    return modelReadiness
@@ -0,0 +1,87 @@
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from src import env
+
+# Backends sintéticos (INFERENCE_BACKEND="stub"): produzem resultados no formato
+# do Whisper e do Pyannote sem carregar modelos, para medir o custo de HTTP,
+# E/S, fusão e renderização isoladamente (ver 'benchmarks/bench_e2e.py').
+
+STUB_TEXT = "Legenda sintética número {index}, gerada para o benchmark."
+
+
+def _stub_intervals(audio: np.ndarray) -> List[Tuple[float, float]]:
+    """Intervalos de STUB_SEGMENT_DURATION segundos cobrindo o áudio inteiro."""
+    duration = len(audio) / env.TARGET_SAMPLE_RATE
+    step = max(env.STUB_SEGMENT_DURATION, 0.1)
+    intervals = []
+    start = 0.0
+    while start < duration:
+        end = min(start + step, duration)
+        intervals.append((round(start, 3), round(end, 3)))
+        start += step
+    return intervals
+
+
+class StubTranscriptionService:
+    """
+    Substitui o TranscriptionService: uma legenda a cada
+    STUB_SEGMENT_DURATION segundos de áudio, sem inferência.
+    """
+
+    def __init__(self):
+        self.model_type = "stub"
+        self.device = "cpu"
+        self.quantization = "none"
+        self.engine = "stub"
+
+    def transcribe_audio(
+        self,
+        audio: np.ndarray,
+        speech_regions: List[Tuple[float, float]] | None = None,
+        options: Dict[str, Any] | None = None,
+        on_segment: Callable[[Dict[str, Any]], None] | None = None,
+    ) -> Dict[str, Any]:
+        segments = []
+        for index, (start, end) in enumerate(_stub_intervals(audio)):
+            segment = {
+                "id": index,
+                "seek": int(start * 100),
+                "start": start,
+                "end": end,
+                "text": " " + STUB_TEXT.format(index=index),
+            }
+            segments.append(segment)
+            if on_segment is not None:
+                on_segment(segment)
+
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": (options or {}).get("language") or "pt",
+        }
+
+    def warm_up(self, duration: float = env.WARMUP_DURATION):
+        pass
+
+
+class StubDiarizationService:
+    """
+    Substitui o DiarizationService: um turno por intervalo, alternando
+    entre STUB_SPEAKERS interlocutores.
+    """
+
+    def __init__(self):
+        self.model_id = "stub"
+        self.device = "cpu"
+
+    def diarize_audio(self, audio: np.ndarray) -> List[Dict[str, Any]]:
+        speakers = max(env.STUB_SPEAKERS, 1)
+        return [
+            {"speaker": f"SPEAKER_{index % speakers:02d}", "start": start, "end": end}
+            for index, (start, end) in enumerate(_stub_intervals(audio))
+        ]
+
+    def warm_up(self, duration: float = env.WARMUP_DURATION):
+        pass
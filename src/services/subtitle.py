@@ -1,15 +1,74 @@
 import logging
+import os
 import threading
-from typing import Any, Dict, List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 
+from src import env
 from src.models.subtitle import SubtitleSegment
-from src.services.diarization import DiarizationService, load_diarization_service
+from src.services.audio import extracted_audio, pcm_audio
+from src.services.cache import ResultCache, hash_file, load_result_cache, make_cache_key
+from src.services.diarization import (
+    DiarizationService,
+    get_diarization_options,
+    load_diarization_service,
+)
+from src.services.ffmpeg import RenderCancelledError, RenderProgress, track_render
+from src.services.merge import UNKNOWN_SPEAKER, assign_dominant_speakers
+from src.services.metrics import MetricsRegistry, load_metrics_registry
 from src.services.rendering import RenderingService, load_rendering_service
 
-from src.services.transcription import TranscriptionService, load_transcription_service
+from src.services.transcription import (
+    TranscriptionService,
+    concurrent_thread_split,
+    get_decode_options,
+    load_transcription_service,
+    resolve_decoding_options,
+)
 
 logger = logging.getLogger(__name__)
 
+# Valores pedidos pelos jobs com etapas concorrentes em andamento e o valor
+# de threads a restaurar quando o último terminar.
+_torch_threads_lock = threading.Lock()
+_torch_threads_requests: List[int] = []
+_torch_threads_previous: int | None = None
+
+
+@contextmanager
+def _concurrent_torch_threads(num_threads: int) -> Iterator[None]:
+    """
+    'torch.set_num_threads' altera o pool intra-op do processo inteiro, não só
+    a thread que o chama. Enquanto houver jobs concorrentes, vale o menor
+    valor pedido entre eles; o valor anterior só é restaurado quando o último
+    termina, então um job não desfaz o ajuste de outro ainda em execução.
+    """
+    global _torch_threads_previous
+
+    if env.INFERENCE_BACKEND == "stub":
+        yield
+        return
+
+    import torch
+
+    with _torch_threads_lock:
+        if not _torch_threads_requests:
+            _torch_threads_previous = torch.get_num_threads()
+        _torch_threads_requests.append(num_threads)
+        torch.set_num_threads(min(_torch_threads_requests))
+    try:
+        yield
+    finally:
+        with _torch_threads_lock:
+            _torch_threads_requests.remove(num_threads)
+            torch.set_num_threads(
+                min(_torch_threads_requests)
+                if _torch_threads_requests
+                else _torch_threads_previous
+            )
+
 
 class SubtitleService:
     """
@@ -31,6 +90,8 @@ class SubtitleService:
         self._transcription_lock = threading.Lock()
         self._diarization_lock = threading.Lock()
         self._rendering_lock = threading.Lock()
+        self.result_cache: ResultCache = load_result_cache()
+        self.metrics: MetricsRegistry = load_metrics_registry()
 
     @property
     def transcription_service(self) -> TranscriptionService:
@@ -68,24 +129,288 @@ class SubtitleService:
                     self._rendering_service = load_rendering_service()
         return self._rendering_service
 
-    def generate_subtitle_data(self, video_file_path: str) -> List[Dict[str, Any]]:
+    def generate_subtitle_data(
+        self,
+        video_file_path: str,
+        timings: Dict[str, float] | None = None,
+        progress_callback: Callable[[str, float], None] | None = None,
+        content_hash: str | None = None,
+        pcm_path: str | None = None,
+        profile: str | None = None,
+        language: str | None = None,
+        metadata: Dict[str, Any] | None = None,
+        on_segment: Callable[[Dict[str, Any]], None] | None = None,
+    ) -> List[Dict[str, Any]]:
         """
         Orquestra a transcrição e diarização, funda os resultados
         e mapeia os IDs de speaker para "Interlocutor X".
+        O áudio é extraído uma única vez e compartilhado entre os dois modelos.
+
+        Se 'timings' for informado, é preenchido com a duração (s) de cada etapa.
+        'progress_callback(etapa, percentual)' é chamado a cada mudança de etapa.
+        'content_hash' (SHA-256 do vídeo) evita recalcular o hash para o cache.
+        'pcm_path' aponta para um áudio já extraído durante o upload (é consumido).
+        'profile' e 'language' escolhem o perfil de decodificação do Whisper.
+        Se 'metadata' for informado, recebe o perfil, o idioma e as opções usadas.
+        'on_segment' recebe cada segmento transcrito (ainda sem interlocutor)
+        assim que fica pronto; nesse caso a transcrição é feita em chunks.
         """
+        timings = {} if timings is None else timings
+        metadata = {} if metadata is None else metadata
+        report = progress_callback or (lambda stage, progress: None)
+        total_start = time.perf_counter()
 
-        logger.info("SubtitleService: Solicitando transcrição...")
-        transcription_result = self.transcription_service.transcribe_video(
-            video_file_path
+        profile, decoding_options = resolve_decoding_options(profile, language)
+        metadata["profile"] = profile
+        metadata["decoding_options"] = decoding_options
+
+        report("cache", 0)
+        if content_hash is None and self.result_cache.enabled:
+            content_hash = hash_file(video_file_path)
+        transcription_key, diarization_key = self._cache_keys(
+            content_hash,
+            profile,
+            language,
+            engine="chunked" if on_segment is not None else None,
         )
+
+        cached_transcription = self.result_cache.get("transcription", transcription_key)
+        cached_diarization = self.result_cache.get("diarization", diarization_key)
+        timings["cache"] = round(time.perf_counter() - total_start, 3)
+        self.metrics.observe_stage("cache", time.perf_counter() - total_start)
+
+        if on_segment is not None and cached_transcription is not None:
+            for index, segment in enumerate(cached_transcription.get("segments", [])):
+                on_segment(self._segment_event({**segment, "id": index}))
+
+        if cached_transcription is not None and cached_diarization is not None:
+            logger.info("SubtitleService: Resultados encontrados no cache.")
+            transcription_result = cached_transcription
+            diarization_segments = cached_diarization
+        else:
+            report("audio", 5)
+            audio_start = time.perf_counter()
+            if pcm_path and os.path.exists(pcm_path):
+                audio_context = pcm_audio(pcm_path)
+            else:
+                audio_context = extracted_audio(video_file_path, env.TARGET_SAMPLE_RATE)
+
+            with audio_context as audio:
+                timings["audio"] = round(time.perf_counter() - audio_start, 3)
+                audio_duration = len(audio) / env.TARGET_SAMPLE_RATE
+                self.metrics.observe_stage(
+                    "audio", time.perf_counter() - audio_start, audio_duration
+                )
+
+                def transcribe(
+                    diarization_segments: List[Dict[str, Any]] | None = None,
+                ) -> Dict[str, Any]:
+                    if cached_transcription is not None:
+                        return cached_transcription
+                    turns = diarization_segments or cached_diarization
+                    speech_regions = (
+                        [(turn["start"], turn["end"]) for turn in turns]
+                        if turns
+                        else None
+                    )
+                    with self.metrics.time_stage("transcription", audio_duration):
+                        result = self.transcription_service.transcribe_audio(
+                            audio,
+                            speech_regions,
+                            decoding_options,
+                            on_segment=(
+                                (
+                                    lambda segment: on_segment(
+                                        self._segment_event(segment)
+                                    )
+                                )
+                                if on_segment is not None
+                                else None
+                            ),
+                        )
+                    self.result_cache.set("transcription", transcription_key, result)
+                    return result
+
+                def diarize() -> List[Dict[str, Any]]:
+                    if cached_diarization is not None:
+                        return cached_diarization
+                    with self.metrics.time_stage("diarization", audio_duration):
+                        segments = self.diarization_service.diarize_audio(audio)
+                    self.result_cache.set("diarization", diarization_key, segments)
+                    return segments
+
+                if env.PIPELINE_MODE == "concurrent":
+                    report("transcription+diarization", 10)
+                    whisper_in_process = (
+                        cached_transcription is None
+                        and not self._transcribes_out_of_process(on_segment is not None)
+                    )
+                    transcription_result, diarization_segments = (
+                        self._run_stages_concurrently(
+                            transcribe, diarize, timings, whisper_in_process
+                        )
+                    )
+                else:
+                    transcription_result, diarization_segments = (
+                        self._run_stages_sequentially(
+                            transcribe, diarize, timings, report
+                        )
+                    )
+
+        metadata["language"] = transcription_result.get("language")
+        metadata["transcription_cached"] = cached_transcription is not None
+
         whisper_segments = transcription_result.get("segments", [])
         if not whisper_segments:
             logger.warning("SubtitleService: Transcrição não retornou segmentos.")
             return []
 
+        report("merge", 90)
+        merge_start = time.perf_counter()
+        final_subtitles = self._merge_results(whisper_segments, diarization_segments)
+        timings["merge"] = round(time.perf_counter() - merge_start, 3)
+        self.metrics.observe_stage("merge", time.perf_counter() - merge_start)
+        timings["total"] = round(time.perf_counter() - total_start, 3)
+
+        logger.info(f"SubtitleService: Tempos por etapa (s): {timings}")
+        return final_subtitles
+
+    def _cache_keys(
+        self,
+        content_hash: str | None,
+        profile: str | None = None,
+        language: str | None = None,
+        engine: str | None = None,
+    ) -> Tuple[str, str]:
+        """
+        Chaves do cache: conteúdo do vídeo + modelo + opções de decodificação
+        (ou, na diarização, da divisão em janelas).
+        Transcrição e diarização são armazenadas separadamente.
+        """
+        transcription_key = make_cache_key(
+            content_hash=content_hash,
+            model=env.TRANSCRIPTION_MODEL,
+            sample_rate=env.TARGET_SAMPLE_RATE,
+            options=get_decode_options(profile, language, engine),
+        )
+        diarization_key = make_cache_key(
+            content_hash=content_hash,
+            model=env.DIARIZATION_MODEL,
+            sample_rate=env.TARGET_SAMPLE_RATE,
+            **get_diarization_options(),
+        )
+        return transcription_key, diarization_key
+
+    def _segment_event(self, segment: Dict[str, Any]) -> Dict[str, Any]:
+        """Segmento parcial (sem interlocutor) no formato de 'SubtitleSegment'."""
+        return {
+            "index": segment["id"],
+            "start": round(segment["start"], 3),
+            "end": round(segment["end"], 3),
+            "text": segment.get("text", "").strip(),
+            "speaker": None,
+        }
+
+    def _run_stages_sequentially(
+        self,
+        transcribe: Callable[..., Dict[str, Any]],
+        diarize: Callable[[], List[Dict[str, Any]]],
+        timings: Dict[str, float],
+        report: Callable[[str, float], None],
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Executa Whisper e depois Pyannote (pula a diarização se não houver fala).
+        Com a transcrição em chunks e VAD_SOURCE="diarization", a ordem se
+        inverte e os turnos do Pyannote definem as regiões de fala.
+        """
+        if env.TRANSCRIPTION_ENGINE == "chunked" and env.VAD_SOURCE == "diarization":
+            logger.info("SubtitleService: Solicitando diarização...")
+            report("diarization", 10)
+            diarization_segments = self._run_stage("diarization", timings, diarize)
+            logger.info("SubtitleService: Solicitando transcrição...")
+            report("transcription", 45)
+            transcription_result = self._run_stage(
+                "transcription", timings, lambda: transcribe(diarization_segments)
+            )
+            return transcription_result, diarization_segments
+
+        logger.info("SubtitleService: Solicitando transcrição...")
+        report("transcription", 10)
+        transcription_result = self._run_stage("transcription", timings, transcribe)
+        if not transcription_result.get("segments"):
+            return transcription_result, []
+
         logger.info("SubtitleService: Solicitando diarização...")
-        diarization_segments = self.diarization_service.diarize_video(video_file_path)
+        report("diarization", 55)
+        diarization_segments = self._run_stage("diarization", timings, diarize)
+        return transcription_result, diarization_segments
 
+    def _run_stages_concurrently(
+        self,
+        transcribe: Callable[[], Dict[str, Any]],
+        diarize: Callable[[], List[Dict[str, Any]]],
+        timings: Dict[str, float],
+        whisper_in_process: bool = True,
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Executa Whisper e Pyannote ao mesmo tempo, cada um em sua thread.
+        As threads são divididas conforme TRANSCRIPTION_THREAD_SHARE. O número
+        de threads do PyTorch vale para o processo inteiro: com o Whisper no
+        pool de processos, o processo principal fica com a parte do Pyannote;
+        com os dois no mesmo processo, cada etapa abre sua própria equipe
+        OpenMP desse tamanho, então ambas usam a menor das partes.
+        """
+        whisper_threads, pyannote_threads = concurrent_thread_split()
+        torch_threads = (
+            min(whisper_threads, pyannote_threads)
+            if whisper_in_process
+            else pyannote_threads
+        )
+        logger.info(
+            "SubtitleService: Executando transcrição e diarização em paralelo "
+            f"(Whisper={whisper_threads}, Pyannote={pyannote_threads}, "
+            f"PyTorch no processo={torch_threads} threads)..."
+        )
+
+        with _concurrent_torch_threads(torch_threads), ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="subtitle-stage"
+        ) as executor:
+            transcription_future = executor.submit(
+                self._run_stage, "transcription", timings, transcribe
+            )
+            diarization_future = executor.submit(
+                self._run_stage, "diarization", timings, diarize
+            )
+            return transcription_future.result(), diarization_future.result()
+
+    def _transcribes_out_of_process(self, streaming: bool) -> bool:
+        service = self.transcription_service
+        return isinstance(service, TranscriptionService) and service.runs_out_of_process(
+            streaming
+        )
+
+    def _run_stage(
+        self,
+        stage: str,
+        timings: Dict[str, float],
+        func: Callable[[], Any],
+    ) -> Any:
+        """Executa uma etapa registrando sua duração em 'timings'."""
+        start = time.perf_counter()
+        try:
+            return func()
+        finally:
+            timings[stage] = round(time.perf_counter() - start, 3)
+
+    def _merge_results(
+        self,
+        whisper_segments: List[Dict[str, Any]],
+        diarization_segments: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Atribui a cada segmento do Whisper o interlocutor dominante
+        e mapeia os IDs de speaker para "Interlocutor X".
+        """
         if not diarization_segments:
             logger.warning(
                 "SubtitleService: Diarização não retornou segmentos. Marcando todos como 'Desconhecido'."
@@ -101,11 +426,9 @@ class SubtitleService:
             ]
 
         logger.info("SubtitleService: Fundindo resultados...")
+        speaker_ids = assign_dominant_speakers(whisper_segments, diarization_segments)
         intermediate_subtitles = []
-        for segment in whisper_segments:
-            speaker_id = self._find_dominant_speaker(
-                segment["start"], segment["end"], diarization_segments
-            )
+        for segment, speaker_id in zip(whisper_segments, speaker_ids):
             intermediate_subtitles.append(
                 {
                     "start": round(segment["start"], 3),
@@ -123,7 +446,7 @@ class SubtitleService:
         for segment in intermediate_subtitles:
             original_speaker_id = segment["speaker"]
 
-            if original_speaker_id == "UNKNOWN":
+            if original_speaker_id == UNKNOWN_SPEAKER:
                 mapped_speaker_name = "Desconhecido"
             elif original_speaker_id in speaker_map:
                 mapped_speaker_name = speaker_map[original_speaker_id]
@@ -144,57 +467,92 @@ class SubtitleService:
         logger.info("SubtitleService: Geração de dados (com mapeamento) concluída.")
         return final_subtitles
 
-    def _find_dominant_speaker(
-        self,
-        segment_start: float,
-        segment_end: float,
-        diarization_result: List[Dict[str, Any]],
-    ) -> str:
-        """
-        Função auxiliar para encontrar o interlocutor dominante em um segmento de texto.
-        Retorna 'UNKNOWN' se não houver overlap.
-        """
-        speaker_overlap = {}
-        max_overlap = 0
-        dominant_speaker = "UNKNOWN"
-        for turn in diarization_result:
-            turn_start = turn["start"]
-            turn_end = turn["end"]
-            speaker = turn["speaker"]
-            overlap = max(
-                0, min(segment_end, turn_end) - max(segment_start, turn_start)
-            )
-            if overlap > 0:
-                current_total = speaker_overlap.get(speaker, 0) + overlap
-                speaker_overlap[speaker] = current_total
-                if current_total > max_overlap:
-                    max_overlap = current_total
-                    dominant_speaker = speaker
-        return dominant_speaker
-
     def render_final_video(
         self,
         original_video_path: str,
         output_video_path: str,
         subtitles_data: List[SubtitleSegment],
         style_options: Dict[str, Any],
+        mode: str = "burn",
+        container: str = "mp4",
+        progress: RenderProgress | None = None,
     ):
         """
         Orquestra a renderização do vídeo final.
         Carrega o RenderingService se ainda não estiver carregado.
+
+        'mode="burn"' queima as legendas no vídeo (reencode);
+        'mode="soft"' apenas adiciona uma faixa de legenda ao contêiner;
+        'mode="smart"' queima as legendas reencodando só os trechos com legenda.
+        'progress' recebe o percentual e o fps do ffmpeg e permite cancelar.
         """
-        logger.info("SubtitleService: Solicitando renderização de vídeo...")
+        logger.info(f"SubtitleService: Solicitando renderização de vídeo (modo={mode})...")
         try:
-            self.rendering_service.render_video_with_subtitles(
+            with self.metrics.time_stage(f"render_{mode}"), track_render(progress):
+                if mode == "soft":
+                    self.rendering_service.mux_subtitles(
+                        original_video_path=original_video_path,
+                        output_video_path=output_video_path,
+                        subtitles_data=subtitles_data,
+                        style_options=style_options,
+                        container=container,
+                    )
+                elif mode == "smart":
+                    self.rendering_service.render_video_smart(
+                        original_video_path=original_video_path,
+                        output_video_path=output_video_path,
+                        subtitles_data=subtitles_data,
+                        style_options=style_options,
+                    )
+                else:
+                    self.rendering_service.render_video_with_subtitles(
+                        original_video_path=original_video_path,
+                        output_video_path=output_video_path,
+                        subtitles_data=subtitles_data,
+                        style_options=style_options,
+                    )
+            logger.info("SubtitleService: Renderização de vídeo concluída.")
+        except RenderCancelledError:
+            logger.info("SubtitleService: Renderização cancelada.")
+            raise
+        except Exception as e:
+            logger.error("SubtitleService: Falha na renderização", exc_info=True)
+            raise e
+
+    def render_preview(
+        self,
+        original_video_path: str,
+        output_video_path: str,
+        subtitles_data: List[SubtitleSegment],
+        style_options: Dict[str, Any],
+        start: float,
+        end: float,
+        height: int | None = None,
+        progress: RenderProgress | None = None,
+    ):
+        """Renderiza uma prévia de baixa latência da janela [start, end)."""
+        logger.info("SubtitleService: Solicitando prévia de renderização...")
+        with self.metrics.time_stage("preview"), track_render(progress):
+            self.rendering_service.render_preview(
                 original_video_path=original_video_path,
                 output_video_path=output_video_path,
                 subtitles_data=subtitles_data,
                 style_options=style_options,
+                start=start,
+                end=end,
+                height=height,
             )
-            logger.info("SubtitleService: Renderização de vídeo concluída.")
-        except Exception as e:
-            logger.error("SubtitleService: Falha na renderização", exc_info=True)
-            raise e
+
+    def export_subtitles(
+        self,
+        subtitles_data: List[SubtitleSegment],
+        style_options: Dict[str, Any],
+        subtitle_format: str,
+    ) -> str:
+        """Gera o arquivo lateral de legendas (.ass, .srt ou .vtt)."""
+        return self.rendering_service.export_subtitles(
+            subtitles_data, style_options, subtitle_format
+        )
 
 
 subtitleService: SubtitleService | None = None
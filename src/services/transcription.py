@@ -1,12 +1,212 @@
 import logging
+import mmap
+import multiprocessing
 import os
 import threading
-from typing import Any, Dict
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 
-import torch
-import whisper
+import numpy as np
 
 from src import env
+from src.services.audio import decode_audio, load_pcm
+from src.services.quantization import load_quantized_whisper
+from src.services.stubs import StubTranscriptionService
+from src.services.vad import AudioChunk, detect_speech, merge_regions, plan_chunks
+
+# 'torch' e 'whisper' são importados apenas ao carregar o modelo:
+# importá-los no topo do módulo atrasa em vários segundos o boot da API.
+
+
+# Perfis de decodificação (argumentos de 'model.transcribe').
+DECODING_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Uma única passada gulosa: sem retentativas com temperatura e sem
+    # condicionar no texto anterior (evita laços de repetição).
+    "fast": {
+        "temperature": 0.0,
+        "condition_on_previous_text": False,
+    },
+    # Padrões da biblioteca Whisper (comportamento original do serviço).
+    "balanced": {},
+    # Beam search, com o fallback de temperatura completo.
+    "accurate": {
+        "beam_size": 5,
+        "best_of": 5,
+        "patience": 1.0,
+        "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        "condition_on_previous_text": True,
+    },
+}
+
+
+def resolve_decoding_options(
+    profile: str | None = None, language: str | None = None
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Retorna o nome do perfil e os argumentos de 'model.transcribe'.
+    'language' força o idioma (pula a detecção automática).
+    """
+    profile = (profile or env.TRANSCRIPTION_PROFILE).lower()
+    if profile not in DECODING_PROFILES:
+        raise ValueError(
+            f"Perfil de decodificação desconhecido: '{profile}'. "
+            f"Opções: {', '.join(DECODING_PROFILES)}."
+        )
+
+    options = dict(DECODING_PROFILES[profile])
+    language = language or env.TRANSCRIPTION_LANGUAGE
+    if language:
+        options["language"] = language.lower()
+    return profile, options
+
+
+# Se o Whisper decodifica em fp16 (há GPU); fixo durante a vida do processo.
+_use_fp16: bool | None = None
+
+
+def _detect_fp16() -> bool:
+    """
+    Calculado uma única vez: usa o serviço já carregado, se houver, e só
+    importa o torch quando necessário (nunca com o backend "stub").
+    """
+    global _use_fp16
+
+    if _use_fp16 is None:
+        if env.INFERENCE_BACKEND == "stub":
+            _use_fp16 = False
+        elif isinstance(transcriptionService, TranscriptionService):
+            _use_fp16 = transcriptionService.use_fp16
+        else:
+            try:
+                import torch
+
+                _use_fp16 = torch.cuda.is_available()
+            except Exception:
+                _use_fp16 = False
+    return _use_fp16
+
+
+def get_decode_options(
+    profile: str | None = None,
+    language: str | None = None,
+    engine: str | None = None,
+) -> Dict[str, Any]:
+    """
+    Opções de decodificação que influenciam o resultado do Whisper.
+    Usadas também para compor a chave do cache de resultados.
+    'engine' sobrepõe TRANSCRIPTION_ENGINE (o streaming sempre usa "chunked").
+    """
+    fp16 = _detect_fp16()
+    options: Dict[str, Any] = {"fp16": fp16}
+    _, decoding = resolve_decoding_options(profile, language)
+    if decoding:
+        options["decoding"] = decoding
+    if not fp16 and env.WHISPER_CPU_QUANTIZATION != "none":
+        options["quantization"] = env.WHISPER_CPU_QUANTIZATION
+    if (engine or env.TRANSCRIPTION_ENGINE) == "chunked":
+        options["engine"] = {
+            "name": "chunked",
+            "vad_source": env.VAD_SOURCE,
+            "min_silence": env.VAD_MIN_SILENCE,
+            "padding": env.VAD_PADDING,
+            "margin_db": env.VAD_ENERGY_MARGIN_DB,
+            "chunk_duration": env.VAD_CHUNK_DURATION,
+        }
+    return options
+
+
+def concurrent_thread_split() -> Tuple[int, int]:
+    """
+    Threads do Whisper e do Pyannote quando as duas etapas rodam ao mesmo
+    tempo (PIPELINE_MODE="concurrent"), conforme TRANSCRIPTION_THREAD_SHARE.
+    """
+    total = env.TORCH_NUM_THREADS or os.cpu_count() or 1
+    share = min(max(env.TRANSCRIPTION_THREAD_SHARE, 0.0), 1.0)
+    whisper_threads = min(max(1, round(total * share)), max(1, total - 1))
+    return whisper_threads, max(1, total - whisper_threads)
+
+
+def _init_chunk_worker(num_threads: int):
+    """Inicializa um processo do pool: limita as threads do PyTorch."""
+    import torch
+
+    torch.set_num_threads(num_threads)
+
+
+def _transcribe_chunk(
+    audio: np.ndarray, options: Dict[str, Any] | None = None
+) -> Dict[str, Any]:
+    """
+    Executado nos processos do pool: cada processo carrega seu próprio
+    modelo na primeira chamada (via 'load_transcription_service').
+    """
+    return load_transcription_service().transcribe_full(audio, options)
+
+
+def _transcribe_pcm_chunk(
+    pcm_path: str, regions: List[Tuple[float, float]], options: Dict[str, Any] | None
+) -> Dict[str, Any]:
+    """
+    Igual a '_transcribe_chunk', mas o processo mapeia o PCM e extrai só as
+    amostras do chunk: o áudio não é copiado nem serializado pelo pool.
+    """
+    audio = load_pcm(pcm_path, use_mmap=True)
+    chunk_audio = AudioChunk(regions).extract(audio, env.TARGET_SAMPLE_RATE)
+    return load_transcription_service().transcribe_full(chunk_audio, options)
+
+
+def _mapped_pcm_path(audio: np.ndarray) -> str | None:
+    """Arquivo do PCM, se 'audio' for o mapeamento inteiro dele ('load_pcm')."""
+    if isinstance(audio, np.memmap) and isinstance(audio.base, mmap.mmap):
+        return audio.filename
+    return None
+
+
+class TranscriptStitcher:
+    """
+    Recompõe, chunk a chunk, um resultado no formato do Whisper: converte os
+    tempos de cada chunk para o áudio original e numera os segmentos em sequência.
+    """
+
+    def __init__(self):
+        self.segments: List[Dict[str, Any]] = []
+        self.languages: Counter = Counter()
+
+    def add(self, chunk: AudioChunk, result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Incorpora o resultado de um chunk e retorna seus segmentos já convertidos."""
+        if result.get("language"):
+            self.languages[result["language"]] += 1
+
+        added = []
+        for segment in result.get("segments", []):
+            segment = dict(segment)
+            segment["id"] = len(self.segments)
+            segment["seek"] = int(chunk.regions[0][0] * 100)
+            segment["start"] = chunk.to_absolute(segment["start"])
+            segment["end"] = max(
+                chunk.to_absolute(segment["end"], is_end=True), segment["start"]
+            )
+            if "words" in segment:
+                segment["words"] = [
+                    {
+                        **word,
+                        "start": chunk.to_absolute(word["start"]),
+                        "end": chunk.to_absolute(word["end"], is_end=True),
+                    }
+                    for word in segment["words"]
+                ]
+            self.segments.append(segment)
+            added.append(segment)
+        return added
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "text": "".join(segment["text"] for segment in self.segments),
+            "segments": self.segments,
+            "language": self.languages.most_common(1)[0][0] if self.languages else None,
+        }
 
 
 class TranscriptionService:
@@ -23,6 +223,15 @@ class TranscriptionService:
         self.device = None
         self.use_fp16 = False
         self.model = None
+        self.quantization = "none"
+
+        self.engine = env.TRANSCRIPTION_ENGINE
+        self.workers = max(1, env.TRANSCRIPTION_WORKERS)
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+        # O Whisper instala hooks no modelo a cada decodificação: gerações
+        # concorrentes (JOB_WORKERS > 1) usam o modelo uma de cada vez.
+        self._inference_lock = threading.Lock()
 
         self._load_model()
 
@@ -30,6 +239,9 @@ class TranscriptionService:
         """
         Método privado para carregar o modelo Whisper.
         """
+        import torch
+        import whisper
+
         try:
             if torch.cuda.is_available():
                 self.device = "cuda"
@@ -49,8 +261,15 @@ class TranscriptionService:
             self.use_fp16 = False
 
         try:
-            self.model = whisper.load_model(self.model_type, device=self.device)
-            logging.info(f"Modelo Whisper '{self.model_type}' carregado com sucesso.")
+            if self.device == "cpu" and env.WHISPER_CPU_QUANTIZATION == "int8":
+                self.model = load_quantized_whisper(self.model_type)
+                self.quantization = "int8"
+            else:
+                self.model = whisper.load_model(self.model_type, device=self.device)
+            logging.info(
+                f"Modelo Whisper '{self.model_type}' carregado com sucesso "
+                f"(quantização: {self.quantization})."
+            )
         except Exception as e:
             logging.error(
                 f"Erro fatal ao carregar o modelo Whisper: {e}", exc_info=True
@@ -63,26 +282,183 @@ class TranscriptionService:
         """
         Método público do serviço para transcrever um arquivo.
         """
-        if self.model is None:
-            raise RuntimeError("Modelo Whisper não foi carregado corretamente.")
-
         if not os.path.exists(video_file_path):
             raise FileNotFoundError(
                 f"Arquivo não encontrado no serviço: {video_file_path}"
             )
 
         logging.info(f"Iniciando transcrição para: {video_file_path}...")
+        return self.transcribe_audio(decode_audio(video_file_path))
+
+    def transcribe_audio(
+        self,
+        audio: np.ndarray,
+        speech_regions: List[Tuple[float, float]] | None = None,
+        options: Dict[str, Any] | None = None,
+        on_segment: Callable[[Dict[str, Any]], None] | None = None,
+    ) -> Dict[str, Any]:
+        """
+        Transcreve um áudio já decodificado (float32 mono em TARGET_SAMPLE_RATE),
+        evitando uma nova decodificação via ffmpeg dentro do Whisper.
+
+        Com TRANSCRIPTION_ENGINE="chunked", usa 'speech_regions' (ex: turnos
+        da diarização) ou o VAD por energia para transcrever só os trechos com fala.
+        'options' são os argumentos de decodificação (ver 'resolve_decoding_options').
+        'on_segment' recebe cada segmento assim que seu chunk é decodificado
+        (força a transcrição em chunks, que permite resultados parciais).
+        """
+        if self.engine == "chunked" or on_segment is not None:
+            result = self.transcribe_chunked(audio, speech_regions, options, on_segment)
+        else:
+            result = self.transcribe_full(audio, options)
+        logging.info("Transcrição concluída.")
+        return result
+
+    def transcribe_full(
+        self, audio: np.ndarray, options: Dict[str, Any] | None = None
+    ) -> Dict[str, Any]:
+        """Executa o Whisper sobre o áudio inteiro, janela a janela."""
+        if self.model is None:
+            raise RuntimeError("Modelo Whisper não foi carregado corretamente.")
 
         try:
-            result = self.model.transcribe(video_file_path, fp16=self.use_fp16)
-            logging.info("Transcrição concluída.")
-            return result
+            with self._inference_lock:
+                return self.model.transcribe(
+                    audio, fp16=self.use_fp16, **(options or {})
+                )
         except Exception as e:
             logging.error(f"Erro durante a execução da transcrição: {e}", exc_info=True)
             raise e
 
+    def transcribe_chunked(
+        self,
+        audio: np.ndarray,
+        speech_regions: List[Tuple[float, float]] | None = None,
+        options: Dict[str, Any] | None = None,
+        on_segment: Callable[[Dict[str, Any]], None] | None = None,
+    ) -> Dict[str, Any]:
+        """
+        Transcrição longa: divide o áudio nas pausas, descarta o silêncio,
+        transcreve os chunks (em paralelo com TRANSCRIPTION_WORKERS > 1)
+        e recompõe os segmentos com os tempos absolutos.
+        Os chunks são recompostos em ordem, à medida que ficam prontos.
+        """
+        chunks = self._plan_chunks(audio, speech_regions)
+        stitcher = TranscriptStitcher()
+        for chunk, result in self._iter_chunk_results(audio, chunks, options):
+            for segment in stitcher.add(chunk, result):
+                if on_segment is not None:
+                    on_segment(segment)
+        return stitcher.result()
+
+    def _plan_chunks(
+        self,
+        audio: np.ndarray,
+        speech_regions: List[Tuple[float, float]] | None = None,
+    ) -> List[AudioChunk]:
+        sample_rate = env.TARGET_SAMPLE_RATE
+        duration = len(audio) / sample_rate
+
+        if speech_regions:
+            regions = merge_regions(speech_regions, duration=duration)
+        else:
+            regions = detect_speech(audio, sample_rate)
+        chunks = plan_chunks(regions, audio, sample_rate)
+
+        speech_duration = sum(chunk.speech_duration for chunk in chunks)
+        logging.info(
+            f"Transcrição em chunks: {len(chunks)} chunk(s), "
+            f"{speech_duration:.1f}s de fala em {duration:.1f}s "
+            f"({100 * (1 - speech_duration / duration) if duration else 0:.0f}% descartado), "
+            f"{self.workers} processo(s)."
+        )
+        return chunks
+
+    def _iter_chunk_results(
+        self,
+        audio: np.ndarray,
+        chunks: List[AudioChunk],
+        options: Dict[str, Any] | None,
+    ) -> Iterator[Tuple[AudioChunk, Dict[str, Any]]]:
+        """
+        Transcreve os chunks e os devolve na ordem original. No pool, cada
+        processo lê seu trecho do PCM mapeado ou, com o áudio só em memória,
+        os chunks são extraídos sob demanda: no máximo dois por processo
+        ficam na fila, em vez de uma cópia do áudio inteiro.
+        """
+        sample_rate = env.TARGET_SAMPLE_RATE
+        if self.workers > 1 and len(chunks) > 1:
+            pool = self._get_pool()
+            pcm_path = _mapped_pcm_path(audio)
+
+            def submit(chunk: AudioChunk) -> Future:
+                if pcm_path is not None:
+                    return pool.submit(
+                        _transcribe_pcm_chunk, pcm_path, chunk.regions, options
+                    )
+                return pool.submit(
+                    _transcribe_chunk, chunk.extract(audio, sample_rate), options
+                )
+
+            remaining = iter(chunks)
+            pending = deque(
+                (chunk, submit(chunk)) for chunk in islice(remaining, 2 * self.workers)
+            )
+            try:
+                while pending:
+                    chunk, future = pending.popleft()
+                    next_chunk = next(remaining, None)
+                    if next_chunk is not None:
+                        pending.append((next_chunk, submit(next_chunk)))
+                    yield chunk, future.result()
+            finally:
+                for _, future in pending:
+                    future.cancel()
+        else:
+            for chunk in chunks:
+                yield chunk, self.transcribe_full(chunk.extract(audio, sample_rate), options)
+
+    def runs_out_of_process(self, streaming: bool = False) -> bool:
+        """Se a transcrição roda no pool de processos (com seus próprios threads)."""
+        return self.workers > 1 and (self.engine == "chunked" or streaming)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """
+        Cria o pool na primeira chamada. Usa 'spawn': o Whisper instala hooks
+        no modelo a cada decodificação (não é seguro entre threads) e o
+        OpenMP do PyTorch não sobrevive a um fork.
+        """
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    total_threads = env.TORCH_NUM_THREADS or os.cpu_count() or 1
+                    if env.PIPELINE_MODE == "concurrent":
+                        # O restante fica com o Pyannote, no processo principal.
+                        total_threads = concurrent_thread_split()[0]
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_chunk_worker,
+                        initargs=(max(1, total_threads // self.workers),),
+                    )
+        return self._pool
+
+    def warm_up(self, duration: float = env.WARMUP_DURATION):
+        """
+        Executa uma inferência curta sobre áudio sintético (ruído fraco) para
+        disparar as alocações e caminhos de inicialização únicos do modelo.
+        """
+        audio = np.random.default_rng(0).normal(
+            0.0, 0.01, int(duration * env.TARGET_SAMPLE_RATE)
+        ).astype(np.float32)
+        self.transcribe_full(audio)
+
+        if self.engine == "chunked" and self.workers > 1:
+            # Faz cada processo do pool carregar seu modelo agora.
+            list(self._get_pool().map(_transcribe_chunk, [audio] * self.workers))
+
 
-transcriptionService: TranscriptionService | None = None
+transcriptionService: TranscriptionService | StubTranscriptionService | None = None
 
 _transcription_lock = threading.Lock()
 
@@ -94,12 +470,16 @@ def load_transcription_service():
 
     Usa um Lock para garantir que o modelo seja carregado apenas uma vez,
     mesmo sob requisições concorrentes.
+    Com INFERENCE_BACKEND="stub", retorna o backend sintético (sem modelo).
     """
     global transcriptionService
 
     if transcriptionService is None:
         with _transcription_lock:
             if transcriptionService is None:
-                transcriptionService = TranscriptionService()
+                if env.INFERENCE_BACKEND == "stub":
+                    transcriptionService = StubTranscriptionService()
+                else:
+                    transcriptionService = TranscriptionService()
 
     return transcriptionService
@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+from collections import deque
+from typing import AsyncIterator, Deque
+
+from fastapi.concurrency import run_in_threadpool
+
+from src import env
+
+logger = logging.getLogger(__name__)
+
+
+class UploadResult:
+    """Resultado da ingestão de um upload."""
+
+    def __init__(
+        self,
+        video_path: str,
+        content_hash: str,
+        size: int,
+        pcm_path: str | None = None,
+    ):
+        self.video_path = video_path
+        self.content_hash = content_hash
+        self.size = size
+        self.pcm_path = pcm_path
+
+
+class StreamingAudioExtractor:
+    """
+    Processo ffmpeg alimentado pelo stdin com os bytes do upload conforme
+    eles chegam, gravando o áudio em PCM float32 mono.
+
+    Contêineres que exigem seek (ex: MP4 com 'moov' no fim) falham neste
+    modo; nesse caso 'finish()' retorna None e o áudio é extraído depois,
+    a partir do arquivo completo. Como em 'run_ffmpeg', só as últimas
+    FFMPEG_STDERR_LINES linhas do stderr são mantidas, para o log da falha.
+    """
+
+    def __init__(self, sample_rate: int = env.TARGET_SAMPLE_RATE):
+        fd, self.pcm_path = tempfile.mkstemp(suffix=".pcm", dir=env.AUDIO_TEMP_DIR)
+        os.close(fd)
+        self.failed = False
+        self._process = subprocess.Popen(
+            [
+                "ffmpeg",
+                "-loglevel",
+                "error",
+                "-i",
+                "pipe:0",
+                "-vn",
+                "-f",
+                "f32le",
+                "-acodec",
+                "pcm_f32le",
+                "-ac",
+                "1",
+                "-ar",
+                str(sample_rate),
+                self.pcm_path,
+                "-y",
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        self._stderr_tail: Deque[str] = deque(maxlen=max(env.FFMPEG_STDERR_LINES, 1))
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr_thread.start()
+
+    def _drain_stderr(self):
+        for line in self._process.stderr:
+            self._stderr_tail.append(line.decode(errors="replace"))
+
+    def feed(self, chunk: bytes):
+        if self.failed:
+            return
+        try:
+            self._process.stdin.write(chunk)
+        except (BrokenPipeError, OSError):
+            logger.warning(
+                "UploadService: ffmpeg encerrou durante o streaming; "
+                "o áudio será extraído após o upload."
+            )
+            self.failed = True
+
+    def finish(self) -> str | None:
+        """Fecha o stdin e aguarda o ffmpeg. Retorna o caminho do PCM ou None."""
+        try:
+            self._process.stdin.close()
+        except (BrokenPipeError, OSError):
+            self.failed = True
+
+        if self._process.wait() != 0:
+            self.failed = True
+        self._stderr_thread.join()
+
+        if self.failed:
+            logger.warning(
+                "UploadService: Extração de áudio durante o upload falhou "
+                f"(código {self._process.returncode}): {''.join(self._stderr_tail).strip()}"
+            )
+            self.abort()
+            return None
+        return self.pcm_path
+
+    def abort(self):
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        self._stderr_thread.join()
+        if os.path.exists(self.pcm_path):
+            os.remove(self.pcm_path)
+
+
+async def save_upload_stream(
+    chunks: AsyncIterator[bytes],
+    video_path: str,
+    extract_audio: bool = env.STREAMING_AUDIO_EXTRACTION,
+) -> UploadResult:
+    """
+    Grava um upload em disco em blocos grandes, calculando o SHA-256
+    enquanto os bytes chegam. Opcionalmente alimenta um ffmpeg em paralelo,
+    sobrepondo a decodificação do áudio à transferência.
+
+    A escrita, o hash e o envio ao ffmpeg rodam no threadpool,
+    sem bloquear o event loop.
+    """
+    digest = hashlib.sha256()
+    extractor = StreamingAudioExtractor() if extract_audio else None
+    size = 0
+
+    def write_chunk(output, chunk: bytes):
+        output.write(chunk)
+        digest.update(chunk)
+        if extractor is not None:
+            extractor.feed(chunk)
+
+    try:
+        output = await run_in_threadpool(open, video_path, "wb")
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                await run_in_threadpool(write_chunk, output, chunk)
+        finally:
+            await run_in_threadpool(output.close)
+
+        pcm_path = None
+        if extractor is not None:
+            pcm_path = await run_in_threadpool(extractor.finish)
+    except BaseException:
+        if extractor is not None:
+            await run_in_threadpool(extractor.abort)
+        raise
+
+    logger.info(
+        f"UploadService: {size} bytes gravados em {video_path} "
+        f"(áudio extraído em streaming: {pcm_path is not None})."
+    )
+    return UploadResult(video_path, digest.hexdigest(), size, pcm_path)
+
+
+async def iter_upload_file(file, chunk_size: int = env.UPLOAD_CHUNK_SIZE):
+    """Itera um UploadFile do FastAPI em blocos de 'chunk_size' bytes."""
+    while chunk := await file.read(chunk_size):
+        yield chunk
+
+
+async def iter_request_body(request, chunk_size: int = env.UPLOAD_CHUNK_SIZE):
+    """
+    Itera o corpo bruto da requisição conforme chega da rede, reagrupando
+    os pedaços em blocos de pelo menos 'chunk_size' bytes.
+    """
+    buffer = bytearray()
+    async for piece in request.stream():
+        buffer += piece
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
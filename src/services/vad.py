@@ -0,0 +1,218 @@
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from src import env
+
+# Silêncio inserido entre regiões de fala concatenadas em um mesmo chunk,
+# para que o Whisper perceba a pausa e encerre o segmento.
+CHUNK_JOIN_GAP = 0.5
+
+VAD_FRAME_DURATION = 0.03
+VAD_MIN_SPEECH = 0.2
+VAD_FLOOR_DB = -50.0
+
+Region = Tuple[float, float]
+
+
+def frame_energies_db(
+    audio: np.ndarray,
+    sample_rate: int,
+    frame_duration: float = VAD_FRAME_DURATION,
+    block_frames: int = 8192,
+) -> np.ndarray:
+    """
+    Energia (dBFS) de cada quadro do áudio, calculada em blocos para não
+    materializar cópias do áudio inteiro (compatível com np.memmap).
+    """
+    frame_size = max(1, int(sample_rate * frame_duration))
+    frame_count = len(audio) // frame_size
+    energies = np.empty(frame_count, dtype=np.float32)
+
+    for first in range(0, frame_count, block_frames):
+        last = min(first + block_frames, frame_count)
+        frames = np.asarray(
+            audio[first * frame_size : last * frame_size], dtype=np.float32
+        ).reshape(-1, frame_size)
+        energies[first:last] = 10.0 * np.log10(
+            np.mean(frames * frames, axis=1) + 1e-10
+        )
+    return energies
+
+
+def merge_regions(
+    regions: Iterable[Region],
+    min_silence: float = env.VAD_MIN_SILENCE,
+    padding: float = env.VAD_PADDING,
+    duration: float | None = None,
+) -> List[Region]:
+    """
+    Ordena, expande ('padding') e une regiões separadas por menos de
+    'min_silence' segundos. Serve tanto para o VAD por energia quanto
+    para os turnos da diarização.
+    """
+    merged: List[List[float]] = []
+    for start, end in sorted(regions):
+        start = max(0.0, start - padding)
+        end = end + padding
+        if duration is not None:
+            end = min(end, duration)
+        if end <= start:
+            continue
+        if merged and start - merged[-1][1] < min_silence:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(round(float(start), 3), round(float(end), 3)) for start, end in merged]
+
+
+def detect_speech(
+    audio: np.ndarray,
+    sample_rate: int = env.TARGET_SAMPLE_RATE,
+    margin_db: float = env.VAD_ENERGY_MARGIN_DB,
+    min_silence: float = env.VAD_MIN_SILENCE,
+    padding: float = env.VAD_PADDING,
+) -> List[Region]:
+    """
+    Detecção de voz por energia: quadros acima do ruído de fundo
+    (percentil 10) + 'margin_db' são considerados fala, limitado a
+    'margin_db' abaixo do nível dos quadros mais altos (percentil 90).
+
+    É conservadora de propósito: música ou ruído alto contam como fala e
+    só custam tempo de transcrição; o que se quer evitar é perder fala.
+    """
+    duration = len(audio) / sample_rate
+    energies = frame_energies_db(audio, sample_rate)
+    if len(energies) == 0:
+        return []
+
+    noise_floor, loud_level = np.percentile(energies, [10, 90])
+    # Sem contraste entre ruído e fala (ex: áudio contínuo), tudo vira fala.
+    threshold = max(
+        min(float(noise_floor) + margin_db, float(loud_level) - margin_db),
+        VAD_FLOOR_DB,
+    )
+    voiced = energies > threshold
+
+    # Bordas das sequências de quadros com voz.
+    changes = np.flatnonzero(np.diff(voiced.astype(np.int8)))
+    edges = np.concatenate(([0], changes + 1, [len(voiced)]))
+    regions = [
+        (edges[i] * VAD_FRAME_DURATION, edges[i + 1] * VAD_FRAME_DURATION)
+        for i in range(len(edges) - 1)
+        if voiced[edges[i]]
+    ]
+
+    regions = merge_regions(regions, min_silence, padding, duration)
+    return [(start, end) for start, end in regions if end - start >= VAD_MIN_SPEECH]
+
+
+class AudioChunk:
+    """
+    Unidade de trabalho da transcrição longa: uma ou mais regiões de fala
+    (tempos absolutos) concatenadas, com 'CHUNK_JOIN_GAP' de silêncio
+    entre elas. Converte os tempos do resultado de volta para o áudio original.
+    """
+
+    def __init__(self, regions: List[Region]):
+        self.regions = regions
+
+    @property
+    def speech_duration(self) -> float:
+        return sum(end - start for start, end in self.regions)
+
+    @property
+    def duration(self) -> float:
+        return self.speech_duration + CHUNK_JOIN_GAP * (len(self.regions) - 1)
+
+    def extract(self, audio: np.ndarray, sample_rate: int) -> np.ndarray:
+        """Copia as regiões do áudio (float32) e as concatena."""
+        gap = np.zeros(int(CHUNK_JOIN_GAP * sample_rate), dtype=np.float32)
+        pieces = []
+        for index, (start, end) in enumerate(self.regions):
+            if index:
+                pieces.append(gap)
+            pieces.append(
+                np.asarray(
+                    audio[int(start * sample_rate) : int(end * sample_rate)],
+                    dtype=np.float32,
+                )
+            )
+        return np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+
+    def to_absolute(self, local_time: float, is_end: bool = False) -> float:
+        """
+        Converte um instante do chunk para o áudio original. Instantes no
+        silêncio inserido vão para o início da região seguinte ou, se
+        'is_end', para o fim da anterior.
+        """
+        cursor = 0.0
+        for index, (start, end) in enumerate(self.regions):
+            length = end - start
+            if local_time <= cursor + length:
+                if local_time >= cursor or index == 0:
+                    return round(start + max(local_time - cursor, 0.0), 3)
+                # Dentro do silêncio inserido antes desta região.
+                return self.regions[index - 1][1] if is_end else start
+            cursor += length + CHUNK_JOIN_GAP
+        return self.regions[-1][1]
+
+
+def _quietest_point(
+    audio: np.ndarray, sample_rate: int, start: float, end: float
+) -> float:
+    """Instante de menor energia em [start, end), usado para cortar regiões longas."""
+    window = audio[int(start * sample_rate) : int(end * sample_rate)]
+    energies = frame_energies_db(window, sample_rate)
+    if len(energies) == 0:
+        return end
+    return start + (int(np.argmin(energies)) + 0.5) * VAD_FRAME_DURATION
+
+
+def plan_chunks(
+    regions: List[Region],
+    audio: np.ndarray,
+    sample_rate: int = env.TARGET_SAMPLE_RATE,
+    max_duration: float = env.VAD_CHUNK_DURATION,
+) -> List[AudioChunk]:
+    """
+    Agrupa as regiões de fala em chunks de até 'max_duration' segundos
+    (a janela nativa do Whisper é de 30s). Regiões maiores que isso são
+    cortadas no ponto mais silencioso do último quinto da janela.
+    """
+    # (início, fim, encerra o chunk): os cortes de uma região longa não são
+    # reagrupados com o próprio restante.
+    pieces: List[Tuple[float, float, bool]] = []
+    for start, end in regions:
+        while end - start > max_duration:
+            cut = round(
+                _quietest_point(
+                    audio,
+                    sample_rate,
+                    start + 0.8 * max_duration,
+                    start + max_duration,
+                ),
+                3,
+            )
+            pieces.append((start, cut, True))
+            start = cut
+        pieces.append((start, end, False))
+
+    chunks: List[AudioChunk] = []
+    current: List[Region] = []
+    current_duration = 0.0
+    for start, end, closes_chunk in pieces:
+        length = end - start
+        extra = length + (CHUNK_JOIN_GAP if current else 0.0)
+        if current and current_duration + extra > max_duration:
+            chunks.append(AudioChunk(current))
+            current, current_duration = [], 0.0
+            extra = length
+        current.append((start, end))
+        current_duration += extra
+        if closes_chunk:
+            chunks.append(AudioChunk(current))
+            current, current_duration = [], 0.0
+    if current:
+        chunks.append(AudioChunk(current))
+    return chunks